@@ -0,0 +1,84 @@
+"""
+对比两次基准测试结果
+
+    python -m benchmarks.compare before.json after.json
+    python -m benchmarks.compare before.json after.json --threshold 10 --fail-on-regression
+"""
+import argparse
+import json
+import sys
+
+# 指标名后缀 -> 数值越大越好
+_HIGHER_IS_BETTER = ("rps", "rows_per_s", "efficiency", "server_max_concurrent")
+_LOWER_IS_BETTER = ("_ms", "seconds", "bytes", "ratio", "errors")
+
+
+def _flatten(data, prefix=""):
+    """把嵌套结果展开为 {"a.b.c": 数值}"""
+    items = {}
+    for key, value in data.items():
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            items.update(_flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            items[path] = value
+    return items
+
+
+def _direction(path):
+    """:return: 1 越大越好，-1 越小越好，0 不参与判断（如请求数、行数）"""
+    name = path.rsplit(".", 1)[-1]
+    if name.endswith(_HIGHER_IS_BETTER):
+        return 1
+    if name.endswith(_LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(old, new, threshold):
+    """
+    :return: [(指标, 旧值, 新值, 变化百分比, 标记)]，标记为 "+" 改善、"-" 退化、"" 变化不超过阈值
+    """
+    old_values = _flatten(old.get("results", {}))
+    new_values = _flatten(new.get("results", {}))
+    rows = []
+    for path in sorted(set(old_values) & set(new_values)):
+        before, after = old_values[path], new_values[path]
+        change = (after - before) / before * 100 if before else 0.0
+        direction = _direction(path)
+        mark = ""
+        if direction and abs(change) > threshold:
+            mark = "+" if change * direction > 0 else "-"
+        rows.append((path, before, after, change, mark))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="对比两次基准测试结果")
+    parser.add_argument("old", help="基准结果文件")
+    parser.add_argument("new", help="新结果文件")
+    parser.add_argument("--threshold", type=float, default=5.0, help="变化超过该百分比才标记，默认 5")
+    parser.add_argument("--fail-on-regression", action="store_true", help="有退化时以状态码 1 退出")
+    args = parser.parse_args(argv)
+
+    with open(args.old, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, "r", encoding="utf-8") as f:
+        new = json.load(f)
+
+    rows = compare(old, new, args.threshold)
+    width = max((len(row[0]) for row in rows), default=10)
+    print(f"{'指标':<{width}}  {'旧值':>12}  {'新值':>12}  {'变化':>8}")
+    for path, before, after, change, mark in rows:
+        print(f"{path:<{width}}  {before:>12g}  {after:>12g}  {change:>+7.1f}% {mark}")
+
+    regressions = [row for row in rows if row[4] == "-"]
+    improvements = [row for row in rows if row[4] == "+"]
+    print(f"\n改善 {len(improvements)} 项，退化 {len(regressions)} 项（阈值 {args.threshold:g}%）")
+    if old.get("meta", {}).get("quick") != new.get("meta", {}).get("quick"):
+        print("注意：两次结果的规模（--quick）不同，数值不可直接比较")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+本地模拟图片生成 API（离线基准测试用）
+同时支持 Gemini generateContent 和 OpenAI images/generations 两种格式，返回固定的 PNG
+"""
+import base64
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image
+
+# 图片规格 -> 边长
+IMAGE_SIZES = {"1K": 1024, "2K": 2048, "4K": 4096}
+
+
+def make_png(size, seed=0):
+    """
+    生成接近真实出图压缩率的 PNG（平滑渐变叠加低幅噪声，纯随机噪声会大得不真实）
+    :param size: 边长（像素）
+    :return: PNG 字节
+    """
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0, 255, size, dtype=np.float32)
+    pixels = np.empty((size, size, 3), dtype=np.float32)
+    pixels[..., 0] = ramp[None, :]
+    pixels[..., 1] = ramp[:, None]
+    pixels[..., 2] = 128
+    pixels += rng.normal(0, 6, pixels.shape).astype(np.float32)
+    image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+class MockProvider:
+    """
+    模拟 API 服务
+    :param latency: 每个请求的模拟处理时间（秒）
+    :param image_size: 返回图片的规格（1K/2K/4K）
+    """
+
+    def __init__(self, latency=0.2, image_size="1K", host="127.0.0.1", port=0):
+        self.latency = latency
+        self.png = make_png(IMAGE_SIZES[image_size])
+        self._body_cache = {}
+        self.requests = 0
+        self.max_concurrent = 0
+        self._active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def set_image_size(self, image_size):
+        self.png = make_png(IMAGE_SIZES[image_size])
+        self._body_cache.clear()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _response_body(self, openai_format):
+        body = self._body_cache.get(openai_format)
+        if body is None:
+            data = base64.b64encode(self.png).decode("ascii")
+            if openai_format:
+                payload = {"data": [{"b64_json": data}]}
+            else:
+                payload = {"candidates": [{"content": {"parts": [{"inlineData": {"mimeType": "image/png", "data": data}}]}}]}
+            body = self._body_cache[openai_format] = json.dumps(payload).encode("utf-8")
+        return body
+
+    def _make_handler(self):
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # 保持连接，与真实 API 一致
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with provider._lock:
+                    provider.requests += 1
+                    provider._active += 1
+                    provider.max_concurrent = max(provider.max_concurrent, provider._active)
+                try:
+                    time.sleep(provider.latency)
+                    body = provider._response_body(self.path.endswith("/images/generations"))
+                finally:
+                    with provider._lock:
+                        provider._active -= 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,371 @@
+"""
+离线基准测试（使用本地模拟 API，不访问网络）
+
+    python -m benchmarks.run                      # 全部项目，结果写入 benchmarks/results/<时间>.json
+    python -m benchmarks.run --quick              # 缩小规模，几十秒内跑完
+    python -m benchmarks.run --only history,library -o before.json
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import gc
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import core.logger as app_logger
+from benchmarks.mock_provider import IMAGE_SIZES, MockProvider, make_png
+from core.thumbnail_cache import CACHE_DIR_ENV
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# 生成测试文本用的词表（中英文混合，接近真实提示词）
+_WORDS = ("infographic poster minimal modern data chart timeline growth revenue "
+          "climate energy city travel coffee health ocean forest retro neon").split()
+_PHRASES = ("数据可视化 年度报告 产品发布 旅行攻略 健康饮食 城市交通 科技趋势 "
+            "环保主题 咖啡文化 海洋保护 森林 复古 霓虹 极简 时间轴").split()
+
+
+def _text(rng, words=12):
+    parts = [rng.choice(_WORDS) for _ in range(words)] + [rng.choice(_PHRASES) for _ in range(words // 3)]
+    rng.shuffle(parts)
+    return " ".join(parts)
+
+
+def _timings(samples):
+    """毫秒统计：平均、中位数、p95、最大"""
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return {"mean_ms": round(statistics.fmean(samples) * 1000, 3),
+            "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+            "p95_ms": round(p95 * 1000, 3),
+            "max_ms": round(samples[-1] * 1000, 3)}
+
+
+def _time_calls(func, args_list):
+    samples = []
+    for args in args_list:
+        started = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - started)
+    return _timings(samples)
+
+
+def _make_config(workdir, api_url):
+    """基于 config.json.example 生成测试配置（保存路径在临时目录，API 指向模拟服务）"""
+    with open(os.path.join(ROOT, "config", "config.json.example"), "r", encoding="utf-8") as f:
+        config = json.load(f)
+    config["save_path"] = os.path.join(workdir, "output")
+    config["api_presets"] = [{"name": "mock", "api_key": "bench", "api_url": api_url,
+                              "model": "gemini-mock-image", "is_default": True}]
+    path = os.path.join(workdir, "config.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=4)
+    from core.config_manager import ConfigManager
+    return ConfigManager(path)
+
+
+def bench_generation(workdir, quick):
+    """并发 1/8/32 下的生成吞吐（模拟 API 每个请求耗时 200ms）"""
+    from core.image_generator import STAGE_SECONDS, ImageGenerator
+    latency = 0.2
+    results = {}
+    with MockProvider(latency=latency, image_size="1K") as provider:
+        config = _make_config(workdir, provider.url)
+        generator = ImageGenerator(config, config.get_default_api_preset())
+        for concurrency in (1, 8, 32):
+            count = max(concurrency * (2 if quick else 4), 8)
+            STAGE_SECONDS.reset()
+            provider.max_concurrent = 0
+            started = time.perf_counter()
+            outcomes = list(generator.generate_many(((i, f"benchmark prompt {i}") for i in range(count)),
+                                                    max_workers=concurrency, name_prefix=f"c{concurrency}"))
+            seconds = time.perf_counter() - started
+            throughput = count / seconds
+            results[f"c{concurrency}"] = {
+                "requests": count,
+                "errors": sum(1 for _, _, error in outcomes if error),
+                "seconds": round(seconds, 3),
+                "throughput_rps": round(throughput, 2),
+                "efficiency": round(throughput / (concurrency / latency), 3),
+                "server_max_concurrent": provider.max_concurrent,
+                "stages": ImageGenerator.stage_latency(),
+            }
+            shutil.rmtree(config.snapshot.save_path, ignore_errors=True)
+    return results
+
+
+def bench_memory(workdir, quick):
+    """不同图片规格下，每个在途请求占用的内存（tracemalloc 峰值 / 并发数）"""
+    from core.image_generator import ImageGenerator
+    concurrency = 4
+    results = {}
+    with MockProvider(latency=0.3, image_size="1K") as provider:
+        config = _make_config(workdir, provider.url)
+        generator = ImageGenerator(config, config.get_default_api_preset())
+        for size in (("1K", "2K") if quick else ("1K", "2K", "4K")):
+            provider.set_image_size(size)
+            gc.collect()
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+            list(generator.generate_many(((i, "memory") for i in range(concurrency)),
+                                         max_workers=concurrency, name_prefix=f"mem{size}"))
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+            tracemalloc.stop()
+            results[size] = {
+                "png_bytes": len(provider.png),
+                "peak_bytes": peak,
+                "bytes_per_request": peak // concurrency,
+                "overhead_ratio": round(peak / concurrency / len(provider.png), 2),
+            }
+            shutil.rmtree(config.snapshot.save_path, ignore_errors=True)
+    return results
+
+
+def bench_history(workdir, quick):
+    """历史记录在 1k/10k/100k 条时的写入与检索耗时"""
+    from core.history_manager import HistoryManager
+    rng = random.Random(1)
+    results = {}
+    for rows in ((1000, 10000) if quick else (1000, 10000, 100000)):
+        directory = os.path.join(workdir, f"history_{rows}")
+        os.makedirs(directory, exist_ok=True)
+        # 写一份含 N 条提示词的旧版 history.json，由 HistoryManager 首次打开时回填检索库（与升级时的路径相同）；
+        # 逐条 add_prompt 写入 10 万条需要数分钟，而回填后的状态与之相同：检索库 N 条，第一次写入后文件保留最近100条
+        path = os.path.join(directory, "history.json")
+        prompts = [{"id": record_id, "timestamp": "2024-01-01 00:00:00", "prompt": _text(rng, 30),
+                    "style": rng.choice(_PHRASES), "ratio": "16:9", "content": _text(rng, 8)}
+                   for record_id in range(rows, 0, -1)]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"prompts": prompts, "images": [], "edit_sessions": []}, f, ensure_ascii=False)
+        started = time.perf_counter()
+        history = HistoryManager(path)
+        seed_seconds = time.perf_counter() - started
+        # 第一次写入会把文件裁剪到最近100条，不计入写入耗时
+        history.add_prompt(_text(rng, 30), "style", "16:9", _text(rng, 8))
+
+        inserts = 50 if quick else 200
+        keywords = [rng.choice(_WORDS) for _ in range(10)] + \
+                   [f"{rng.choice(_WORDS)} {rng.choice(_PHRASES)}" for _ in range(10)]
+        results[str(rows)] = {
+            "open_backfill_rows_per_s": round(rows / seed_seconds),
+            "insert": _time_calls(history.add_prompt,
+                                  [(_text(rng, 30), "style", "16:9", _text(rng, 8)) for _ in range(inserts)]),
+            "search": _time_calls(history.search_prompts, [(keyword,) for keyword in keywords]),
+            "get_by_id": _time_calls(history.get_prompt, [(rng.randint(1, rows),) for _ in range(200)]),
+        }
+        history.close()
+    return results
+
+
+def bench_library(workdir, quick):
+    """提示词库在 1k/10k/100k 条时的导入与搜索延迟"""
+    from core.prompt_library import PromptLibrary
+    rng = random.Random(2)
+    results = {}
+    for rows in ((1000, 10000) if quick else (1000, 10000, 100000)):
+        directory = os.path.join(workdir, f"library_{rows}")
+        os.makedirs(directory, exist_ok=True)
+        source = os.path.join(directory, "import.jsonl")
+        with open(source, "w", encoding="utf-8") as f:
+            for i in range(rows):
+                f.write(json.dumps({"category": rng.choice(_PHRASES[:6]), "title": f"{rng.choice(_PHRASES)} {i}",
+                                    "content": f"{_text(rng, 25)} #{i}",
+                                    "tags": ",".join(rng.sample(_WORDS, 3))}, ensure_ascii=False) + "\n")
+        library = PromptLibrary(os.path.join(directory, "prompt_library.json"))
+        started = time.perf_counter()
+        library.import_prompts(source)
+        import_seconds = time.perf_counter() - started
+
+        keywords = [rng.choice(_WORDS) for _ in range(10)] + [rng.choice(_PHRASES) for _ in range(5)] + \
+                   [f"{rng.choice(_WORDS)} {rng.choice(_WORDS)}" for _ in range(5)]
+        results[str(rows)] = {
+            "import_rows_per_s": round(rows / import_seconds),
+            "search": _time_calls(library.search_prompts, [(keyword,) for keyword in keywords]),
+            "search_limit_50": _time_calls(lambda keyword: library.search_prompts(keyword, limit=50),
+                                           [(keyword,) for keyword in keywords]),
+            "suggest": _time_calls(library.suggest_prompts, [(keyword[:2],) for keyword in keywords]),
+            "tag_facets": _time_calls(library.get_tag_facets, [(keyword,) for keyword in keywords[:5]]),
+        }
+        library.close()
+    return results
+
+
+def bench_prompt_expansion(workdir, quick):
+    """提示词展开速度：组合网格惰性展开与批量渲染（行/秒）"""
+    from core.prompt_generator import PromptGenerator
+    config = _make_config(workdir, "http://127.0.0.1:9")  # 不发请求
+    generator = PromptGenerator(config)
+    purpose = next(iter(config.get("purpose_categories", {})))
+    limit = 20000 if quick else 200000
+
+    # 配置中的选项只能组合出几十种提示词，计时太短；把镜头和光照各扩展成若干变体，使网格不少于 limit 行
+    ratios, sizes = list(config.get("ratio_presets", {})), list(config.get("image_sizes", {}))
+    repeats = math.ceil(math.sqrt(limit / (len(ratios) * len(sizes))))
+    dimensions = {
+        "shot_types": [f"{name}, take {i}" for i in range(repeats) for name in config.get("shot_types", {})],
+        "lighting_types": [f"{name}, variant {i}" for i in range(repeats) for name in config.get("lighting_types", {})],
+        "ratio_presets": ratios,
+        "image_sizes": sizes,
+    }
+    grid = generator.prompt_grid("季度销售数据", purpose=purpose, dimensions=dimensions, dedupe=False)
+    started = time.perf_counter()
+    expanded = sum(1 for _ in itertools.islice(grid, limit))
+    grid_seconds = time.perf_counter() - started
+
+    rows = [{"content": f"主题 {i}", "aspect_ratio": "16:9", "image_size": "1K"} for i in range(limit // 2)]
+    started = time.perf_counter()
+    generator.render_many(purpose, rows)
+    render_seconds = time.perf_counter() - started
+    return {
+        "grid": {"rows": expanded, "rows_per_s": round(expanded / grid_seconds)},
+        "render_many": {"rows": len(rows), "rows_per_s": round(len(rows) / render_seconds)},
+    }
+
+
+def bench_image_display(workdir, quick):
+    """预览区显示一张生成图片的耗时：每次打开并全尺寸缩放，与使用预览图缓存对比"""
+    from PIL import Image
+    from core.image_pyramid import DisplayCache
+    canvas_width, canvas_height = 900, 700
+    try:
+        import tkinter as tk
+        from PIL import ImageTk
+        root = tk.Tk()
+        root.withdraw()
+    except Exception:
+        root = None  # 无图形环境时只测试解码和缩放
+
+    results = {}
+    for size in (("1K", "2K") if quick else ("1K", "2K", "4K")):
+        path = os.path.join(workdir, f"display_{size}.png")
+        with open(path, "wb") as f:
+            f.write(make_png(IMAGE_SIZES[size]))
+        samples, photo_samples = [], []
+        for _ in range(3 if quick else 5):
+            started = time.perf_counter()
+            img = Image.open(path)
+            scale = min((canvas_width - 40) / img.width, (canvas_height - 40) / img.height)
+            img = img.resize((int(img.width * scale), int(img.height * scale)), Image.Resampling.LANCZOS)
+            samples.append(time.perf_counter() - started)
+            if root is not None:
+                started = time.perf_counter()
+                ImageTk.PhotoImage(img)
+                photo_samples.append(time.perf_counter() - started)
+        results[size] = {"decode_resize": _timings(samples)}
+        # 预览图缓存：首次加载（解码 + 生成各级缩小版本）与之后窗口大小改变时的缩放
+        cache = DisplayCache(max_size=(1920, 1080))
+        started = time.perf_counter()
+        cache.get(path)
+        results[size]["pyramid_load"] = _timings([time.perf_counter() - started])
+        results[size]["pyramid_resize"] = _time_calls(
+            cache.render, [(path, canvas_width - 40 - step, canvas_height - 40 - step) for step in range(0, 200, 20)])
+        if photo_samples:
+            results[size]["photo_image"] = _timings(photo_samples)
+    if root is not None:
+        root.destroy()
+    else:
+        results["note"] = "无图形环境，未测试 PhotoImage 转换"
+    return results
+
+
+# 启动时应延后导入的模块（在后台线程或第一次使用时导入）
+DEFERRED_MODULES = ("requests", "core.image_generator", "core.history_manager", "core.prompt_library", "pstats")
+
+
+def bench_startup(workdir, quick):
+    """冷启动：新进程中导入界面模块的耗时，以及导入时是否带入了应延后的模块"""
+    code = ("import sys, time\n"
+            "started = time.perf_counter()\n"
+            "import interface.gui\n"
+            "print(time.perf_counter() - started)\n"
+            f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))\n")
+    samples, loaded = [], ""
+    for _ in range(3 if quick else 10):
+        lines = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+                               check=True, timeout=60).stdout.splitlines()
+        samples.append(float(lines[0]))
+        loaded = lines[1] if len(lines) > 1 else ""
+    return {"import_gui": _timings(samples), "deferred_modules_loaded": loaded.split(",") if loaded else []}
+
+
+BENCHMARKS = {
+    "generation": bench_generation,
+    "memory": bench_memory,
+    "history": bench_history,
+    "library": bench_library,
+    "prompt_expansion": bench_prompt_expansion,
+    "image_display": bench_image_display,
+    "startup": bench_startup,
+}
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="离线基准测试")
+    parser.add_argument("--only", help=f"只运行部分项目（逗号分隔）：{','.join(BENCHMARKS)}")
+    parser.add_argument("--quick", action="store_true", help="缩小规模")
+    parser.add_argument("-o", "--output", help="结果文件路径，默认 benchmarks/results/<时间>.json")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知项目: {', '.join(unknown)}")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": args.quick,
+        },
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="infographic-bench-") as workdir:
+        # 缩略图缓存写入临时目录（子进程同样继承）
+        os.environ[CACHE_DIR_ENV] = os.path.join(workdir, "cache")
+        # 日志写入临时目录，不输出到控制台
+        app_logger._logger_instance = app_logger.AppLogger(os.path.join(workdir, "logs"), console=False)
+        for name in names:
+            print(f"[{name}] 运行中...", flush=True)
+            directory = os.path.join(workdir, name)
+            os.makedirs(directory)
+            started = time.perf_counter()
+            report["results"][name] = BENCHMARKS[name](directory, args.quick)
+            print(f"[{name}] 完成，用时 {time.perf_counter() - started:.1f}s", flush=True)
+        app_logger._logger_instance.shutdown()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report["results"], ensure_ascii=False, indent=2))
+    print(f"\n结果已保存: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
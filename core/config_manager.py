@@ -1,30 +1,203 @@
-import json
+import contextlib
 import os
 import sys
+from types import MappingProxyType
+from core.logger import get_logger
+from core.persistence import atomic_write_json, file_lock, file_stamp, load_json, read_json
+from core.prompt_templates import TemplateError, template_fields
+from core.store_watcher import ChangeNotifier
 
-class ConfigManager:
+# 程序运行目录（支持打包后的exe），相对路径的配置项以此为基准
+if getattr(sys, 'frozen', False):
+    # 打包后的exe运行
+    APP_BASE_PATH = os.path.dirname(sys.executable)
+else:
+    # 开发环境运行
+    APP_BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SAVE_PATH = "./output/infographics"
+
+# 配置项类型（缺省的配置项不检查）
+_STRING_KEYS = ("gemini_api_key", "api_base_url", "default_model", "save_path", "language", "metrics_textfile")
+_DICT_KEYS = ("style_categories", "ratio_presets", "ratio_to_resolution", "purpose_categories",
+              "image_sizes", "shot_types", "lighting_types", "art_styles")
+
+
+def validate_config(config):
+    """
+    检查配置结构
+    :return: 问题描述列表，为空表示通过
+    """
+    if not isinstance(config, dict):
+        return ["配置文件顶层必须是对象"]
+    errors = []
+    for key in _STRING_KEYS:
+        if key in config and not isinstance(config[key], str):
+            errors.append(f"{key} 必须是字符串")
+    for key in _DICT_KEYS:
+        if key in config and not isinstance(config[key], dict):
+            errors.append(f"{key} 必须是对象")
+    max_lines = config.get("log_max_lines", 1)
+    if isinstance(max_lines, bool) or not isinstance(max_lines, int) or max_lines < 1:
+        errors.append("log_max_lines 必须是正整数")
+    if not isinstance(config.get("profiling", False), bool):
+        errors.append("profiling 必须是 true 或 false")
+    port = config.get("metrics_port", 0)
+    if isinstance(port, bool) or not isinstance(port, int) or not 0 <= port <= 65535:
+        errors.append("metrics_port 必须是 0-65535 的整数（0 表示不启用）")
+    interval = config.get("metrics_interval", 15)
+    if isinstance(interval, bool) or not isinstance(interval, (int, float)) or interval <= 0:
+        errors.append("metrics_interval 必须是正数")
+    threshold = config.get("stall_threshold_ms", 250)
+    if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or threshold < 0:
+        errors.append("stall_threshold_ms 必须是非负数（0 表示不检测）")
+    presets = config.get("api_presets", [])
+    if not isinstance(presets, list):
+        errors.append("api_presets 必须是列表")
+        presets = []
+    names = set()
+    for i, preset in enumerate(presets):
+        if not isinstance(preset, dict) or not isinstance(preset.get("name"), str):
+            errors.append(f"api_presets[{i}] 缺少名称")
+            continue
+        if preset["name"] in names:
+            errors.append(f"api_presets[{i}] 名称重复：{preset['name']}")
+        names.add(preset["name"])
+    purposes = config.get("purpose_categories", {})
+    for purpose, info in (purposes.items() if isinstance(purposes, dict) else ()):
+        if not isinstance(info, dict) or not isinstance(info.get("template"), str):
+            errors.append(f"purpose_categories.{purpose} 缺少模板")
+            continue
+        defaults = info.get("defaults", {})
+        if not isinstance(defaults, dict):
+            errors.append(f"purpose_categories.{purpose}.defaults 必须是对象")
+            defaults = {}
+        try:
+            template_fields(info["template"])
+            for key, value in defaults.items():
+                if not isinstance(value, str):
+                    errors.append(f"purpose_categories.{purpose}.defaults.{key} 必须是字符串")
+                else:
+                    template_fields(value)
+        except TemplateError as e:
+            errors.append(f"purpose_categories.{purpose}：{str(e)}")
+    return errors
+
+
+def _freeze(value):
+    """转换为只读结构：dict -> MappingProxyType，list -> tuple"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class ConfigSnapshot:
+    """
+    编译后的只读配置快照
+    路径已解析为绝对路径，API预设按名称索引，默认预设已预先确定；
+    配置更新时整体替换，热路径上的读取只是一次属性访问
+    """
+
+    __slots__ = ("values", "save_path", "language", "api_presets", "presets_by_name",
+                 "default_preset", "style_categories", "ratio_presets", "ratio_to_resolution")
+
+    def __init__(self, config):
+        values = {key: _freeze(value) for key, value in config.items()}
+        save_path = values.get("save_path") or DEFAULT_SAVE_PATH
+        if not os.path.isabs(save_path):
+            save_path = os.path.join(APP_BASE_PATH, save_path)
+        if values.get("save_path"):
+            values["save_path"] = save_path
+        presets = values.get("api_presets", ())
+        default_preset = next((p for p in presets if p.get("is_default", False)),
+                              presets[0] if presets else None)
+
+        setattr_ = super().__setattr__
+        setattr_("values", MappingProxyType(values))
+        setattr_("save_path", save_path)
+        setattr_("language", values.get("language", "zh-CN"))
+        setattr_("api_presets", presets)
+        setattr_("presets_by_name", MappingProxyType({p.get("name"): p for p in presets}))
+        setattr_("default_preset", default_preset)
+        setattr_("style_categories", values.get("style_categories", MappingProxyType({})))
+        setattr_("ratio_presets", values.get("ratio_presets", MappingProxyType({})))
+        setattr_("ratio_to_resolution", values.get("ratio_to_resolution", MappingProxyType({})))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot 为只读对象")
+
+
+class ConfigManager(ChangeNotifier):
     def __init__(self, config_path=None):
+        super().__init__()
         if config_path is None:
-            # 获取程序运行目录（支持打包后的exe）
-            if getattr(sys, 'frozen', False):
-                # 打包后的exe运行
-                base_path = os.path.dirname(sys.executable)
-            else:
-                # 开发环境运行
-                base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            config_path = os.path.join(base_path, "config", "config.json")
+            config_path = os.path.join(APP_BASE_PATH, "config", "config.json")
         self.config_path = config_path
-        self.config = self._load_config()
+        self._set_config(self._load_config())
+
+    def _set_config(self, config):
+        """替换配置并重新编译快照（快照整体替换，读取方不会看到中间状态）"""
+        self.config = config
+        self.snapshot = ConfigSnapshot(config)
 
     def _load_config(self):
         """加载配置文件，不存在则生成默认配置"""
         os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
-        if not os.path.exists(self.config_path):
-            default_config = self._get_default_config()
-            self._save_config(default_config)
-            return default_config
-        with open(self.config_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with file_lock(self.config_path):
+            # 先记录文件状态再读取，读取期间被改写时下次检查会再次加载
+            self._config_stamp = file_stamp(self.config_path)
+            config = load_json(self.config_path)
+            if config is None:
+                default_config = self._get_default_config()
+                self._save_config(default_config)
+                return default_config
+        # 启动时一次性报告所有问题（热加载时校验不通过的配置不会被采用）
+        for error in validate_config(config):
+            get_logger().error(f"配置文件问题: {error}")
+        return config
+
+    def _reload_if_changed(self):
+        """
+        配置文件被修改（其他进程或手动编辑）时热加载，返回是否重新加载
+        新配置无法解析或校验不通过时保留当前配置，文件再次修改后重试
+        """
+        if file_stamp(self.config_path) == self._config_stamp:
+            return False
+        with file_lock(self.config_path):
+            stamp = file_stamp(self.config_path)
+            if stamp == self._config_stamp:
+                return False
+            self._config_stamp = stamp
+            if stamp is None:
+                get_logger().warning(f"配置文件不存在，继续使用当前配置: {self.config_path}")
+                return False
+            try:
+                config = read_json(self.config_path)
+            except (OSError, ValueError) as e:
+                get_logger().error(f"配置文件无法解析，继续使用当前配置: {str(e)}")
+                return False
+            errors = validate_config(config)
+            if errors:
+                get_logger().error(f"配置文件校验失败，继续使用当前配置: {'；'.join(errors)}")
+                return False
+            self._set_config(config)
+        get_logger().info("配置文件已重新加载")
+        self._mark_changed()
+        return True
+
+    def refresh(self):
+        """热加载配置文件的修改，有变化时通知订阅者"""
+        self._reload_if_changed()
+        return self._flush_change("config")
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """读-改-写：持有文件锁并先同步最新配置，避免覆盖其他进程的修改"""
+        with file_lock(self.config_path):
+            self._reload_if_changed()
+            yield
 
     def _get_default_config(self):
         """默认配置模板，与 config.json 结构一致"""
@@ -72,87 +245,88 @@ class ConfigManager:
         }
 
     def _save_config(self, config_dict):
-        """保存配置到 JSON 文件"""
-        with open(self.config_path, "w", encoding="utf-8") as f:
-            json.dump(config_dict, f, ensure_ascii=False, indent=4)
+        """保存配置到 JSON 文件（原子写入，保留 .bak 备份）"""
+        with file_lock(self.config_path):
+            atomic_write_json(self.config_path, config_dict, indent=4)
+            self._config_stamp = file_stamp(self.config_path)
 
     def get(self, key, default=None):
-        """获取配置项"""
-        value = self.config.get(key, default)
-        # 如果是 save_path，转换为绝对路径
-        if key == "save_path" and value:
-            if not os.path.isabs(value):
-                # 获取程序运行目录
-                if getattr(sys, 'frozen', False):
-                    base_path = os.path.dirname(sys.executable)
-                else:
-                    base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                value = os.path.join(base_path, value)
-        return value
+        """获取配置项（save_path 已转换为绝对路径；返回值为只读快照，修改请用 update）"""
+        return self.snapshot.values.get(key, default)
 
     def update(self, key, value):
         """更新单个配置项（如 API 密钥）"""
-        self.config[key] = value
-        self._save_config(self.config)
+        with self._locked():
+            config = dict(self.config)
+            config[key] = value
+            self._save_config(config)
+            self._set_config(config)
 
     def get_style_categories(self):
         """获取风格分类字典"""
-        return self.get("style_categories", {})
+        return self.snapshot.style_categories
 
     def get_ratio_presets(self):
         """获取比例预设字典"""
-        return self.get("ratio_presets", {})
+        return self.snapshot.ratio_presets
 
     def get_resolution_by_ratio(self, ratio):
         """根据比例获取对应分辨率"""
-        return self.get("ratio_to_resolution", {}).get(ratio, "1024x768")
+        return self.snapshot.ratio_to_resolution.get(ratio, "1024x768")
 
     def get_api_presets(self):
-        """获取API预设列表"""
-        return self.get("api_presets", [])
+        """获取API预设列表（只读）"""
+        return list(self.snapshot.api_presets)
+
+    def get_api_preset(self, name):
+        """按名称获取API预设"""
+        return self.snapshot.presets_by_name.get(name)
+
+    def _copy_api_presets(self):
+        """可修改的API预设副本（调用方需持有 _locked）"""
+        return [dict(preset) for preset in self.config.get("api_presets", [])]
 
     def add_api_preset(self, name, api_key, api_url, model):
         """添加API预设"""
-        presets = self.get_api_presets()
-        new_preset = {
-            "name": name,
-            "api_key": api_key,
-            "api_url": api_url,
-            "model": model,
-            "is_default": False
-        }
-        presets.append(new_preset)
-        self.update("api_presets", presets)
+        with self._locked():
+            presets = self._copy_api_presets()
+            new_preset = {
+                "name": name,
+                "api_key": api_key,
+                "api_url": api_url,
+                "model": model,
+                "is_default": False
+            }
+            presets.append(new_preset)
+            self.update("api_presets", presets)
 
     def update_api_preset(self, index, name, api_key, api_url, model):
         """更新API预设"""
-        presets = self.get_api_presets()
-        if 0 <= index < len(presets):
-            presets[index]["name"] = name
-            presets[index]["api_key"] = api_key
-            presets[index]["api_url"] = api_url
-            presets[index]["model"] = model
-            self.update("api_presets", presets)
+        with self._locked():
+            presets = self._copy_api_presets()
+            if 0 <= index < len(presets):
+                presets[index]["name"] = name
+                presets[index]["api_key"] = api_key
+                presets[index]["api_url"] = api_url
+                presets[index]["model"] = model
+                self.update("api_presets", presets)
 
     def delete_api_preset(self, index):
         """删除API预设"""
-        presets = self.get_api_presets()
-        if 0 <= index < len(presets):
-            presets.pop(index)
-            self.update("api_presets", presets)
+        with self._locked():
+            presets = self._copy_api_presets()
+            if 0 <= index < len(presets):
+                presets.pop(index)
+                self.update("api_presets", presets)
 
     def set_default_api(self, index):
         """设置默认API"""
-        presets = self.get_api_presets()
-        for i, preset in enumerate(presets):
-            preset["is_default"] = (i == index)
-        self.update("api_presets", presets)
+        with self._locked():
+            presets = self._copy_api_presets()
+            for i, preset in enumerate(presets):
+                preset["is_default"] = (i == index)
+            self.update("api_presets", presets)
 
     def get_default_api_preset(self):
-        """获取默认API预设"""
-        presets = self.get_api_presets()
-        for preset in presets:
-            if preset.get("is_default", False):
-                return preset
-        # 如果没有默认的，返回第一个
-        return presets[0] if presets else None
+        """获取默认API预设（没有标记默认的则为第一个）"""
+        return self.snapshot.default_preset
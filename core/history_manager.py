@@ -1,10 +1,26 @@
-import json
+import contextlib
 import os
+import sqlite3
 import sys
+import threading
 from datetime import datetime
+from core.metrics import STORE_SECONDS
+from core.persistence import atomic_write_json, file_lock, file_stamp, load_json
+from core.store_watcher import ChangeNotifier, RecordChanges
+from core.text_index import to_index_text, build_match_query, fts5_available
 
-class HistoryManager:
-    def __init__(self, history_path=None):
+# 默认保留的图片记录条数（配置项 image_history_limit，0 表示不限）
+DEFAULT_IMAGE_HISTORY_LIMIT = 100
+
+
+class HistoryManager(ChangeNotifier):
+    def __init__(self, history_path=None, image_limit=DEFAULT_IMAGE_HISTORY_LIMIT):
+        """
+        :param history_path: 历史记录文件路径，默认为程序目录下的 data/history.json
+        :param image_limit: 保留的图片记录条数（图库显示的上限），0 表示不限
+        """
+        super().__init__()
+        self.image_limit = image_limit
         if history_path is None:
             # 获取程序运行目录（支持打包后的exe）
             if getattr(sys, 'frozen', False):
@@ -15,117 +31,340 @@ class HistoryManager:
                 base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             history_path = os.path.join(base_path, "data", "history.json")
         self.history_path = history_path
+        # 全文检索库：保存所有提示词的完整文本（不受100条上限影响）
+        self.index_path = os.path.join(os.path.dirname(history_path), "history_index.db")
         self.history = self._load_history()
+        self._index_lock = threading.RLock()
+        self._init_search_index()
 
+    @STORE_SECONDS.timed(store="history", operation="load")
     def _load_history(self):
         """加载历史记录"""
         os.makedirs(os.path.dirname(self.history_path), exist_ok=True)
-        if not os.path.exists(self.history_path):
-            return {"prompts": [], "images": [], "edit_sessions": []}
-        try:
-            with open(self.history_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                # 确保有edit_sessions字段
-                if "edit_sessions" not in data:
-                    data["edit_sessions"] = []
-                return data
-        except:
+        with file_lock(self.history_path):
+            # 先记录文件状态再读取，读取期间被改写时下次检查会再次加载
+            self._history_stamp = file_stamp(self.history_path)
+            # 文件损坏时 load_json 会尝试从备份恢复，并保留损坏文件
+            data = load_json(self.history_path)
+        if not isinstance(data, dict):
             return {"prompts": [], "images": [], "edit_sessions": []}
+        data.setdefault("prompts", [])
+        data.setdefault("images", [])
+        # 确保有edit_sessions字段
+        data.setdefault("edit_sessions", [])
+        return data
 
+    @STORE_SECONDS.timed(store="history", operation="save")
     def _save_history(self):
-        """保存历史记录"""
-        os.makedirs(os.path.dirname(self.history_path), exist_ok=True)
-        with open(self.history_path, "w", encoding="utf-8") as f:
-            json.dump(self.history, f, ensure_ascii=False, indent=4)
+        """保存历史记录（原子写入，保留 .bak 备份）"""
+        with file_lock(self.history_path):
+            atomic_write_json(self.history_path, self.history, indent=4)
+            self._history_stamp = file_stamp(self.history_path)
+
+    def _reload_if_changed(self):
+        """历史记录文件被其他进程改写时重新加载，返回是否重新加载"""
+        if file_stamp(self.history_path) == self._history_stamp:
+            return False
+        with file_lock(self.history_path):
+            if file_stamp(self.history_path) == self._history_stamp:
+                return False
+            old_history, self.history = self.history, self._load_history()
+        self._mark_changed()
+        for collection in ("prompts", "images"):
+            self._notify_records(collection, RecordChanges.diff(old_history[collection], self.history[collection]))
+        return True
+
+    def refresh(self):
+        """同步其他进程对历史记录的修改，有变化时通知订阅者"""
+        self._reload_if_changed()
+        return self._flush_change("history")
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """读-改-写：持有文件锁并先同步最新历史记录，避免覆盖其他进程的修改"""
+        with file_lock(self.history_path):
+            self._reload_if_changed()
+            yield
+
+    @staticmethod
+    def _next_id(records):
+        return max((r["id"] for r in records), default=0) + 1
+
+    def _init_search_index(self):
+        """打开全文检索库，首次使用时从历史记录回填"""
+        self._index_conn = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._index_conn.execute("PRAGMA journal_mode=WAL")
+        self._index_conn.execute("PRAGMA synchronous=NORMAL")
+        self._fts_enabled = fts5_available(self._index_conn)
+        with self._index_lock, self._index_conn:
+            self._index_conn.execute(
+                "CREATE TABLE IF NOT EXISTS prompt_archive ("
+                "id INTEGER PRIMARY KEY, timestamp TEXT, prompt TEXT, "
+                "style TEXT, ratio TEXT, content TEXT)"
+            )
+            if self._fts_enabled:
+                self._index_conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS prompt_fts "
+                    "USING fts5(prompt, content, style)"
+                )
+            archived = self._index_conn.execute("SELECT COUNT(*) FROM prompt_archive").fetchone()[0]
+            renumbered = 0
+            if archived == 0:
+                # 旧版历史记录（最早的先写入）
+                renumbered = self._renumber_duplicate_prompts(self.history["prompts"])
+                for record in reversed(self.history["prompts"]):
+                    self._index_prompt(record)
+            max_archived = self._index_conn.execute("SELECT MAX(id) FROM prompt_archive").fetchone()[0] or 0
+        self._next_prompt_id = max(max_archived + 1, self._next_id(self.history["prompts"]))
+        if renumbered:
+            # 检索库事务提交后再取文件锁写回，不在持有数据库写锁时等待其他进程
+            with self._locked():
+                self._renumber_duplicate_prompts(self.history["prompts"])
+                self._save_history()
+            from core.logger import get_logger
+            get_logger().warning(f"历史记录中有 {renumbered} 条提示词ID重复，已重新编号")
+
+    @classmethod
+    def _renumber_duplicate_prompts(cls, records):
+        """
+        旧版按记录条数分配ID，裁剪到100条后会重复（回填检索库时重复ID的记录会被丢弃）：
+        保留最新一条的ID，较早的改用新ID
+        :param records: 提示词记录（新的在前），原地修改
+        :return: 重新编号的条数
+        """
+        seen = set()
+        next_id = cls._next_id(records)
+        renumbered = 0
+        for record in records:
+            if record["id"] in seen:
+                record["id"] = next_id
+                next_id += 1
+                renumbered += 1
+            seen.add(record["id"])
+        return renumbered
+
+    def _index_prompt(self, record):
+        """写入检索库（调用方负责事务）"""
+        cursor = self._index_conn.execute(
+            "INSERT OR IGNORE INTO prompt_archive (id, timestamp, prompt, style, ratio, content) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (record["id"], record["timestamp"], record["prompt"],
+             record["style"], record["ratio"], record["content"])
+        )
+        if self._fts_enabled and cursor.rowcount:
+            self._index_conn.execute(
+                "INSERT INTO prompt_fts (rowid, prompt, content, style) VALUES (?, ?, ?, ?)",
+                (record["id"], to_index_text(record["prompt"]),
+                 to_index_text(record["content"]), to_index_text(record["style"]))
+            )
 
     def add_prompt(self, prompt, style, ratio, content):
-        """添加提示词记录"""
-        record = {
-            "id": len(self.history["prompts"]) + 1,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "prompt": prompt,
-            "style": style,
-            "ratio": ratio,
-            "content": content[:100] + "..." if len(content) > 100 else content
-        }
-        self.history["prompts"].insert(0, record)  # 最新的在前面
-        # 只保留最近100条
-        if len(self.history["prompts"]) > 100:
-            self.history["prompts"] = self.history["prompts"][:100]
-        self._save_history()
+        """添加提示词记录（完整保存提示词与内容）"""
+        with self._locked(), self._index_lock:
+            # 其他进程可能已写入更大的ID，以检索库中的最大ID为准
+            max_archived = self._index_conn.execute("SELECT MAX(id) FROM prompt_archive").fetchone()[0] or 0
+            record = {
+                "id": max(self._next_prompt_id, max_archived + 1, self._next_id(self.history["prompts"])),
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "prompt": prompt,
+                "style": style,
+                "ratio": ratio,
+                "content": content
+            }
+            self._next_prompt_id = record["id"] + 1
+            self.history["prompts"].insert(0, record)  # 最新的在前面
+            # 只保留最近100条（更早的记录仍可通过 search_prompts 检索）
+            trimmed = [r["id"] for r in self.history["prompts"][100:]]
+            if trimmed:
+                self.history["prompts"] = self.history["prompts"][:100]
+            self._save_history()
+            with self._index_conn:
+                self._index_prompt(record)
+        self._notify_records("prompts", RecordChanges(added=[record["id"]], removed=trimmed))
         return record["id"]
 
     def add_image(self, prompt, image_path, style, ratio):
         """添加图片生成记录"""
-        record = {
-            "id": len(self.history["images"]) + 1,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "prompt": prompt[:100] + "..." if len(prompt) > 100 else prompt,
-            "image_path": image_path,
-            "style": style,
-            "ratio": ratio,
-            "exists": os.path.exists(image_path)
-        }
-        self.history["images"].insert(0, record)  # 最新的在前面
-        # 只保留最近100条
-        if len(self.history["images"]) > 100:
-            self.history["images"] = self.history["images"][:100]
-        self._save_history()
+        with self._locked():
+            record = {
+                "id": self._next_id(self.history["images"]),
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "prompt": prompt,
+                "image_path": image_path,
+                "style": style,
+                "ratio": ratio,
+                "exists": os.path.exists(image_path)
+            }
+            self.history["images"].insert(0, record)  # 最新的在前面
+            # 只保留最近 image_limit 条
+            trimmed = [r["id"] for r in self.history["images"][self.image_limit:]] if self.image_limit else []
+            if trimmed:
+                self.history["images"] = self.history["images"][:self.image_limit]
+            self._save_history()
+        self._notify_records("images", RecordChanges(added=[record["id"]], removed=trimmed))
         return record["id"]
 
     def get_prompt_history(self, limit=50):
         """获取提示词历史记录"""
+        self._reload_if_changed()
         return self.history["prompts"][:limit]
 
-    def get_image_history(self, limit=50):
-        """获取图片生成历史记录"""
-        # 更新文件存在状态
-        for record in self.history["images"]:
-            record["exists"] = os.path.exists(record["image_path"])
-        self._save_history()
+    def get_prompt(self, record_id):
+        """根据ID获取提示词记录（含已超出最近100条的历史）"""
+        self._reload_if_changed()
+        for record in self.history["prompts"]:
+            if record["id"] == record_id:
+                return record
+        with self._index_lock:
+            row = self._index_conn.execute(
+                "SELECT id, timestamp, prompt, style, ratio, content FROM prompt_archive WHERE id = ?",
+                (record_id,)
+            ).fetchone()
+        return self._row_to_prompt(row) if row else None
+
+    @STORE_SECONDS.timed(store="history", operation="search")
+    def search_prompts(self, keyword, limit=50):
+        """
+        全文检索提示词历史（支持中英文）
+        :param keyword: 关键词，多个词之间为“且”关系，最后一个英文词按前缀匹配
+        :param limit: 最多返回条数
+        :return: 按相关度排序的记录列表
+        """
+        with self._index_lock:
+            if self._fts_enabled:
+                match = build_match_query(keyword, prefix=True)
+                if not match:
+                    return []
+                rows = self._index_conn.execute(
+                    "SELECT a.id, a.timestamp, a.prompt, a.style, a.ratio, a.content "
+                    "FROM prompt_fts JOIN prompt_archive a ON a.id = prompt_fts.rowid "
+                    "WHERE prompt_fts MATCH ? ORDER BY bm25(prompt_fts, 1.0, 2.0, 0.5) LIMIT ?",
+                    (match, limit)
+                ).fetchall()
+            else:
+                # SQLite 未编译 FTS5 时退化为子串匹配
+                keyword = keyword.strip()
+                if not keyword:
+                    return []
+                pattern = f"%{keyword}%"
+                rows = self._index_conn.execute(
+                    "SELECT id, timestamp, prompt, style, ratio, content FROM prompt_archive "
+                    "WHERE prompt LIKE ? OR content LIKE ? OR style LIKE ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+                    (pattern, pattern, pattern, limit)
+                ).fetchall()
+        return [self._row_to_prompt(row) for row in rows]
+
+    @staticmethod
+    def _row_to_prompt(row):
+        return dict(zip(("id", "timestamp", "prompt", "style", "ratio", "content"), row))
+
+    def get_image_history(self, limit=50, check_files=True):
+        """
+        获取图片生成历史记录
+        :param limit: 最多返回条数，None 表示全部
+        :param check_files: 是否先更新返回记录的文件存在状态（逐个检查文件，记录多时应改在后台调用 check_image_files）
+        """
+        self._reload_if_changed()
+        if check_files:
+            self.check_image_files(self.history["images"][:limit])
         return self.history["images"][:limit]
 
+    def check_image_files(self, records=None):
+        """
+        更新图片记录的文件存在状态（有变化时才写回，避免多进程下无谓的写入竞争）
+        :param records: 要检查的记录，默认全部
+        :return: 状态变化的记录ID列表
+        """
+        if records is None:
+            self._reload_if_changed()
+            records = list(self.history["images"])
+        changed = {record["id"] for record in records
+                   if record.get("exists") != os.path.exists(record["image_path"])}
+        if not changed:
+            return []
+        with self._locked():
+            updated = []
+            for record in self.history["images"]:
+                if record["id"] not in changed:
+                    continue
+                exists = os.path.exists(record["image_path"])
+                if record.get("exists") != exists:
+                    record["exists"] = exists
+                    updated.append(record["id"])
+            if updated:
+                self._save_history()
+        self._notify_records("images", RecordChanges(updated=updated))
+        return updated
+
+    def get_images(self, record_ids):
+        """根据ID获取图片记录（按历史顺序，新的在前；不检查文件是否存在）"""
+        self._reload_if_changed()
+        record_ids = set(record_ids)
+        return [record for record in self.history["images"] if record["id"] in record_ids]
+
+    def close(self):
+        """关闭检索库"""
+        with self._index_lock:
+            self._index_conn.close()
+
     def delete_prompt(self, record_id):
         """删除提示词记录"""
-        self.history["prompts"] = [r for r in self.history["prompts"] if r["id"] != record_id]
-        self._save_history()
+        with self._locked():
+            self.history["prompts"] = [r for r in self.history["prompts"] if r["id"] != record_id]
+            self._save_history()
+        with self._index_lock, self._index_conn:
+            self._index_conn.execute("DELETE FROM prompt_archive WHERE id = ?", (record_id,))
+            if self._fts_enabled:
+                self._index_conn.execute("DELETE FROM prompt_fts WHERE rowid = ?", (record_id,))
+        self._notify_records("prompts", RecordChanges(removed=[record_id]))
 
     def delete_image(self, record_id):
         """删除图片记录"""
-        self.history["images"] = [r for r in self.history["images"] if r["id"] != record_id]
-        self._save_history()
+        with self._locked():
+            self.history["images"] = [r for r in self.history["images"] if r["id"] != record_id]
+            self._save_history()
+        self._notify_records("images", RecordChanges(removed=[record_id]))
 
     def clear_all(self):
         """清空所有历史记录"""
-        self.history = {"prompts": [], "images": [], "edit_sessions": []}
-        self._save_history()
+        with file_lock(self.history_path):
+            self.history = {"prompts": [], "images": [], "edit_sessions": []}
+            self._save_history()
+        with self._index_lock, self._index_conn:
+            self._index_conn.execute("DELETE FROM prompt_archive")
+            if self._fts_enabled:
+                self._index_conn.execute("DELETE FROM prompt_fts")
+        self._notify_records("prompts", RecordChanges(reset=True))
+        self._notify_records("images", RecordChanges(reset=True))
     
     def save_edit_session(self, session_data):
         """保存编辑会话"""
         if not session_data.get('chat_history'):
             return  # 没有对话历史，不保存
         
-        record = {
-            "id": len(self.history.get("edit_sessions", [])) + 1,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "original_image_path": session_data.get('original_image_path'),
-            "current_image_path": session_data.get('current_image_path'),
-            "chat_history": session_data.get('chat_history', []),
-            "images": session_data.get('images', [])
-        }
-        
-        if "edit_sessions" not in self.history:
-            self.history["edit_sessions"] = []
-        
-        self.history["edit_sessions"].insert(0, record)
-        # 只保留最近10个会话
-        if len(self.history["edit_sessions"]) > 10:
-            self.history["edit_sessions"] = self.history["edit_sessions"][:10]
-        self._save_history()
+        with self._locked():
+            if "edit_sessions" not in self.history:
+                self.history["edit_sessions"] = []
+
+            record = {
+                "id": self._next_id(self.history["edit_sessions"]),
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "original_image_path": session_data.get('original_image_path'),
+                "current_image_path": session_data.get('current_image_path'),
+                "chat_history": session_data.get('chat_history', []),
+                "images": session_data.get('images', [])
+            }
+
+            self.history["edit_sessions"].insert(0, record)
+            # 只保留最近10个会话
+            if len(self.history["edit_sessions"]) > 10:
+                self.history["edit_sessions"] = self.history["edit_sessions"][:10]
+            self._save_history()
         return record["id"]
     
     def get_latest_edit_session(self):
         """获取最新的编辑会话"""
+        self._reload_if_changed()
         sessions = self.history.get("edit_sessions", [])
         if sessions:
             return sessions[0]
@@ -133,5 +372,6 @@ class HistoryManager:
     
     def clear_edit_sessions(self):
         """清空编辑会话历史"""
-        self.history["edit_sessions"] = []
-        self._save_history()
+        with self._locked():
+            self.history["edit_sessions"] = []
+            self._save_history()
@@ -1,28 +1,169 @@
+import functools
+import itertools
 import os
+import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 from core.logger import get_logger
+from core.metrics import REGISTRY
+from core.thumbnail_cache import get_thumbnail_cache
+
+# 生成流程各阶段耗时：build_payload、encode_reference、connect（DNS+TCP）、tls、ttfb、
+# download、parse、decode、save，以及重试等待 retry_wait
+STAGE_SECONDS = REGISTRY.histogram("infographic_generation_stage_seconds",
+                                   "图片生成各阶段耗时（秒）", labelnames=("stage",))
+REQUESTS = REGISTRY.counter("infographic_generation_requests_total",
+                            "图片生成请求数", labelnames=("preset", "model", "status"))
+RETRIES = REGISTRY.counter("infographic_generation_retries_total",
+                           "超时/连接失败后的重试次数", labelnames=("preset", "model"))
+BYTES_SENT = REGISTRY.counter("infographic_http_request_bytes_total",
+                              "API请求体字节数", labelnames=("preset", "model"))
+BYTES_RECEIVED = REGISTRY.counter("infographic_http_response_bytes_total",
+                                  "API响应体字节数", labelnames=("preset", "model"))
+IN_FLIGHT = REGISTRY.gauge("infographic_generation_in_flight", "正在进行的生成请求数")
+QUEUE_DEPTH = REGISTRY.gauge("infographic_generation_queue_depth", "批量生成中排队等待的任务数")
+
+_connect_timing = threading.local()  # 当前线程累计的建连耗时
+_stage_timing = threading.local()  # 当前线程所处的阶段及开始时间
+
+
+def _record_connect(stage, seconds):
+    """记录建连耗时，同时累加到当前线程（所在阶段据此扣除，避免重复计算）"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    _connect_timing.seconds = getattr(_connect_timing, "seconds", 0.0) + seconds
+
+
+class _ConnectTimingMixin:
+    def _new_conn(self):
+        started = time.perf_counter()
+        sock = super()._new_conn()
+        self._tcp_seconds = time.perf_counter() - started
+        _record_connect("connect", self._tcp_seconds)
+        return sock
+
+
+class _TimedHTTPConnection(_ConnectTimingMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_ConnectTimingMixin, HTTPSConnection):
+    def connect(self):
+        self._tcp_seconds = 0.0
+        started = time.perf_counter()
+        super().connect()
+        _record_connect("tls", time.perf_counter() - started - self._tcp_seconds)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """新建连接时分别记录 TCP 连接（含 DNS 解析）和 TLS 握手耗时"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+def _request_scope(method):
+    """
+    在请求上下文中执行生成方法：先同步配置，期间的日志都带上请求ID、预设和模型
+    嵌套调用（如参考图生成降级为纯文本生成）计为同一个请求
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.reload_config()
+        if getattr(_stage_timing, "active", False):
+            return method(self, *args, **kwargs)
+        labels = self._metric_labels()
+        _stage_timing.active = True
+        IN_FLIGHT.inc()
+        status = "error"
+        try:
+            with self.logger.request(**labels):
+                try:
+                    result = method(self, *args, **kwargs)
+                    status = "ok"
+                    return result
+                finally:
+                    self._stage(None)
+        finally:
+            _stage_timing.active = False
+            IN_FLIGHT.dec()
+            REQUESTS.inc(status=status, **labels)
+    return wrapper
+
 
 class ImageGenerator:
     def __init__(self, config_manager, api_preset=None):
         self.config = config_manager
         self.api_preset = api_preset
         self.logger = get_logger()
+        self.session = None
+        self._reload_lock = threading.Lock()
+        self._snapshot = config_manager.snapshot
+        self._settings = self._resolve_settings()
         self._init_api()
 
+    def _resolve_settings(self):
+        """解析本生成器使用的API设置：(api_key, api_url, model)"""
+        if self.api_preset:
+            return (self.api_preset.get("api_key"),
+                    self.api_preset.get("api_url", "https://xiaoai.plus"),
+                    self.api_preset.get("model", "gemini-3-pro-image-preview"))
+        values = self._snapshot.values
+        return (values.get("gemini_api_key"),
+                values.get("api_base_url", "https://xiaoai.plus"),
+                values.get("default_model", "gemini-3-pro-image-preview"))
+
+    def reload_config(self):
+        """
+        配置热更新后重新解析API设置（每次请求前调用）
+        先检查配置文件是否被修改（只比较文件状态，批处理等没有界面轮询的进程也能生效），
+        只有本生成器用到的设置变化时才重建连接
+        :return: 是否重新初始化
+        """
+        self.config._reload_if_changed()
+        snapshot = self.config.snapshot
+        if snapshot is self._snapshot:
+            return False
+        with self._reload_lock:
+            if snapshot is self._snapshot:
+                return False
+            self._snapshot = snapshot
+            if self.api_preset:
+                name = self.api_preset.get("name")
+                if name not in snapshot.presets_by_name:
+                    self.logger.warning(f"API预设 {name} 已从配置中移除，继续使用原设置")
+                    return False
+                self.api_preset = snapshot.presets_by_name[name]
+            settings = self._resolve_settings()
+            if settings == self._settings:
+                return False
+            self._settings = settings
+            self.logger.info("API配置已更新，重新初始化生成器")
+            self._init_api()
+            return True
+
     def _init_api(self):
         """初始化 API 配置"""
-        # 如果指定了API预设，使用预设配置
+        self.api_key, self.api_url, self.model = self._settings
         if self.api_preset:
-            self.api_key = self.api_preset.get("api_key")
-            self.api_url = self.api_preset.get("api_url", "https://xiaoai.plus")
-            self.model = self.api_preset.get("model", "gemini-3-pro-image-preview")
             self.logger.info(f"使用API预设: {self.api_preset.get('name', '未命名')}")
         else:
-            # 否则使用配置文件中的配置
-            self.api_key = self.config.get("gemini_api_key")
-            self.api_url = self.config.get("api_base_url", "https://xiaoai.plus")
-            self.model = self.config.get("default_model", "gemini-3-pro-image-preview")
             self.logger.info("使用默认API配置")
         
         if not self.api_key:
@@ -47,6 +188,54 @@ class ImageGenerator:
         
         self.logger.info(f"API URL: {self.api_url}, Model: {self.model}")
 
+        # 复用连接（同一API地址的请求走连接池）；设置变化时重建
+        if self.session is not None:
+            self.session.close()
+        self.session = requests.Session()
+        adapter = _TimedHTTPAdapter()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _metric_labels(self):
+        return {"preset": (self.api_preset.get('name') if self.api_preset else None) or "",
+                "model": self.model or ""}
+
+    def _count_transfer(self, response):
+        """统计一次HTTP交换的上传/下载字节数（会读取完整响应体）"""
+        labels = self._metric_labels()
+        BYTES_SENT.inc(len(response.request.body or b""), **labels)
+        size = len(response.content)
+        BYTES_RECEIVED.inc(size, **labels)
+        return size
+
+    def _stage(self, name):
+        """
+        进入新阶段：记录上一阶段的耗时（扣除期间的建连时间，建连单独记为 connect/tls），并标记日志阶段
+        :param name: 阶段名，None 表示请求结束
+        """
+        now = time.perf_counter()
+        connect_seconds = getattr(_connect_timing, "seconds", 0.0)
+        previous = getattr(_stage_timing, "name", None)
+        if previous is not None:
+            elapsed = now - _stage_timing.started - (connect_seconds - _stage_timing.connect_seconds)
+            STAGE_SECONDS.observe(max(elapsed, 0.0), stage=previous)
+        _stage_timing.name, _stage_timing.started, _stage_timing.connect_seconds = name, now, connect_seconds
+        if name is not None:
+            self.logger.set_stage(name)
+
+    def _cache_thumbnails(self, path):
+        """保存后交给缩略图缓存的后台线程生成缩略图，界面显示时不必再解码原图（不占用生成请求的时间）"""
+        get_thumbnail_cache().prefill([path])
+
+    @staticmethod
+    def stage_latency():
+        """
+        生成流程各阶段耗时汇总（进程内所有生成器共享）
+        :return: {阶段: {"count", "avg_ms", "p50_ms", "p95_ms", "p99_ms"}}
+        """
+        return {key[0]: value for key, value in STAGE_SECONDS.summary().items()}
+
+    @_request_scope
     def generate(self, prompt, save_name=None):
         """
         调用 API 生成图片并保存
@@ -54,6 +243,7 @@ class ImageGenerator:
         :param save_name: 自定义文件名，默认自动生成
         :return: 图片保存路径
         """
+        self._stage("build_payload")
         self.logger.info("开始生成图片")
         self.logger.debug(f"提示词: {prompt[:100]}...")
         
@@ -110,11 +300,14 @@ class ImageGenerator:
                     if retry_count > 0:
                         self.logger.warning(f"第 {retry_count} 次重试...")
                     
-                    response = requests.post(
+                    # stream=True：收到响应头即返回，响应体在 download 阶段读取
+                    self._stage("ttfb")
+                    response = self.session.post(
                         api_endpoint,
                         headers=headers,
                         json=data,
-                        timeout=(30, 180)  # 连接超时30秒，读取超时180秒
+                        timeout=(30, 180),  # 连接超时30秒，读取超时180秒
+                        stream=True
                     )
                     
                     self.logger.info(f"API响应状态码: {response.status_code}")
@@ -124,9 +317,10 @@ class ImageGenerator:
                     last_error = e
                     retry_count += 1
                     if retry_count <= max_retries:
+                        RETRIES.inc(**self._metric_labels())
                         wait_time = retry_count * 2  # 递增等待时间
                         self.logger.warning(f"请求超时/连接失败，{wait_time}秒后重试...")
-                        import time
+                        self._stage("retry_wait")
                         time.sleep(wait_time)
                     else:
                         raise
@@ -136,11 +330,15 @@ class ImageGenerator:
                 self.logger.error(error_msg)
                 raise RuntimeError(error_msg)
             
+            self._stage("download")
+            self.logger.debug(f"响应体大小: {self._count_transfer(response)} 字节")
+            
             if response.status_code != 200:
                 error_msg = f"API请求失败: {response.status_code} - {response.text[:200]}"
                 self.logger.error(error_msg)
                 raise RuntimeError(error_msg)
             
+            self._stage("parse")
             result = response.json()
             self.logger.debug(f"响应JSON键: {list(result.keys())}")
             
@@ -164,11 +362,14 @@ class ImageGenerator:
                 elif "url" in image_obj:
                     self.logger.info(f"收到图片URL: {image_obj['url'][:50]}...")
                     # 从URL下载图片
-                    img_response = requests.get(image_obj["url"], timeout=60)
+                    self._stage("download")
+                    img_response = self.session.get(image_obj["url"], timeout=60)
+                    self._count_transfer(img_response)
                     if img_response.status_code == 200:
                         image_bytes = img_response.content
                         # 直接保存
-                        save_path = self.config.get("save_path", "./output/infographics")
+                        self._stage("save")
+                        save_path = self.config.snapshot.save_path
                         os.makedirs(save_path, exist_ok=True)
                         if not save_name:
                             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -177,6 +378,7 @@ class ImageGenerator:
                         
                         with open(full_path, "wb") as f:
                             f.write(image_bytes)
+                        self._cache_thumbnails(full_path)
                         
                         self.logger.success(f"图片已保存: {full_path}")
                         return full_path
@@ -236,11 +438,13 @@ class ImageGenerator:
             
             # 获取base64编码的图片数据
             import base64
+            self._stage("decode")
             self.logger.info(f"正在解码图片数据（{len(image_data)}字符）")
             image_bytes = base64.b64decode(image_data)
             
             # 处理保存路径
-            save_path = self.config.get("save_path", "./output/infographics")
+            self._stage("save")
+            save_path = self.config.snapshot.save_path
             os.makedirs(save_path, exist_ok=True)
             if not save_name:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -252,6 +456,7 @@ class ImageGenerator:
             # 保存图片
             with open(full_path, "wb") as f:
                 f.write(image_bytes)
+            self._cache_thumbnails(full_path)
             
             self.logger.success(f"图片生成成功！保存到: {save_name}")
             return full_path
@@ -271,6 +476,37 @@ class ImageGenerator:
             self.logger.debug(traceback.format_exc())
             raise RuntimeError(error_msg)
     
+    def generate_many(self, items, max_workers=4, name_prefix="batch"):
+        """
+        批量生成图片（流式消费输入，同时在途的任务不超过 max_workers 的两倍）
+        可直接接收 PromptGenerator.prompt_grid() 的迭代结果，整个网格不需要事先展开
+        :param items: (标识, 提示词) 序列，标识原样返回（如组合字典）
+        :param max_workers: 并发请求数
+        :param name_prefix: 文件名前缀，文件名为 <前缀>_<时间戳>_<序号>.png
+        :return: 生成器，按完成顺序产出 (标识, 图片路径, 错误信息)，成功时错误信息为 None
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        items = iter(enumerate(items, 1))
+
+        def run(number, prompt):
+            QUEUE_DEPTH.dec()
+            return self.generate(prompt, save_name=f"{name_prefix}_{timestamp}_{number:05d}.png")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {}
+            while True:
+                for number, (key, prompt) in itertools.islice(items, max_workers * 2 - len(pending)):
+                    QUEUE_DEPTH.inc()
+                    pending[executor.submit(run, number, prompt)] = key
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = pending.pop(future)
+                    error = future.exception()
+                    yield key, (None if error else future.result()), (str(error) if error else None)
+
+    @_request_scope
     def generate_with_reference(self, prompt, reference_images, reference_mode="full", save_name=None):
         """
         使用参考图片进行创作（参考图片+提示词 -> 新图片）
@@ -288,6 +524,7 @@ class ImageGenerator:
             reference_images = [reference_images]
         
         # 将所有PIL Image转换为base64
+        self._stage("encode_reference")
         images_base64 = []
         for ref_img in reference_images:
             buffer = io.BytesIO()
@@ -296,12 +533,13 @@ class ImageGenerator:
             images_base64.append(image_base64)
         
         # 判断API格式
+        self._stage("build_payload")
         is_openai_format = "nano-banana" in self.model.lower() or "dall-e" in self.model.lower() or "dalle" in self.model.lower()
         
         if is_openai_format:
             # OpenAI格式（nano-banana等）不直接支持参考图片
             # 提示用户或降级为纯文本生成
-            print("[警告] 当前模型不支持参考图片功能，将仅使用提示词生成")
+            self.logger.warning("当前模型不支持参考图片功能，将仅使用提示词生成")
             return self.generate(prompt, save_name)
         else:
             # Gemini格式支持图片+文本输入
@@ -376,11 +614,14 @@ Important:
                         if retry_count > 0:
                             self.logger.warning(f"第 {retry_count} 次重试...")
                         
-                        response = requests.post(
+                        # stream=True：收到响应头即返回，响应体在 download 阶段读取
+                        self._stage("ttfb")
+                        response = self.session.post(
                             api_endpoint,
                             headers=headers,
                             json=data,
-                            timeout=(30, 200)  # 连接超时30秒，读取超时200秒（参考图片需要更长时间）
+                            timeout=(30, 200),  # 连接超时30秒，读取超时200秒（参考图片需要更长时间）
+                            stream=True
                         )
                         
                         self.logger.info(f"API响应状态码: {response.status_code}")
@@ -390,9 +631,10 @@ Important:
                         last_error = e
                         retry_count += 1
                         if retry_count <= max_retries:
+                            RETRIES.inc(**self._metric_labels())
                             wait_time = retry_count * 3  # 递增等待时间
                             self.logger.warning(f"请求超时/连接失败，{wait_time}秒后重试...")
-                            import time
+                            self._stage("retry_wait")
                             time.sleep(wait_time)
                         else:
                             raise
@@ -402,11 +644,15 @@ Important:
                     self.logger.error(error_msg)
                     raise RuntimeError(error_msg)
                 
+                self._stage("download")
+                self.logger.debug(f"响应体大小: {self._count_transfer(response)} 字节")
+                
                 if response.status_code != 200:
                     error_msg = f"API请求失败: {response.status_code} - {response.text[:200]}"
                     self.logger.error(error_msg)
                     raise RuntimeError(error_msg)
                 
+                self._stage("parse")
                 result = response.json()
                 self.logger.debug(f"响应JSON键: {list(result.keys())}")
                 
@@ -439,10 +685,12 @@ Important:
                     raise RuntimeError(error_msg)
                 
                 # 解码并保存
+                self._stage("decode")
                 self.logger.info(f"正在解码图片数据（{len(image_data)}字符）")
                 image_bytes = base64.b64decode(image_data)
                 
-                save_path = self.config.get("save_path", "./output/infographics")
+                self._stage("save")
+                save_path = self.config.snapshot.save_path
                 os.makedirs(save_path, exist_ok=True)
                 if not save_name:
                     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -451,6 +699,7 @@ Important:
                 
                 with open(full_path, "wb") as f:
                     f.write(image_bytes)
+                self._cache_thumbnails(full_path)
                 
                 self.logger.success(f"参考图片生成成功！保存到: {save_name}")
                 return full_path
@@ -470,6 +719,7 @@ Important:
                 self.logger.debug(traceback.format_exc())
                 raise RuntimeError(error_msg)
     
+    @_request_scope
     def generate_with_image(self, prompt, input_image, save_name=None):
         """
         使用输入图片进行编辑生成（图片到图片编辑）
@@ -482,9 +732,11 @@ Important:
         import io
         
         # 将PIL Image转换为base64
+        self._stage("encode_reference")
         buffer = io.BytesIO()
         input_image.save(buffer, format='PNG')
         image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        self._stage("build_payload")
         
         # 判断API格式
         is_openai_format = "nano-banana" in self.model.lower()
@@ -522,26 +774,29 @@ Important:
             api_endpoint = f"{self.api_url}/v1beta/models/{self.model}:generateContent"
             
             try:
-                print(f"\n[调试] 图片编辑API调用")
-                print(f"[调试] API端点: {api_endpoint}")
-                print(f"[调试] 提示词: {prompt}")
-                print(f"[调试] 输入图片base64长度: {len(image_base64)} 字符")
+                self.logger.info(f"图片编辑API调用: {api_endpoint}")
+                self.logger.debug(f"提示词: {prompt[:100]}...")
+                self.logger.debug(f"输入图片base64长度: {len(image_base64)} 字符")
                 
-                response = requests.post(
+                self._stage("ttfb")
+                response = self.session.post(
                     api_endpoint,
                     headers=headers,
                     json=data,
-                    timeout=120
+                    timeout=120,
+                    stream=True
                 )
+                self._stage("download")
+                self._count_transfer(response)
                 
-                print(f"[调试] HTTP状态码: {response.status_code}")
+                self.logger.debug(f"HTTP状态码: {response.status_code}")
                 
                 if response.status_code != 200:
-                    print(f"[调试] 错误响应: {response.text}")
                     raise RuntimeError(f"API 请求失败: {response.status_code} - {response.text}")
                 
+                self._stage("parse")
                 result = response.json()
-                print(f"[调试] 响应JSON键: {list(result.keys())}")
+                self.logger.debug(f"响应JSON键: {list(result.keys())}")
                 
                 # 解析响应（与generate方法类似）
                 if "candidates" not in result or len(result["candidates"]) == 0:
@@ -564,9 +819,11 @@ Important:
                     raise RuntimeError("未获取到编辑后的图片数据")
                 
                 # 解码并保存
+                self._stage("decode")
                 image_bytes = base64.b64decode(image_data)
                 
-                save_path = self.config.get("save_path", "./output/infographics")
+                self._stage("save")
+                save_path = self.config.snapshot.save_path
                 os.makedirs(save_path, exist_ok=True)
                 if not save_name:
                     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -575,12 +832,14 @@ Important:
                 
                 with open(full_path, "wb") as f:
                     f.write(image_bytes)
+                self._cache_thumbnails(full_path)
                 
-                print(f"[调试] 编辑后图片保存成功: {full_path}")
+                self.logger.success(f"图片编辑成功！保存到: {save_name}")
                 return full_path
                 
             except Exception as e:
-                print(f"[调试] 图片编辑异常: {type(e).__name__}: {str(e)}")
+                error_msg = f"图片编辑失败：{str(e)}"
+                self.logger.error(error_msg)
                 import traceback
-                traceback.print_exc()
-                raise RuntimeError(f"图片编辑失败：{str(e)}")
+                self.logger.debug(traceback.format_exc())
+                raise RuntimeError(error_msg)
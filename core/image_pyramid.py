@@ -0,0 +1,162 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from core.metrics import CACHE_REQUESTS
+from core.persistence import file_stamp
+
+# 金字塔最小一层的短边（像素），再小的显示尺寸直接从这一层缩放
+MIN_LEVEL_SIDE = 256
+# 同时缓存的图片数（4K 原图解码后约 48MB，加上各层约 64MB）
+DEFAULT_CACHE_IMAGES = 4
+
+
+class ImagePyramid:
+    """
+    一张图片解码后的多级缩小版本（每级边长减半）
+    显示时选取不小于目标尺寸的最小一级，再做一次缩放比不超过 2 的 LANCZOS 缩放
+    """
+
+    def __init__(self, image, max_size=None):
+        """
+        :param image: 已打开的 PIL 图片
+        :param max_size: (宽, 高) 可能的最大显示尺寸（如屏幕尺寸），用不到的大层级不保留
+        """
+        if image.mode not in ("RGB", "RGBA", "L"):
+            has_alpha = "A" in image.getbands() or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+        image.load()
+        self.size = image.size  # 解码后的尺寸（JPEG 可能已降采样，宽高比不变）
+        levels = [image]
+        while min(levels[-1].size) >= MIN_LEVEL_SIDE * 2:
+            levels.append(levels[-1].reduce(2))
+        if max_size:
+            # 下一级已经不小于最大显示尺寸时，更大的层级用不到，丢弃以节省内存
+            while len(levels) > 1 and levels[1].width >= max_size[0] and levels[1].height >= max_size[1]:
+                levels.pop(0)
+        self.levels = levels
+
+    @classmethod
+    def open(cls, path, max_size=None):
+        """
+        从文件加载（JPEG 在解码阶段就按 max_size 降采样）
+        :return: ImagePyramid
+        """
+        with Image.open(path) as image:
+            if max_size:
+                image.draft("RGB", max_size)
+            image.load()
+            return cls(image, max_size)
+
+    def fit_size(self, width, height, upscale=True):
+        """
+        按比例放入 width x height 的尺寸
+        :param upscale: 是否允许放大
+        """
+        scale = min(width / self.size[0], height / self.size[1])
+        if not upscale:
+            scale = min(scale, 1.0)
+        return max(int(self.size[0] * scale), 1), max(int(self.size[1] * scale), 1)
+
+    def level_for(self, width, height):
+        """不小于目标尺寸的最小一级"""
+        for level in reversed(self.levels):
+            if level.width >= width and level.height >= height:
+                return level
+        return self.levels[0]
+
+    def render(self, width, height):
+        """
+        缩放到指定尺寸
+        :return: 新的 PIL 图片
+        """
+        level = self.level_for(width, height)
+        if level.size == (width, height):
+            return level.copy()
+        return level.resize((width, height), Image.Resampling.LANCZOS)
+
+
+class DisplayCache:
+    """
+    预览图缓存：按路径缓存最近显示过的图片金字塔（文件被改写后自动失效），
+    并提供后台缩放，界面线程只需要把结果转换为 PhotoImage
+    """
+
+    def __init__(self, max_images=DEFAULT_CACHE_IMAGES, max_size=None):
+        """
+        :param max_images: 最多缓存的图片数
+        :param max_size: (宽, 高) 最大显示尺寸，见 ImagePyramid
+        """
+        self.max_images = max_images
+        self.max_size = max_size
+        self._pyramids = OrderedDict()  # 路径 -> (文件指纹, ImagePyramid)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._latest = 0  # 最新一次后台缩放请求的序号，旧请求直接跳过
+
+    def get(self, path):
+        """:return: 图片的金字塔（命中缓存时不读盘）"""
+        stamp = file_stamp(path)
+        with self._lock:
+            entry = self._pyramids.get(path)
+            if entry is not None and entry[0] == stamp:
+                self._pyramids.move_to_end(path)
+                CACHE_REQUESTS.inc(cache="display_image", result="hit")
+                return entry[1]
+        CACHE_REQUESTS.inc(cache="display_image", result="miss")
+        pyramid = ImagePyramid.open(path, self.max_size)
+        with self._lock:
+            self._pyramids[path] = (stamp, pyramid)
+            self._pyramids.move_to_end(path)
+            while len(self._pyramids) > self.max_images:
+                self._pyramids.popitem(last=False)
+        return pyramid
+
+    def render(self, path, width, height, upscale=True):
+        """
+        把图片按比例缩放到 width x height 以内
+        :return: PIL 图片
+        """
+        pyramid = self.get(path)
+        return pyramid.render(*pyramid.fit_size(width, height, upscale))
+
+    def render_async(self, path, width, height, callback, upscale=True):
+        """
+        在后台线程缩放，完成后在后台线程调用 callback(图片, 错误)
+        连续提交时只处理最新的请求（如拖动窗口大小），被取代的请求不回调
+        """
+        with self._lock:
+            self._latest += 1
+            ticket = self._latest
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="display-cache")
+            executor = self._executor
+
+        def task():
+            if ticket != self._latest:
+                return
+            try:
+                image, error = self.render(path, width, height, upscale), None
+            except Exception as e:
+                image, error = None, e
+            if ticket == self._latest:
+                callback(image, error)
+
+        executor.submit(task)
+
+    def invalidate(self, path=None):
+        """移除某张图片（默认全部）的缓存"""
+        with self._lock:
+            if path is None:
+                self._pyramids.clear()
+            else:
+                self._pyramids.pop(path, None)
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._latest += 1
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
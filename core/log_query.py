@@ -0,0 +1,128 @@
+"""
+结构化日志（logs/app.jsonl）查询工具
+
+用法：
+    python -m core.log_query                       # 按请求汇总
+    python -m core.log_query --request 3f2a9c81d0e4  # 查看单个请求的全部日志
+    python -m core.log_query --level ERROR --since 2024-06-01T09:00
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+from core.logger import LEVEL_ORDER
+
+DEFAULT_LOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs", "app.jsonl")
+
+
+def iter_records(paths):
+    """
+    按时间顺序读取日志记录（轮转出的 .N 备份越大越旧，先读）
+    :param paths: 日志文件路径列表
+    """
+    files = []
+    for path in paths:
+        backups = [p for p in glob.glob(glob.escape(path) + ".*") if p.rsplit(".", 1)[-1].isdigit()]
+        files += sorted(backups, key=lambda p: int(p.rsplit(".", 1)[-1]), reverse=True)
+        if os.path.exists(path):
+            files.append(path)
+    for file in files:
+        with open(file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # 写入中断的半行
+
+
+def filter_records(records, request_id=None, level=None, stage=None, since=None):
+    """按请求ID、最低级别、阶段、起始时间过滤"""
+    threshold = LEVEL_ORDER.get(level, 0) if level else 0
+    for record in records:
+        if request_id and not (record.get("request_id") or "").startswith(request_id):
+            continue
+        if threshold and LEVEL_ORDER.get(record.get("level"), 0) < threshold:
+            continue
+        if stage and record.get("stage") != stage:
+            continue
+        if since and record.get("ts", "") < since:
+            continue
+        yield record
+
+
+def summarize(records):
+    """
+    按请求汇总
+    :return: {请求ID: {start, preset, model, records, elapsed_ms, status, last_stage, error}}，按开始时间排序
+    """
+    summary = {}
+    for record in records:
+        request_id = record.get("request_id")
+        if not request_id:
+            continue
+        item = summary.get(request_id)
+        if item is None:
+            item = summary[request_id] = {
+                "start": record.get("ts"), "preset": record.get("preset"), "model": record.get("model"),
+                "records": 0, "elapsed_ms": 0, "status": "running", "last_stage": None, "error": None,
+            }
+        item["records"] += 1
+        item["elapsed_ms"] = max(item["elapsed_ms"], record.get("elapsed_ms") or 0)
+        item["last_stage"] = record.get("stage") or item["last_stage"]
+        if record.get("level") == "ERROR":
+            item["status"] = "error"
+            item["error"] = item["error"] or record.get("message")
+        elif record.get("level") == "SUCCESS" and item["status"] != "error":
+            item["status"] = "ok"
+    return summary
+
+
+def _print_records(records):
+    for record in records:
+        request = record.get("request_id") or "-"
+        stage = record.get("stage") or "-"
+        elapsed = record.get("elapsed_ms")
+        elapsed = f"{elapsed:>9.1f}ms" if elapsed is not None else " " * 11
+        print(f"{record.get('ts')} {record.get('level', ''):<7} {request:<12} {stage:<13} {elapsed} {record.get('message')}")
+
+
+def _print_summary(summary):
+    print(f"{'请求ID':<12} {'开始时间':<23} {'预设':<16} {'模型':<24} {'状态':<7} {'耗时ms':>9} {'条数':>4} 最后阶段/错误")
+    for request_id, item in summary.items():
+        tail = item["error"] if item["error"] else (item["last_stage"] or "")
+        print(f"{request_id:<12} {item['start'] or '':<23} {str(item['preset'] or '-'):<16} "
+              f"{str(item['model'] or '-'):<24} {item['status']:<7} {item['elapsed_ms']:>9.1f} "
+              f"{item['records']:>4} {tail}")
+    statuses = [item["status"] for item in summary.values()]
+    durations = sorted(item["elapsed_ms"] for item in summary.values() if item["status"] == "ok")
+    print(f"\n共 {len(statuses)} 个请求：成功 {statuses.count('ok')}，失败 {statuses.count('error')}，"
+          f"未完成 {statuses.count('running')}")
+    if durations:
+        p50 = durations[len(durations) // 2]
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        print(f"成功请求耗时：p50 {p50:.1f}ms，p95 {p95:.1f}ms，最长 {durations[-1]:.1f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查询结构化日志（需以 INFOGRAPHICS_LOG_JSON=1 启动程序）")
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_LOG], help="日志文件，默认 logs/app.jsonl（含轮转备份）")
+    parser.add_argument("--request", "-r", help="请求ID（可只写前缀）")
+    parser.add_argument("--level", "-l", choices=list(LEVEL_ORDER), help="最低级别")
+    parser.add_argument("--stage", "-s", help="阶段，如 build_payload、ttfb、download、decode")
+    parser.add_argument("--since", help="起始时间（ISO 格式前缀，如 2024-06-01T09:00）")
+    parser.add_argument("--summary", action="store_true", help="按请求汇总（未指定 --request 时的默认行为）")
+    args = parser.parse_args(argv)
+
+    records = filter_records(iter_records(args.paths), request_id=args.request,
+                             level=args.level, stage=args.stage, since=args.since)
+    if args.summary or not (args.request or args.level or args.stage):
+        _print_summary(summarize(records))
+    else:
+        _print_records(records)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,92 @@
+import atexit
+import contextlib
+import contextvars
+import json
 import logging
 import os
+import queue
 import sys
-from datetime import datetime
-from logging.handlers import RotatingFileHandler
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# GUI 未及时取走时最多缓存的日志条数（超出后丢弃最旧的）
+GUI_BACKLOG = 10000
+# 日志级别排序（SUCCESS 介于 INFO 与 WARNING 之间）
+LEVEL_ORDER = {"DEBUG": 10, "INFO": 20, "SUCCESS": 25, "WARNING": 30, "ERROR": 40}
+# 设置为 1 时额外输出结构化日志 logs/app.jsonl
+STRUCTURED_LOG_ENV = "INFOGRAPHICS_LOG_JSON"
+
+# 当前线程所属的请求上下文（请求ID、预设、模型、阶段、开始时间）
+_request_context = contextvars.ContextVar("request_context", default=None)
+
+
+class _RequestContextFilter(logging.Filter):
+    """在记录日志的线程中把请求上下文附加到日志记录上"""
+
+    def filter(self, record):
+        context = _request_context.get()
+        if context is None:
+            record.request_id = record.preset = record.model = record.stage = record.elapsed_ms = None
+        else:
+            record.request_id = context["request_id"]
+            record.preset = context["preset"]
+            record.model = context["model"]
+            record.stage = context["stage"]
+            record.elapsed_ms = round((time.perf_counter() - context["started"]) * 1000, 1)
+        return True
+
+
+class JsonLineFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": getattr(record, "app_level", record.levelname),
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "preset": getattr(record, "preset", None),
+            "model": getattr(record, "model", None),
+            "stage": getattr(record, "stage", None),
+            "elapsed_ms": getattr(record, "elapsed_ms", None),
+        }
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SizeTimeRotatingFileHandler(RotatingFileHandler):
+    """文件超过大小上限或跨过零点时轮转（备份为 .1、.2 ...）"""
+
+    def __init__(self, filename, maxBytes, backupCount, encoding="utf-8"):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding)
+        self.rollover_at = self._next_midnight()
+
+    @staticmethod
+    def _next_midnight():
+        tomorrow = datetime.now().date() + timedelta(days=1)
+        return datetime.combine(tomorrow, datetime.min.time()).timestamp()
+
+    def shouldRollover(self, record):
+        if record.created >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = self._next_midnight()
 
 
 class AppLogger:
     """应用程序日志管理器"""
     
-    def __init__(self, log_dir=None):
+    def __init__(self, log_dir=None, structured=None, console=None):
+        """
+        :param log_dir: 日志目录，默认为程序目录下的 logs
+        :param structured: 是否输出结构化日志（JSONL），默认由环境变量 INFOGRAPHICS_LOG_JSON 决定
+        :param console: 是否输出到控制台，默认仅开发环境输出
+        """
         # 获取日志目录
         if log_dir is None:
             if getattr(sys, 'frozen', False):
@@ -44,36 +122,119 @@ class AppLogger:
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         file_handler.setFormatter(file_formatter)
-        self.logger.addHandler(file_handler)
+        handlers = [file_handler]
         
         # 控制台处理器（开发环境使用）
-        if not getattr(sys, 'frozen', False):
+        if console is None:
+            console = not getattr(sys, 'frozen', False)
+        if console:
             console_handler = logging.StreamHandler()
             console_handler.setLevel(logging.INFO)
             console_formatter = logging.Formatter('%(levelname)s - %(message)s')
             console_handler.setFormatter(console_formatter)
-            self.logger.addHandler(console_handler)
+            handlers.append(console_handler)
+        
+        # 结构化日志 - 每行一条 JSON，超过10MB或跨天轮转，保留7个文件
+        if structured is None:
+            structured = os.environ.get(STRUCTURED_LOG_ENV, "").lower() in ("1", "true", "yes")
+        self.structured_log_path = os.path.join(log_dir, "app.jsonl") if structured else None
+        if structured:
+            json_handler = SizeTimeRotatingFileHandler(self.structured_log_path,
+                                                       maxBytes=10*1024*1024, backupCount=7)
+            json_handler.setLevel(logging.DEBUG)
+            json_handler.setFormatter(JsonLineFormatter())
+            handlers.append(json_handler)
+        
+        # 调用方只负责入队，文件和控制台输出由后台线程完成
+        self._queue = queue.SimpleQueue()
+        queue_handler = QueueHandler(self._queue)
+        queue_handler.addFilter(_RequestContextFilter())
+        self.logger.addHandler(queue_handler)
+        self._listener = QueueListener(self._queue, *handlers, respect_handler_level=True)
+        self._listener.start()
+        atexit.register(self.shutdown)
         
-        # GUI回调列表
+        # GUI回调列表；待显示的日志先缓存，由GUI线程批量取走
         self.gui_callbacks = []
+        self._gui_pending = deque(maxlen=GUI_BACKLOG)
         
     def get_log_file_path(self):
         """获取当前日志文件路径"""
         return self.log_file_path
 
+    def shutdown(self):
+        """停止后台写入线程（写完队列中剩余的日志）"""
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+
+    @contextlib.contextmanager
+    def request(self, preset=None, model=None):
+        """
+        请求上下文：期间当前线程记录的日志都带上同一个请求ID
+        嵌套调用时沿用外层请求
+        :return: 请求ID
+        """
+        context = _request_context.get()
+        if context is not None:
+            yield context["request_id"]
+            return
+        context = {
+            "request_id": uuid.uuid4().hex[:12],
+            "preset": preset,
+            "model": model,
+            "stage": None,
+            "started": time.perf_counter(),
+        }
+        token = _request_context.set(context)
+        try:
+            yield context["request_id"]
+        finally:
+            _request_context.reset(token)
+
+    def set_stage(self, stage):
+        """标记当前请求所处的阶段（不在请求上下文中时忽略）"""
+        context = _request_context.get()
+        if context is not None:
+            context["stage"] = stage
+
     def add_gui_callback(self, callback):
-        """添加GUI回调函数，用于实时显示日志"""
+        """
+        添加GUI回调函数，用于实时显示日志
+        回调不会在记录日志的线程中执行，而是由 dispatch_gui_messages() 在调用方线程（GUI主线程）批量触发
+        :param callback: callback(messages)，messages 为 [(时间, 级别, 内容), ...]
+        """
         self.gui_callbacks.append(callback)
-    
-    def _notify_gui(self, level, message):
-        """通知所有GUI回调"""
-        timestamp = datetime.now().strftime('%H:%M:%S')
+
+    def dispatch_gui_messages(self, limit=1000):
+        """
+        取出待显示的日志并交给GUI回调（请在GUI主线程中定时调用）
+        :param limit: 单次最多处理的条数，避免日志暴增时长时间占用界面线程
+        :return: 本次处理的条数
+        """
+        messages = []
+        pending = self._gui_pending
+        while pending and len(messages) < limit:
+            try:
+                messages.append(pending.popleft())
+            except IndexError:
+                break
+        if not messages:
+            return 0
         for callback in self.gui_callbacks:
             try:
-                callback(timestamp, level, message)
+                callback(messages)
             except Exception as e:
                 # 避免GUI回调错误影响日志记录
                 self.logger.error(f"GUI回调错误: {str(e)}")
+        return len(messages)
+    
+    def _notify_gui(self, level, message):
+        """缓存日志，等待GUI线程取走（没有GUI回调时不缓存）"""
+        if self.gui_callbacks:
+            self._gui_pending.append((datetime.now().strftime('%H:%M:%S'), level, message))
     
     def debug(self, message):
         """调试信息"""
@@ -97,7 +258,7 @@ class AppLogger:
     
     def success(self, message):
         """成功信息（自定义级别）"""
-        self.logger.info(f"✓ {message}")
+        self.logger.info(f"✓ {message}", extra={"app_level": "SUCCESS"})
         self._notify_gui("SUCCESS", message)
 
 
@@ -0,0 +1,309 @@
+import bisect
+import contextlib
+import functools
+import http.server
+import math
+import threading
+import time
+
+from core.persistence import atomic_open
+
+# 默认分桶上限（秒），覆盖本地磁盘写入到慢速 API 响应
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class _Metric:
+    """指标基类：按标签值分组保存数据"""
+    type_name = "untyped"
+
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        # 标签值元组 -> 数值（直方图为 [各桶计数..., 超出最大桶的计数, 次数, 总和]）
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames) or set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._series.get(self._key(labels), 0)
+
+    def collect(self):
+        """:return: {标签值元组: 数值}"""
+        with self._lock:
+            return dict(self._series)
+
+
+class Gauge(Counter):
+    """可增可减的当前值（如在途请求数、队列长度）"""
+    type_name = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+
+class Histogram(_Metric):
+    """线程安全的直方图（按标签分组，记录次数、总和与分桶计数）"""
+    type_name = "histogram"
+
+    def __init__(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """记录一次观测值"""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0, 0.0]
+            series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """计时上下文：退出时记录耗时（秒）"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def timed(self, **labels):
+        """装饰器：记录函数每次调用的耗时"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def collect(self):
+        """
+        导出当前数据
+        :return: {标签值元组: {"count", "sum", "buckets": [(上限, 累计次数), ...]}}，最后一个桶上限为 inf
+        """
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        result = {}
+        for key, series in items:
+            cumulative, buckets = 0, []
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-2]):
+                cumulative += count
+                buckets.append((bound, cumulative))
+            result[key] = {"count": series[-2], "sum": series[-1], "buckets": buckets}
+        return result
+
+    def summary(self):
+        """
+        便于阅读的汇总（分位数按桶内线性插值估算）
+        :return: {标签值元组: {"count", "avg_ms", "p50_ms", "p95_ms", "p99_ms"}}
+        """
+        result = {}
+        for key, data in self.collect().items():
+            if not data["count"]:
+                continue
+            result[key] = {
+                "count": data["count"],
+                "avg_ms": round(data["sum"] / data["count"] * 1000, 2),
+                "p50_ms": round(_quantile(data, 0.50) * 1000, 2),
+                "p95_ms": round(_quantile(data, 0.95) * 1000, 2),
+                "p99_ms": round(_quantile(data, 0.99) * 1000, 2),
+            }
+        return result
+
+
+def _quantile(data, q):
+    """由累计分桶估算分位数"""
+    rank = q * data["count"]
+    lower_bound, lower_count = 0.0, 0
+    for bound, cumulative in data["buckets"]:
+        if cumulative >= rank:
+            if bound == float("inf"):
+                return lower_bound
+            fraction = (rank - lower_count) / max(cumulative - lower_count, 1)
+            return lower_bound + (bound - lower_bound) * fraction
+        lower_bound, lower_count = bound, cumulative
+    return lower_bound
+
+
+class MetricsRegistry:
+    """指标注册表（同名指标只创建一次）"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"指标 {name} 已注册为 {type(metric).__name__}")
+            return metric
+
+    def counter(self, name, description, labelnames=()):
+        return self._register(Counter, name, description, labelnames)
+
+    def gauge(self, name, description, labelnames=()):
+        return self._register(Gauge, name, description, labelnames)
+
+    def histogram(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, description, labelnames, buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+
+# 全局注册表
+REGISTRY = MetricsRegistry()
+
+# 多个模块共用的指标
+CACHE_REQUESTS = REGISTRY.counter("infographic_cache_requests_total",
+                                  "缓存查询次数", labelnames=("cache", "result"))
+STORE_SECONDS = REGISTRY.histogram("infographic_store_operation_seconds",
+                                   "历史记录/提示词库读写耗时（秒）", labelnames=("store", "operation"))
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(registry=REGISTRY):
+    """导出为 Prometheus 文本格式（text/plain; version=0.0.4）"""
+    lines = []
+    for metric in registry.metrics():
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.type_name}")
+        for key, data in sorted(metric.collect().items()):
+            if isinstance(metric, Histogram):
+                for bound, cumulative in data["buckets"]:
+                    labels = _format_labels(metric.labelnames, key, f'le="{_format_value(bound)}"')
+                    lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(metric.labelnames, key)
+                lines.append(f"{metric.name}_sum{labels} {_format_value(data['sum'])}")
+                lines.append(f"{metric.name}_count{labels} {data['count']}")
+            else:
+                lines.append(f"{metric.name}{_format_labels(metric.labelnames, key)} {_format_value(data)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """
+    指标导出：在本地端口提供 /metrics（供 Prometheus 抓取），
+    和/或定期写入文本文件（供 node_exporter 的 textfile collector 读取）
+    """
+
+    def __init__(self, registry=REGISTRY, port=None, host="127.0.0.1", textfile=None, interval=15.0):
+        self.registry = registry
+        self.port = port
+        self.host = host
+        self.textfile = textfile
+        self.interval = interval
+        self._server = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self.port:
+            self._server = http.server.ThreadingHTTPServer((self.host, self.port), self._make_handler())
+            self._server.daemon_threads = True
+            self._spawn(self._server.serve_forever, "metrics-http")
+        if self.textfile:
+            self._spawn(self._write_loop, "metrics-textfile")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        if self.textfile:
+            self.write_textfile()
+
+    def write_textfile(self):
+        """原子写入，抓取方不会读到半个文件"""
+        with atomic_open(self.textfile, "w") as f:
+            f.write(render_prometheus(self.registry))
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _write_loop(self):
+        from core.logger import get_logger
+        while not self._stop.is_set():
+            try:
+                self.write_textfile()
+            except OSError as e:
+                get_logger().warning(f"写入指标文件失败: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def _make_handler(self):
+        registry = self.registry
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = render_prometheus(registry).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
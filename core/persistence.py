@@ -0,0 +1,201 @@
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """
+    跨进程文件锁（锁文件为 <目标文件>.lock）
+    同一进程内可重入，请通过 file_lock() 获取共享实例
+    """
+
+    def __init__(self, path, timeout=10.0):
+        self.lock_path = path + ".lock"
+        self.timeout = timeout
+        self._thread_lock = threading.RLock()
+        self._fd = None
+        self._depth = 0
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._fd = self._lock_file()
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            self._unlock_file(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def _lock_file(self):
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                if os.name == "nt":
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except OSError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise TimeoutError(f"等待文件锁超时: {self.lock_path}")
+                time.sleep(0.05)
+
+    @staticmethod
+    def _unlock_file(fd):
+        try:
+            if os.name == "nt":
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def file_lock(path):
+    """获取目标文件的共享锁实例（同一文件在进程内只对应一把锁）"""
+    key = os.path.normcase(os.path.abspath(path))
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = FileLock(key)
+        return lock
+
+
+def file_stamp(path):
+    """文件状态指纹（修改时间、大小、inode），用于判断文件是否被其他进程改写"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def backup_paths(path, backups):
+    """备份文件路径，从新到旧：.bak、.bak2、.bak3 ..."""
+    return [f"{path}.bak"] + [f"{path}.bak{i}" for i in range(2, backups + 1)]
+
+
+def _rotate_backups(path, backups):
+    if not os.path.exists(path):
+        return
+    paths = backup_paths(path, backups)
+    for older, newer in zip(reversed(paths[1:]), reversed(paths[:-1])):
+        if os.path.exists(newer):
+            os.replace(newer, older)
+    shutil.copyfile(path, paths[0])
+
+
+def _fsync_dir(directory):
+    if os.name == "nt":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextlib.contextmanager
+def atomic_open(path, mode="w", encoding="utf-8", newline=None, backups=0):
+    """
+    原子写入：先写同目录临时文件并 fsync，再加锁重命名覆盖目标文件
+    写入过程中出错或崩溃时，目标文件保持原样
+    :param backups: 覆盖前保留的轮转备份数量
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        if "b" in mode:
+            f = open(fd, mode)
+        else:
+            f = open(fd, mode, encoding=encoding, newline=newline)
+        with f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        with file_lock(path):
+            if backups:
+                _rotate_backups(path, backups)
+            os.replace(tmp_path, path)
+        _fsync_dir(directory)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write_json(path, data, indent=4, backups=1):
+    """原子写入 JSON 文件（保留轮转备份）"""
+    with atomic_open(path, "w", backups=backups) as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+
+
+def read_json(path):
+    """直接读取 JSON 文件（不做备份恢复，解析失败时抛出异常）"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_json(path, default=None, backups=1):
+    """
+    读取 JSON 文件
+    主文件损坏时依次尝试备份；全部失败则将损坏文件改名保留（*.corrupt-时间戳）并返回默认值
+    :param default: 文件不存在或无法恢复时的返回值
+    """
+    if not os.path.exists(path):
+        return default
+    with file_lock(path):
+        try:
+            return read_json(path)
+        except (OSError, ValueError) as e:
+            error = e
+
+        from core.logger import get_logger
+        logger = get_logger()
+        for backup in backup_paths(path, backups):
+            if not os.path.exists(backup):
+                continue
+            try:
+                data = read_json(backup)
+            except (OSError, ValueError):
+                continue
+            logger.warning(f"文件已损坏，已从备份恢复: {path} <- {backup}（{error}）")
+            return data
+
+        corrupt_path = f"{path}.corrupt-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        os.replace(path, corrupt_path)
+        logger.error(f"文件已损坏且无可用备份，已另存为 {corrupt_path}（{error}）")
+        return default
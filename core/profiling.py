@@ -0,0 +1,182 @@
+import atexit
+import cProfile
+import functools
+import io
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+# 设置为 1 时启用性能分析（也可在设置页勾选，重启后生效）
+PROFILE_ENV = "INFOGRAPHICS_PROFILE"
+
+# 同一时刻只允许一个 cProfile 运行（Python 3.12 起整个进程只能有一个活动的分析器，重复 enable 会抛出 ValueError）
+_PROFILER_LOCK = threading.Lock()
+
+
+def profiling_requested(config=None):
+    """是否需要启用性能分析：环境变量优先，其次是配置项 profiling"""
+    value = os.environ.get(PROFILE_ENV)
+    if value is not None:
+        return value.lower() in ("1", "true", "yes")
+    return bool(config.get("profiling", False)) if config is not None else False
+
+
+def default_profile_dir():
+    """本次会话的输出目录：<程序目录>/profiles/<时间>_<进程号>"""
+    if getattr(sys, 'frozen', False):
+        base_path = os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_path, "profiles", f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}")
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+class ProfilingSession:
+    """
+    一次性能分析会话
+    - 采样：后台线程定时抓取所有线程的调用栈，汇总为 collapsed stack（可直接用 flamegraph.pl / speedscope 渲染）
+    - 热点函数：instrument() 包装的函数在调用期间开启会话共用的 cProfile，并统计调用次数和耗时；
+      其他线程正在分析时，本次调用不分析，只计时
+    未启用时不创建会话，被包装的函数保持原样，没有额外开销
+    """
+
+    def __init__(self, output_dir=None, interval=0.005):
+        self.output_dir = output_dir or default_profile_dir()
+        self.interval = interval
+        self._stacks = Counter()
+        self._samples = 0
+        self._calls = {}  # 名称 -> [次数, 总耗时, 最长耗时, 经 cProfile 分析的次数]
+        self._profile = cProfile.Profile()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def instrument(self, obj, names, prefix):
+        """把对象上的若干方法替换为带分析的版本（需在方法被绑定为回调之前调用）"""
+        for name in names:
+            setattr(obj, name, self.wrap(getattr(obj, name), f"{prefix}.{name}"))
+
+    def wrap(self, func, name):
+        """
+        包装热点函数：调用期间开启 cProfile（嵌套调用只开启一次，也只统计最外层的耗时）
+        其他线程的调用正在分析、或其他分析工具已在运行时，本次调用照常执行但不分析
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            local = self._local
+            if getattr(local, "depth", 0):
+                local.depth += 1
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    local.depth -= 1
+            local.depth = 1
+            started = time.perf_counter()
+            profiled = self._enable_profile()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if profiled:
+                    self._profile.disable()
+                    _PROFILER_LOCK.release()
+                elapsed = time.perf_counter() - started
+                local.depth = 0
+                with self._lock:
+                    stats = self._calls.setdefault(name, [0, 0.0, 0.0, 0])
+                    stats[0] += 1
+                    stats[1] += elapsed
+                    stats[2] = max(stats[2], elapsed)
+                    stats[3] += profiled
+        return wrapper
+
+    def _enable_profile(self):
+        """:return: 是否为本次调用开启了 cProfile"""
+        if not _PROFILER_LOCK.acquire(blocking=False):
+            return False
+        try:
+            self._profile.enable()
+        except ValueError:
+            # 其他分析工具（如调试器、外部 cProfile）已在运行
+            _PROFILER_LOCK.release()
+            return False
+        return True
+
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)).replace(";", ":"))
+                self._stacks[";".join(reversed(stack))] += 1
+            self._samples += 1
+
+    def stop(self):
+        """
+        结束会话并写出结果（重复调用无效）
+        :return: 输出目录，未启动或已结束时为 None
+        """
+        if self._thread is None:
+            return None
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        with open(os.path.join(self.output_dir, "stacks.collapsed"), "w", encoding="utf-8") as f:
+            for stack, count in sorted(self._stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+        with self._lock:
+            calls = {name: list(stats) for name, stats in self._calls.items()}
+        summary = {
+            "duration_s": round(time.perf_counter() - self._started, 3),
+            "samples": self._samples,
+            "sample_interval_ms": self.interval * 1000,
+            "hot_paths": {
+                name: {"calls": count, "profiled_calls": profiled, "total_ms": round(total * 1000, 2),
+                       "avg_ms": round(total / count * 1000, 2), "max_ms": round(longest * 1000, 2)}
+                for name, (count, total, longest, profiled) in sorted(calls.items(), key=lambda item: -item[1][1])
+            },
+        }
+        with open(os.path.join(self.output_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+        # 等待正在分析的调用结束（最多 5 秒，超时则不写出 cProfile 结果）
+        locked = _PROFILER_LOCK.acquire(timeout=5)
+        try:
+            has_stats = locked and bool(self._profile.getstats())
+            if has_stats:
+                import pstats  # 导入较慢（约 10ms），只在写出结果时需要
+                pstats.Stats(self._profile).dump_stats(os.path.join(self.output_dir, "hotpaths.pstats"))
+        finally:
+            if locked:
+                _PROFILER_LOCK.release()
+        if has_stats:
+            report = io.StringIO()
+            pstats.Stats(os.path.join(self.output_dir, "hotpaths.pstats"), stream=report) \
+                .sort_stats("cumulative").print_stats(60)
+            with open(os.path.join(self.output_dir, "hotpaths.txt"), "w", encoding="utf-8") as f:
+                f.write(report.getvalue())
+        return self.output_dir
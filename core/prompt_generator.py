@@ -1,6 +1,189 @@
+import hashlib
+import itertools
+import math
+import random
+from core.logger import get_logger
+from core.prompt_templates import CompiledTemplate, TemplateError
+
+# 所有用途都可用的参数及其默认值
+_BASE_DEFAULTS = {'aspect_ratio': '16:9', 'image_size': '1K'}
+_BASE_PARAMS = frozenset(('content',)).union(_BASE_DEFAULTS)
+
+# 高分辨率时追加到提示词末尾的说明
+_SIZE_SUFFIX = {size: f" Generate at {size} resolution." for size in ('2K', '4K')}
+
+# 内置的用途参数默认值：旧版配置文件的 purpose_categories.<用途> 没有 defaults 时使用
+# （值中可引用其他参数，如 {content}）
+_BUILTIN_PURPOSE_DEFAULTS = {
+    "逼真场景摄影": {
+        'shot_type': 'wide-angle shot',
+        'lighting': 'natural sunlight',
+        'mood': 'professional',
+        'camera_details': 'professional camera',
+        'key_details': 'sharp details',
+        'subject': 'scene'
+    },
+    "风格化插画贴纸": {
+        'art_style': 'modern minimalist',
+        'line_style': 'clean lines',
+        'color_palette': 'vibrant colors',
+        'background_type': 'transparent',
+        'subject': 'character'
+    },
+    "文字准确渲染": {
+        'design_type': 'logo',
+        'text_content': '',
+        'font_style': 'modern bold',
+        'style_description': 'professional',
+        'color_scheme': 'brand colors'
+    },
+    "产品模型摄影": {
+        'product_desc': '{content}',
+        'background_surface': 'clean seamless backdrop',
+        'lighting_setup': 'a three-point softbox setup',
+        'lighting_purpose': "highlight the product's form and texture",
+        'angle_type': 'a slightly elevated 45-degree angle',
+        'key_feature': 'its defining details'
+    },
+    "极简负空间设计": {
+        'subject': '{content}',
+        'position': 'bottom-right third',
+        'color': 'off-white'
+    },
+    "信息图表数据可视化": {
+        'style': 'modern professional',
+        'key_elements': 'data points',
+        'visual_style': 'clear and colorful',
+        'target_audience': 'general audience'
+    },
+    "连续艺术漫画": {
+        'panel_count': '4',
+        'art_style': 'clean comic'
+    },
+    "使用实时数据": {
+        'design_type': 'an infographic',
+        'style_requirements': 'Use a clear layout with up-to-date figures and labeled sources'
+    }
+}
+
+# 显式参数（shot_type/lighting/art_style）填充的模板字段
+_ARGUMENT_FIELDS = {
+    'shot_type': ('shot_type',),
+    'lighting': ('lighting',),
+    'art_style': ('art_style', 'style')
+}
+
+# 组合网格的默认维度
+DEFAULT_GRID_DIMENSIONS = ('style_categories', 'ratio_presets', 'art_styles', 'lighting_types')
+
+# 组合维度填充的模板参数（简单模式使用基础模板，专业模式使用用途模板）
+_SIMPLE_GRID_FIELDS = {
+    'style_categories': ('style_name', 'style_desc'),
+    'ratio_presets': ('ratio',)
+}
+_ADVANCED_GRID_FIELDS = {
+    'ratio_presets': ('aspect_ratio',),
+    'art_styles': _ARGUMENT_FIELDS['art_style'],
+    'lighting_types': _ARGUMENT_FIELDS['lighting'],
+    'shot_types': _ARGUMENT_FIELDS['shot_type'],
+    'image_sizes': ('image_size',)
+}
+
+# 组合网格每批渲染的条数
+_GRID_BATCH_SIZE = 1000
+
+
+class PromptGrid:
+    """
+    提示词组合网格（A/B 对比用）
+    按批惰性渲染，迭代得到 (组合, 提示词)，组合为 {维度: 取值}；整个网格不会同时存在于内存中
+    """
+
+    def __init__(self, render_rows, base_params, axes, collapsed=(), sample=None, seed=None, dedupe=True):
+        """
+        :param render_rows: 批量渲染函数 render_rows(rows) -> [提示词]
+        :param base_params: 每行共用的模板参数
+        :param axes: [(维度, [(取值, 该取值填充的参数), ...]), ...]
+        :param collapsed: 不影响模板、已被合并掉的维度
+        :param sample: 随机抽取的组合数，None 表示完整网格
+        :param seed: 随机抽样种子（相同种子得到相同样本）
+        :param dedupe: 跳过文本完全相同的提示词
+        """
+        self._render_rows = render_rows
+        self._base_params = base_params
+        self.axes = axes
+        self.collapsed = list(collapsed)
+        self.size = math.prod(len(values) for _, values in axes)
+        self.count = self.size if sample is None else min(sample, self.size)
+        self.sample = sample
+        self.seed = seed
+        self.dedupe = dedupe
+
+    def __len__(self):
+        return self.count
+
+    def estimate(self, cost_per_image=None):
+        """
+        生成前的规模与费用估算（不渲染任何提示词）
+        :param cost_per_image: 单张图片费用，None 表示不估算费用
+        :return: {"combinations": 网格总组合数, "prompts": 将生成的提示词数（去重前）,
+                  "api_calls": API调用次数, "collapsed": 已合并的维度, "estimated_cost": 估算费用}
+        """
+        return {
+            "combinations": self.size,
+            "prompts": self.count,
+            "api_calls": self.count,
+            "collapsed": list(self.collapsed),
+            "estimated_cost": None if cost_per_image is None else self.count * cost_per_image
+        }
+
+    def _combinations(self):
+        value_lists = [values for _, values in self.axes]
+        if self.sample is None:
+            return itertools.product(*value_lists)
+        # 在组合序号上抽样，再按混合进制还原组合，无需展开网格
+        indices = random.Random(self.seed).sample(range(self.size), self.count)
+        return (self._decode(index, value_lists) for index in indices)
+
+    @staticmethod
+    def _decode(index, value_lists):
+        combo = []
+        for values in reversed(value_lists):
+            index, position = divmod(index, len(values))
+            combo.append(values[position])
+        return tuple(reversed(combo))
+
+    def __iter__(self):
+        names = [name for name, _ in self.axes]
+        seen = set() if self.dedupe else None
+        combos = iter(self._combinations())
+        while True:
+            batch = list(itertools.islice(combos, _GRID_BATCH_SIZE))
+            if not batch:
+                return
+            rows = []
+            for combo in batch:
+                row = dict(self._base_params)
+                for _, params in combo:
+                    row.update(params)
+                rows.append(row)
+            for combo, prompt in zip(batch, self._render_rows(rows)):
+                if seen is not None:
+                    # 只保存 8 字节摘要，去重集合远小于提示词本身
+                    digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=8).digest()
+                    if digest in seen:
+                        continue
+                    seen.add(digest)
+                yield dict(zip(names, (value for value, _ in combo))), prompt
+
+
 class PromptGenerator:
     def __init__(self, config_manager):
         self.config = config_manager
+        self.logger = get_logger()
+        self._compiled_snapshot = None
+        self._renderers = {}
+        self._template_problems = {}
         # 基础模板（兼容旧版）
         self.base_template = (
             "生成一张{style_name}风格的信息图，风格特点：{style_desc}。"
@@ -9,6 +192,53 @@ class PromptGenerator:
             "设计要求：符合所选风格的视觉特征，布局清晰，重点突出，配色协调，适合{usage_scene}使用。"
             "输出格式：高清 PNG 图片，无水印，无多余文字。"
         )
+        self._base_renderer = CompiledTemplate(self.base_template)
+        # 启动时校验所有用途模板，一次性报告问题
+        for purpose, problem in self.check_templates().items():
+            self.logger.error(f"用途模板不可用 [{purpose}]: {problem}")
+
+    def _compile_templates(self):
+        """
+        编译所有用途模板（按配置快照缓存，配置热加载后自动重新编译）
+        :return: {用途: CompiledTemplate}，格式错误的模板不在其中
+        """
+        snapshot = self.config.snapshot
+        if snapshot is self._compiled_snapshot:
+            return self._renderers
+        renderers, problems = {}, {}
+        for purpose, info in snapshot.values.get('purpose_categories', {}).items():
+            purpose_defaults = info['defaults'] if 'defaults' in info else _BUILTIN_PURPOSE_DEFAULTS.get(purpose, {})
+            defaults = {**_BASE_DEFAULTS, **purpose_defaults}
+            try:
+                renderer = CompiledTemplate(info.get('template', ''), defaults)
+            except TemplateError as e:
+                problems[purpose] = str(e)
+                continue
+            renderers[purpose] = renderer
+            missing = renderer.fields - renderer.available_params(_BASE_PARAMS)
+            if missing:
+                problems[purpose] = f"缺少参数：{', '.join(sorted(missing))}"
+        self._renderers = renderers
+        self._template_problems = problems
+        self._compiled_snapshot = snapshot
+        return renderers
+
+    def check_templates(self):
+        """
+        校验所有用途模板：解析占位符并检查每个占位符都有默认值
+        :return: {用途: 问题描述}，为空表示全部可用
+        """
+        self._compile_templates()
+        return self._template_problems
+
+    def _get_renderer(self, purpose):
+        renderer = self._compile_templates().get(purpose)
+        if renderer is not None:
+            return renderer
+        purposes = self.config.get('purpose_categories', {})
+        if purpose not in purposes:
+            raise ValueError(f"无效用途：{purpose}，可选：{list(purposes.keys())}")
+        raise ValueError(f"用途“{purpose}”的模板不可用：{self._template_problems[purpose]}")
 
     def generate_advanced(self, purpose, content, ratio="16:9", image_size="1K", 
                          shot_type=None, lighting=None, art_style=None, 
@@ -25,60 +255,111 @@ class PromptGenerator:
         :param additional_params: 额外参数字典
         :return: 优化的提示词
         """
-        purposes = self.config.get('purpose_categories', {})
-        if purpose not in purposes:
-            raise ValueError(f"无效用途：{purpose}，可选：{list(purposes.keys())}")
-        
-        purpose_info = purposes[purpose]
-        template = purpose_info['template']
-        
-        # 准备参数
+        renderer = self._get_renderer(purpose)
+
+        # 参数优先级：用途默认值 < 显式参数 < 额外参数
         params = {
             'content': content,
             'aspect_ratio': ratio,
             'image_size': image_size
         }
-        
-        # 根据用途添加特定参数
-        if purpose == "逼真场景摄影":
-            params['shot_type'] = shot_type or 'wide-angle shot'
-            params['lighting'] = lighting or 'natural sunlight'
-            params['mood'] = additional_params.get('mood', 'professional') if additional_params else 'professional'
-            params['camera_details'] = additional_params.get('camera_details', 'professional camera') if additional_params else 'professional camera'
-            params['key_details'] = additional_params.get('key_details', 'sharp details') if additional_params else 'sharp details'
-            params['subject'] = additional_params.get('subject', 'scene') if additional_params else 'scene'
-        elif purpose == "风格化插画贴纸":
-            params['art_style'] = art_style or 'modern minimalist'
-            params['line_style'] = additional_params.get('line_style', 'clean lines') if additional_params else 'clean lines'
-            params['color_palette'] = additional_params.get('color_palette', 'vibrant colors') if additional_params else 'vibrant colors'
-            params['background_type'] = additional_params.get('background_type', 'transparent') if additional_params else 'transparent'
-            params['subject'] = additional_params.get('subject', 'character') if additional_params else 'character'
-        elif purpose == "文字准确渲染":
-            params['design_type'] = additional_params.get('design_type', 'logo') if additional_params else 'logo'
-            params['text_content'] = additional_params.get('text_content', '') if additional_params else ''
-            params['font_style'] = additional_params.get('font_style', 'modern bold') if additional_params else 'modern bold'
-            params['style_description'] = additional_params.get('style_description', 'professional') if additional_params else 'professional'
-            params['color_scheme'] = additional_params.get('color_scheme', 'brand colors') if additional_params else 'brand colors'
-        elif purpose == "信息图表数据可视化":
-            params['style'] = art_style or 'modern professional'
-            params['key_elements'] = additional_params.get('key_elements', 'data points') if additional_params else 'data points'
-            params['visual_style'] = additional_params.get('visual_style', 'clear and colorful') if additional_params else 'clear and colorful'
-            params['target_audience'] = additional_params.get('target_audience', 'general audience') if additional_params else 'general audience'
-        
-        # 尝试填充模板
+        for argument, value in (('shot_type', shot_type), ('lighting', lighting), ('art_style', art_style)):
+            if value:
+                for field in _ARGUMENT_FIELDS[argument]:
+                    params[field] = value
+        if additional_params:
+            params.update(additional_params)
+
+        # 缺少参数时直接报错，避免用不完整的提示词调用API
         try:
-            prompt = template.format(**params)
-        except KeyError as e:
-            # 如果缺少参数，使用占位符
-            missing_key = str(e).strip("'")
-            params[missing_key] = f"[{missing_key}]"
-            prompt = template.format(**params)
-        
-        # 添加分辨率说明
-        if image_size in ['2K', '4K']:
-            prompt += f" Generate at {image_size} resolution."
-        
-        return prompt.strip()
+            prompt = renderer.render(params)
+        except ValueError as e:
+            raise ValueError(f"用途“{purpose}”{str(e)}") from None
+        return (prompt + _SIZE_SUFFIX.get(image_size, "")).strip()
+
+    def render_many(self, purpose, rows):
+        """
+        批量生成同一用途的提示词
+        :param purpose: 用途类别
+        :param rows: 参数字典序列，每行至少包含 content，可覆盖 aspect_ratio、image_size 及模板中的任意参数
+        :return: 提示词列表（与 rows 一一对应）
+        :raises ValueError: 用途无效、模板不可用或某行缺少参数
+        """
+        renderer = self._get_renderer(purpose)
+        rows = rows if isinstance(rows, list) else list(rows)
+        prompts = renderer.render_many(rows)
+        return [(prompt + _SIZE_SUFFIX.get(row.get('image_size'), "")).strip()
+                for prompt, row in zip(prompts, rows)]
+
+    def prompt_grid(self, content, purpose=None, dimensions=DEFAULT_GRID_DIMENSIONS, sample=None,
+                    seed=None, dedupe=True, usage_scene="通用场景", image_size="1K",
+                    additional_params=None):
+        """
+        按配置维度的笛卡尔积（或随机抽样）生成提示词组合
+        不影响所用模板的维度会被合并（例如基础模板不使用光照），避免生成重复提示词
+        :param content: 核心内容描述
+        :param purpose: 用途类别，None 表示使用简单模式的基础模板
+        :param dimensions: 维度名序列（取配置中的全部选项），或 {维度名: 取值列表}
+        :param sample: 随机抽取的组合数，None 表示完整网格
+        :param seed: 随机抽样种子
+        :param dedupe: 跳过文本完全相同的提示词
+        :param usage_scene: 使用场景（简单模式）
+        :param image_size: 分辨率（专业模式，未作为维度时使用）
+        :param additional_params: 额外模板参数（专业模式）
+        :return: PromptGrid，可先调用 estimate() 查看规模，再迭代得到 (组合, 提示词)
+        """
+        snapshot = self.config.snapshot
+        if not isinstance(dimensions, dict):
+            dimensions = {name: list(snapshot.values.get(name, {})) for name in dimensions}
+
+        if purpose is None:
+            grid_fields = _SIMPLE_GRID_FIELDS
+            fields = self._base_renderer.fields
+            if 'style_categories' not in dimensions:
+                raise ValueError("简单模式需要 style_categories 维度")
+            base_params = {
+                'content': content,
+                'ratio': '16:9',
+                'resolution': '1024x1024',
+                'language': snapshot.language,
+                'usage_scene': usage_scene
+            }
+
+            def render_rows(rows):
+                return [prompt.strip() for prompt in self._base_renderer.render_many(rows)]
+        else:
+            renderer = self._get_renderer(purpose)
+            grid_fields = _ADVANCED_GRID_FIELDS
+            # image_size 不在模板中时也会决定末尾的分辨率说明
+            fields = renderer.fields | {'image_size'}
+            base_params = {'content': content, 'image_size': image_size, **(additional_params or {})}
+
+            def render_rows(rows):
+                return self.render_many(purpose, rows)
+
+        axes, collapsed = [], []
+        for name, values in dimensions.items():
+            if name not in _SIMPLE_GRID_FIELDS and name not in _ADVANCED_GRID_FIELDS:
+                raise ValueError(f"不支持的组合维度：{name}，"
+                                 f"可选：{list(dict.fromkeys([*_SIMPLE_GRID_FIELDS, *_ADVANCED_GRID_FIELDS]))}")
+            used = [field for field in grid_fields.get(name, ()) if field in fields]
+            if not used:
+                collapsed.append(name)
+                continue
+            options, keys = [], set()
+            for value in values:
+                if name == 'style_categories':
+                    params = {'style_name': value.split(" ")[1] if " " in value else value,
+                              'style_desc': snapshot.style_categories.get(value, "")}
+                else:
+                    params = {field: value for field in grid_fields[name]}
+                # 同一维度内对模板效果相同的取值只保留一个
+                key = tuple(params[field] for field in used)
+                if key not in keys:
+                    keys.add(key)
+                    options.append((value, params))
+            axes.append((name, options))
+        return PromptGrid(render_rows, base_params, axes, collapsed, sample, seed, dedupe)
 
     def generate(self, style_key, ratio, content, usage_scene="通用场景"):
         """
@@ -101,15 +382,15 @@ class PromptGenerator:
         language = self.config.get("language", "zh-CN")
 
         # 填充模板
-        prompt = self.base_template.format(
-            style_name=style_name,
-            style_desc=style_desc,
-            ratio=ratio,
-            resolution=resolution,
-            language=language,
-            content=content,
-            usage_scene=usage_scene
-        )
+        prompt = self._base_renderer.render({
+            'style_name': style_name,
+            'style_desc': style_desc,
+            'ratio': ratio,
+            'resolution': resolution,
+            'language': language,
+            'content': content,
+            'usage_scene': usage_scene
+        })
         return prompt.strip()
 
     def custom_prompt(self, custom_text):
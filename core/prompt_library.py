@@ -1,23 +1,130 @@
+import contextlib
+import csv
+import hashlib
+import io
 import json
 import os
+import re
+import sqlite3
+import threading
 from datetime import datetime
+from core.metrics import STORE_SECONDS
+from core.persistence import atomic_open, load_json
+from core.store_watcher import ChangeNotifier, RecordChanges
+from core.text_index import to_index_text, build_match_query, fts5_available
 
-class PromptLibrary:
+# 标签分隔符（中英文逗号、分号、空白）
+_TAG_SPLIT_RE = re.compile(r"[,，;；\s]+")
+
+# 检索字段权重：标题 > 标签 > 内容
+_FIELD_WEIGHTS = (10.0, 5.0, 1.0)
+
+# 导入导出字段
+EXPORT_FIELDS = ("category", "title", "content", "tags", "style", "ratio", "created_at", "updated_at")
+
+# 批量导入时每处理多少行回调一次进度
+_PROGRESS_EVERY = 1000
+
+# 变更日志保留条数（其他进程落后更多时整体重新加载）
+_CHANGE_LOG_KEEP = 10000
+
+_PROMPT_COLUMNS = ("id", "title", "content", "tags", "style", "ratio", "created_at", "updated_at")
+
+
+def split_tags(tags):
+    """将标签字符串拆分为标签列表（去重、保持顺序）"""
+    return list(dict.fromkeys(t for t in _TAG_SPLIT_RE.split(tags or "") if t))
+
+
+def content_hash(content):
+    """提示词内容指纹（忽略首尾空白与大小写），用于导入去重"""
+    normalized = " ".join((content or "").split()).lower()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def _file_format(path, fmt):
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    if fmt not in ("jsonl", "csv"):
+        raise ValueError(f"不支持的文件格式：{fmt}，可选：jsonl、csv")
+    return fmt
+
+
+def _read_jsonl(f):
+    """
+    逐行解析 JSONL
+    :return: 生成器，每行产出解析结果，无法解析的行产出 None（由调用方计为无效行）
+    """
+    for line in f:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def _scalar_text(value):
+    """导入字段的值转为字符串（None 为空串），不是标量时返回 None"""
+    if value is None:
+        return ""
+    if isinstance(value, (str, int, float, bool)):
+        return str(value)
+    return None
+
+
+def _normalize_row(row):
+    """
+    把导入的一行整理为 {字段: 字符串}（字段同 EXPORT_FIELDS，数字等标量转为字符串，标签列表以逗号连接）
+    :return: 整理后的行；行不是对象或字段值无法转换时返回 None
+    """
+    if not isinstance(row, dict):
+        return None
+    fields = {}
+    for field in EXPORT_FIELDS:
+        value = row.get(field)
+        if field == "tags" and isinstance(value, list):
+            tags = [_scalar_text(tag) for tag in value]
+            if None in tags:
+                return None
+            text = ",".join(tag.strip() for tag in tags if tag.strip())
+        else:
+            text = _scalar_text(value)
+            if text is None:
+                return None
+        fields[field] = text
+    return fields
+
+
+class PromptLibrary(ChangeNotifier):
     def __init__(self, data_file="data/prompt_library.json"):
+        super().__init__()
         self.data_file = data_file
-        self.data = self._load_data()
-    
+        # 提示词库存储（SQLite），旧版 JSON 文件仅在首次启动时导入
+        self.db_path = os.path.splitext(data_file)[0] + ".db"
+        self._lock = threading.RLock()
+        # 内存索引
+        self._categories = {}        # 分类ID -> 分类
+        self._category_prompts = {}  # 分类ID -> {提示词ID: 提示词}
+        self._prompts = {}           # 提示词ID -> 提示词
+        self._prompt_category = {}   # 提示词ID -> 分类ID
+        self._tag_index = {}         # 标签 -> {提示词ID}
+        self._similarity = None      # 相似度索引（首次使用时加载）
+        self._similarity_loading = threading.Lock()
+        self._pending_records = {}   # 集合名 -> RecordChanges，事务提交后通知
+        self._open_store()
+        self._load_index()
+        if self._fts_enabled:
+            indexed = self._conn.execute("SELECT COUNT(*) FROM prompt_fts").fetchone()[0]
+            if indexed != len(self._prompts):
+                self._rebuild_search_index()
+
     def _load_data(self):
-        """加载提示词库数据"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return self._get_default_data()
-        else:
+        """加载旧版 JSON 提示词库数据"""
+        data = load_json(self.data_file)
+        if not isinstance(data, dict) or "categories" not in data:
             return self._get_default_data()
-    
+        return data
+
     def _get_default_data(self):
         """获取默认数据结构"""
         return {
@@ -44,145 +151,807 @@ class PromptLibrary:
             "next_category_id": 4,
             "next_prompt_id": 1
         }
-    
-    def _save_data(self):
-        """保存数据到文件"""
-        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
-    
+
+    def _open_store(self):
+        """打开数据库，首次使用时建表并导入旧数据"""
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+                CREATE TABLE IF NOT EXISTS categories (
+                    id INTEGER PRIMARY KEY, name TEXT NOT NULL, description TEXT);
+                CREATE TABLE IF NOT EXISTS prompts (
+                    id INTEGER PRIMARY KEY, category_id INTEGER NOT NULL,
+                    title TEXT, content TEXT, tags TEXT, style TEXT, ratio TEXT,
+                    created_at TEXT, updated_at TEXT, sort_order INTEGER NOT NULL);
+                CREATE INDEX IF NOT EXISTS idx_prompts_category
+                    ON prompts (category_id, sort_order);
+                -- 变更日志：多个进程共用同一个库时，据此增量同步各自的内存索引
+                CREATE TABLE IF NOT EXISTS change_log (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, row_id INTEGER NOT NULL);
+                CREATE TRIGGER IF NOT EXISTS trg_categories_insert AFTER INSERT ON categories
+                    BEGIN INSERT INTO change_log (kind, row_id) VALUES ('category', NEW.id); END;
+                CREATE TRIGGER IF NOT EXISTS trg_categories_update AFTER UPDATE ON categories
+                    BEGIN INSERT INTO change_log (kind, row_id) VALUES ('category', NEW.id); END;
+                CREATE TRIGGER IF NOT EXISTS trg_categories_delete AFTER DELETE ON categories
+                    BEGIN INSERT INTO change_log (kind, row_id) VALUES ('category', OLD.id); END;
+                CREATE TRIGGER IF NOT EXISTS trg_prompts_insert AFTER INSERT ON prompts
+                    BEGIN INSERT INTO change_log (kind, row_id) VALUES ('prompt', NEW.id); END;
+                CREATE TRIGGER IF NOT EXISTS trg_prompts_update AFTER UPDATE ON prompts
+                    BEGIN INSERT INTO change_log (kind, row_id) VALUES ('prompt', NEW.id); END;
+                CREATE TRIGGER IF NOT EXISTS trg_prompts_delete AFTER DELETE ON prompts
+                    BEGIN INSERT INTO change_log (kind, row_id) VALUES ('prompt', OLD.id); END;
+            """)
+            self._fts_enabled = fts5_available(self._conn)
+            if self._fts_enabled:
+                self._conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS prompt_fts USING fts5(title, tags, content)"
+                )
+            # 立即取得写锁，避免多个进程同时导入旧数据
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._init_store()
+                self._conn.execute(
+                    "DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?",
+                    (_CHANGE_LOG_KEEP,)
+                )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+
+    def _init_store(self):
+        """首次使用时导入旧版 JSON 数据（调用方负责事务）"""
+        if self._conn.execute("SELECT 1 FROM meta WHERE key = 'next_prompt_id'").fetchone():
+            return
+        data = self._load_data()
+        sort_order = 0
+        for category in data["categories"]:
+            self._conn.execute(
+                "INSERT INTO categories (id, name, description) VALUES (?, ?, ?)",
+                (category["id"], category["name"], category.get("description", ""))
+            )
+            for prompt in category.get("prompts", []):
+                self._conn.execute(
+                    "INSERT INTO prompts (id, category_id, title, content, tags, style, ratio, "
+                    "created_at, updated_at, sort_order) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (prompt["id"], category["id"], prompt["title"], prompt["content"],
+                     prompt.get("tags", ""), prompt.get("style", ""), prompt.get("ratio", ""),
+                     prompt.get("created_at", ""), prompt.get("updated_at", ""), sort_order)
+                )
+                sort_order += 1
+        self._conn.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?)",
+            [("next_category_id", data["next_category_id"]),
+             ("next_prompt_id", data["next_prompt_id"])]
+        )
+
+    def _load_index(self):
+        """从数据库构建内存索引"""
+        with self._lock:
+            self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            self._change_seq = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+            self._load_meta()
+            self._categories.clear()
+            self._category_prompts.clear()
+            self._prompts.clear()
+            self._prompt_category.clear()
+            self._tag_index.clear()
+            for category_id, name, description in self._conn.execute(
+                    "SELECT id, name, description FROM categories ORDER BY id"):
+                self._index_category(category_id, name, description or "")
+            self._next_sort_order = 0
+            for row in self._conn.execute(
+                    "SELECT id, category_id, title, content, tags, style, ratio, created_at, "
+                    "updated_at, sort_order FROM prompts ORDER BY sort_order"):
+                prompt = dict(zip(_PROMPT_COLUMNS, (row[0],) + row[2:9]))
+                if row[1] in self._categories:
+                    self._index_prompt(row[1], prompt)
+                self._next_sort_order = row[9] + 1
+
+    def _load_meta(self):
+        meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        self._next_category_id = meta["next_category_id"]
+        self._next_prompt_id = meta["next_prompt_id"]
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """
+        写事务：先取得数据库写锁，再同步其他进程已提交的改动
+        保证内存中的ID计数器和分类信息是最新的，不会与其他进程冲突
+        """
+        with self._lock, STORE_SECONDS.time(store="library", operation="write"):
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._sync_external_changes():
+                    self._mark_changed()
+                yield
+                # 本次写入产生的变更日志无需再同步
+                self._change_seq = self._conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                self._pending_records = {}
+                raise
+            self._flush_records()
+
+    def refresh(self):
+        """
+        同步其他进程对提示词库的修改，有变化时通知订阅者
+        其他线程正在写入（如后台导入、导出）时不等待，直接跳过，下次轮询再同步，避免阻塞调用方（界面线程）
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            with STORE_SECONDS.time(store="library", operation="sync"):
+                if self._sync_external_changes():
+                    self._mark_changed()
+                self._flush_records()
+        finally:
+            self._lock.release()
+        return self._flush_change("library")
+
+    def _record_change(self, collection, **ids):
+        """记录一次变更，事务提交或同步完成后通知（见 ChangeNotifier.add_record_listener）"""
+        changes = self._pending_records.setdefault(collection, RecordChanges())
+        changes.merge(RecordChanges(**ids))
+
+    def _flush_records(self):
+        pending, self._pending_records = self._pending_records, {}
+        for collection, changes in pending.items():
+            self._notify_records(collection, changes)
+
+    def _sync_external_changes(self):
+        """
+        应用其他进程提交的改动，返回是否有变化
+        data_version 只在其他连接提交后变化，检查开销极小；变化时按变更日志增量更新内存索引
+        """
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return False
+        self._data_version = data_version
+        oldest = self._conn.execute("SELECT MIN(seq) FROM change_log").fetchone()[0]
+        if oldest is not None and oldest > self._change_seq + 1:
+            # 变更日志已被裁剪，无法增量同步
+            self._load_index()
+            self._similarity = None
+            self._record_change("categories", reset=True)
+            self._record_change("prompts", reset=True)
+            return True
+
+        rows = self._conn.execute(
+            "SELECT seq, kind, row_id FROM change_log WHERE seq > ? ORDER BY seq", (self._change_seq,)
+        ).fetchall()
+        if not rows:
+            return False
+        self._change_seq = rows[-1][0]
+        self._load_meta()
+        changed_categories = dict.fromkeys(row_id for _, kind, row_id in rows if kind == "category")
+        changed_prompts = dict.fromkeys(row_id for _, kind, row_id in rows if kind == "prompt")
+        for category_id in changed_categories:
+            self._sync_category(category_id)
+        for prompt_id in changed_prompts:
+            self._sync_prompt(prompt_id)
+        return True
+
+    def _sync_category(self, category_id):
+        row = self._conn.execute(
+            "SELECT name, description FROM categories WHERE id = ?", (category_id,)
+        ).fetchone()
+        category = self._categories.get(category_id)
+        if row is None:
+            if category is not None:
+                prompt_ids = list(self._category_prompts[category_id])
+                for prompt_id in prompt_ids:
+                    self._unindex_prompt(prompt_id)
+                    if self._similarity is not None:
+                        self._similarity.remove(prompt_id)
+                del self._categories[category_id]
+                del self._category_prompts[category_id]
+                self._record_change("categories", removed=[category_id])
+                self._record_change("prompts", removed=prompt_ids)
+        elif category is None:
+            self._index_category(category_id, row[0], row[1] or "")
+            self._record_change("categories", added=[category_id])
+        else:
+            category["name"] = row[0]
+            category["description"] = row[1] or ""
+            self._record_change("categories", updated=[category_id])
+
+    def _sync_prompt(self, prompt_id):
+        row = self._conn.execute(
+            "SELECT id, category_id, title, content, tags, style, ratio, created_at, "
+            "updated_at, sort_order FROM prompts WHERE id = ?", (prompt_id,)
+        ).fetchone()
+        existing = self._prompts.get(prompt_id)
+        if row is None or row[1] not in self._categories:
+            if existing is not None:
+                self._unindex_prompt(prompt_id)
+                if self._similarity is not None:
+                    self._similarity.remove(prompt_id)
+                self._record_change("prompts", removed=[prompt_id])
+            return
+        if existing is None:
+            self._record_change("prompts", added=[prompt_id])
+        else:
+            self._record_change("prompts", updated=[prompt_id])
+        fields = dict(zip(_PROMPT_COLUMNS, (row[0],) + row[2:9]))
+        if existing is not None and self._prompt_category[prompt_id] == row[1]:
+            # 原地更新，保持在分类中的位置
+            self._unindex_tags(existing)
+            existing.update(fields)
+            self._index_tags(existing)
+        else:
+            if existing is not None:
+                self._unindex_prompt(prompt_id)
+            self._index_prompt(row[1], fields)
+        self._next_sort_order = max(self._next_sort_order, row[9] + 1)
+        if self._similarity is not None:
+            self._similarity.update(prompt_id, fields["content"])
+
+    def _rebuild_search_index(self):
+        """重建全文索引（首次启用或与数据不一致时）"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM prompt_fts")
+            self._conn.executemany(
+                "INSERT INTO prompt_fts (rowid, title, tags, content) VALUES (?, ?, ?, ?)",
+                ((p["id"], to_index_text(p["title"]), to_index_text(p["tags"]),
+                  to_index_text(p["content"])) for p in self._prompts.values())
+            )
+
+    def _write_search_index(self, prompt, replace=False):
+        """增量更新全文索引（调用方负责事务）"""
+        if not self._fts_enabled:
+            return
+        if replace:
+            self._conn.execute("DELETE FROM prompt_fts WHERE rowid = ?", (prompt["id"],))
+        self._conn.execute(
+            "INSERT INTO prompt_fts (rowid, title, tags, content) VALUES (?, ?, ?, ?)",
+            (prompt["id"], to_index_text(prompt["title"]), to_index_text(prompt["tags"]),
+             to_index_text(prompt["content"]))
+        )
+
+    def load_similarity_index(self):
+        """
+        加载相似度索引（签名持久化在提示词库旁边）
+        计算签名时不持有 self._lock，可在后台线程预先调用，加载期间的修改在加载完成后补上
+        :return: SimilarityIndex
+        """
+        with self._similarity_loading:
+            with self._lock:
+                if self._similarity is not None:
+                    return self._similarity
+                texts = {pid: p["content"] for pid, p in self._prompts.items()}
+            from core.prompt_similarity import SimilarityIndex
+            index = SimilarityIndex(os.path.splitext(self.data_file)[0] + ".minhash.npz")
+            index.load(texts)
+            with self._lock:
+                index.update_many((pid, p["content"]) for pid, p in self._prompts.items()
+                                  if texts.get(pid) != p["content"])
+                for prompt_id in texts.keys() - self._prompts.keys():
+                    index.remove(prompt_id)
+                self._similarity = index
+                return index
+
+    def _index_category(self, category_id, name, description):
+        self._category_prompts[category_id] = {}
+        self._categories[category_id] = {
+            "id": category_id,
+            "name": name,
+            "description": description
+        }
+
+    def _category_snapshot(self, category):
+        """对外返回的分类副本（prompts 为调用时刻该分类提示词的列表）"""
+        return dict(category, prompts=list(self._category_prompts[category["id"]].values()))
+
+    def _index_prompt(self, category_id, prompt):
+        self._category_prompts[category_id][prompt["id"]] = prompt
+        self._prompts[prompt["id"]] = prompt
+        self._prompt_category[prompt["id"]] = category_id
+        self._index_tags(prompt)
+
+    def _unindex_prompt(self, prompt_id):
+        category_id = self._prompt_category.pop(prompt_id)
+        del self._category_prompts[category_id][prompt_id]
+        prompt = self._prompts.pop(prompt_id)
+        self._unindex_tags(prompt)
+        return prompt
+
+    def _index_tags(self, prompt):
+        for tag in split_tags(prompt.get("tags")):
+            self._tag_index.setdefault(tag, set()).add(prompt["id"])
+
+    def _unindex_tags(self, prompt):
+        for tag in split_tags(prompt.get("tags")):
+            prompt_ids = self._tag_index.get(tag)
+            if prompt_ids is not None:
+                prompt_ids.discard(prompt["id"])
+                if not prompt_ids:
+                    del self._tag_index[tag]
+
+    def _take_sort_order(self):
+        sort_order = self._next_sort_order
+        self._next_sort_order += 1
+        return sort_order
+
     # 分类管理
     def get_categories(self):
-        """获取所有分类"""
-        return self.data["categories"]
-    
+        """获取所有分类（副本，分类的 prompts 为该分类提示词列表）"""
+        with self._lock:
+            return [self._category_snapshot(category) for category in self._categories.values()]
+
+    def get_category_counts(self):
+        """各分类的提示词数量 {分类ID: 数量}（按分类顺序，不复制提示词）"""
+        with self._lock:
+            return {category_id: len(self._category_prompts[category_id]) for category_id in self._categories}
+
+    def get_all_categories(self):
+        """获取所有分类（get_categories 的别名）"""
+        return self.get_categories()
+
     def add_category(self, name, description=""):
         """添加分类"""
-        category = {
-            "id": self.data["next_category_id"],
-            "name": name,
-            "description": description,
-            "prompts": []
-        }
-        self.data["categories"].append(category)
-        self.data["next_category_id"] += 1
-        self._save_data()
-        return category
-    
+        with self._transaction():
+            category_id = self._next_category_id
+            self._conn.execute(
+                "INSERT INTO categories (id, name, description) VALUES (?, ?, ?)",
+                (category_id, name, description)
+            )
+            self._conn.execute(
+                "UPDATE meta SET value = ? WHERE key = 'next_category_id'", (category_id + 1,)
+            )
+            self._next_category_id += 1
+            self._index_category(category_id, name, description)
+            self._record_change("categories", added=[category_id])
+            return self._category_snapshot(self._categories[category_id])
+
     def update_category(self, category_id, name, description=""):
         """更新分类"""
-        for category in self.data["categories"]:
-            if category["id"] == category_id:
-                category["name"] = name
-                category["description"] = description
-                self._save_data()
-                return True
-        return False
-    
+        with self._transaction():
+            category = self._categories.get(category_id)
+            if not category:
+                return False
+            self._conn.execute(
+                "UPDATE categories SET name = ?, description = ? WHERE id = ?",
+                (name, description, category_id)
+            )
+            category["name"] = name
+            category["description"] = description
+            self._record_change("categories", updated=[category_id])
+        return True
+
     def delete_category(self, category_id):
         """删除分类（及其所有提示词）"""
-        self.data["categories"] = [c for c in self.data["categories"] if c["id"] != category_id]
-        self._save_data()
+        with self._transaction():
+            self._conn.execute("DELETE FROM prompts WHERE category_id = ?", (category_id,))
+            self._conn.execute("DELETE FROM categories WHERE id = ?", (category_id,))
+            if category_id in self._categories:
+                prompt_ids = list(self._category_prompts[category_id])
+                if self._fts_enabled:
+                    self._conn.executemany("DELETE FROM prompt_fts WHERE rowid = ?",
+                                           ((prompt_id,) for prompt_id in prompt_ids))
+                for prompt_id in prompt_ids:
+                    self._unindex_prompt(prompt_id)
+                    if self._similarity is not None:
+                        self._similarity.remove(prompt_id)
+                del self._categories[category_id]
+                del self._category_prompts[category_id]
+                self._record_change("categories", removed=[category_id])
+                self._record_change("prompts", removed=prompt_ids)
         return True
-    
+
     def get_category_by_id(self, category_id):
-        """根据ID获取分类"""
-        for category in self.data["categories"]:
-            if category["id"] == category_id:
-                return category
-        return None
-    
+        """根据ID获取分类（副本）"""
+        with self._lock:
+            category = self._categories.get(category_id)
+            return self._category_snapshot(category) if category else None
+
+    def get_category_name(self, category_id):
+        """获取分类名称，分类不存在时返回 None"""
+        with self._lock:
+            category = self._categories.get(category_id)
+            return category["name"] if category else None
+
     # 提示词管理
+    def get_prompt_by_id(self, prompt_id):
+        """根据ID获取提示词"""
+        with self._lock:
+            return self._prompts.get(prompt_id)
+
+    def get_prompt_category_id(self, prompt_id):
+        """获取提示词所属分类ID"""
+        with self._lock:
+            return self._prompt_category.get(prompt_id)
+
     def add_prompt(self, category_id, title, content, tags="", style="", ratio=""):
         """添加提示词到指定分类"""
-        category = self.get_category_by_id(category_id)
-        if not category:
-            return None
-        
-        prompt = {
-            "id": self.data["next_prompt_id"],
-            "title": title,
-            "content": content,
-            "tags": tags,
-            "style": style,
-            "ratio": ratio,
-            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        category["prompts"].append(prompt)
-        self.data["next_prompt_id"] += 1
-        self._save_data()
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._transaction():
+            if category_id not in self._categories:
+                return None
+            prompt = {
+                "id": self._next_prompt_id,
+                "title": title,
+                "content": content,
+                "tags": tags,
+                "style": style,
+                "ratio": ratio,
+                "created_at": now,
+                "updated_at": now
+            }
+            self._conn.execute(
+                "INSERT INTO prompts (id, category_id, title, content, tags, style, ratio, "
+                "created_at, updated_at, sort_order) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (prompt["id"], category_id, title, content, tags, style, ratio,
+                 now, now, self._take_sort_order())
+            )
+            self._conn.execute(
+                "UPDATE meta SET value = ? WHERE key = 'next_prompt_id'", (prompt["id"] + 1,)
+            )
+            self._next_prompt_id += 1
+            self._write_search_index(prompt)
+            self._index_prompt(category_id, prompt)
+            if self._similarity is not None:
+                self._similarity.update(prompt["id"], content)
+            self._record_change("prompts", added=[prompt["id"]])
         return prompt
-    
+
     def update_prompt(self, category_id, prompt_id, title, content, tags="", style="", ratio=""):
         """更新提示词"""
-        category = self.get_category_by_id(category_id)
-        if not category:
-            return False
-        
-        for prompt in category["prompts"]:
-            if prompt["id"] == prompt_id:
-                prompt["title"] = title
-                prompt["content"] = content
-                prompt["tags"] = tags
-                prompt["style"] = style
-                prompt["ratio"] = ratio
-                prompt["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self._save_data()
-                return True
-        return False
-    
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._transaction():
+            if self._prompt_category.get(prompt_id) != category_id:
+                return False
+            prompt = self._prompts[prompt_id]
+            self._conn.execute(
+                "UPDATE prompts SET title = ?, content = ?, tags = ?, style = ?, ratio = ?, "
+                "updated_at = ? WHERE id = ?",
+                (title, content, tags, style, ratio, now, prompt_id)
+            )
+            self._unindex_tags(prompt)
+            prompt["title"] = title
+            prompt["content"] = content
+            prompt["tags"] = tags
+            prompt["style"] = style
+            prompt["ratio"] = ratio
+            prompt["updated_at"] = now
+            self._index_tags(prompt)
+            self._write_search_index(prompt, replace=True)
+            if self._similarity is not None:
+                self._similarity.update(prompt_id, content)
+            self._record_change("prompts", updated=[prompt_id])
+        return True
+
     def delete_prompt(self, category_id, prompt_id):
         """删除提示词"""
-        category = self.get_category_by_id(category_id)
-        if not category:
-            return False
-        
-        category["prompts"] = [p for p in category["prompts"] if p["id"] != prompt_id]
-        self._save_data()
+        with self._transaction():
+            if category_id not in self._categories:
+                return False
+            if self._prompt_category.get(prompt_id) == category_id:
+                self._conn.execute("DELETE FROM prompts WHERE id = ?", (prompt_id,))
+                if self._fts_enabled:
+                    self._conn.execute("DELETE FROM prompt_fts WHERE rowid = ?", (prompt_id,))
+                self._unindex_prompt(prompt_id)
+                if self._similarity is not None:
+                    self._similarity.remove(prompt_id)
+                self._record_change("prompts", removed=[prompt_id])
         return True
-    
+
     def get_prompts_by_category(self, category_id):
         """获取指定分类的所有提示词"""
-        category = self.get_category_by_id(category_id)
-        if category:
-            return category["prompts"]
+        with self._lock:
+            prompts = self._category_prompts.get(category_id)
+            if prompts is not None:
+                return list(prompts.values())
         return []
-    
-    def search_prompts(self, keyword):
-        """搜索提示词（按标题、内容、标签）"""
+
+    @STORE_SECONDS.timed(store="library", operation="search")
+    def search_prompts(self, keyword, tag=None, category_id=None, limit=None):
+        """
+        搜索提示词（按标题、内容、标签，按相关度排序）
+        :param keyword: 关键词，多个词之间为“且”关系，最后一个词按前缀匹配
+        :param tag: 只返回带有该标签的提示词
+        :param category_id: 只返回该分类下的提示词
+        :param limit: 最多返回条数，None 表示不限
+        :return: 附带 category_name/category_id 的提示词列表
+        """
+        with self._lock:
+            prompt_ids = self._search_ids(keyword, tag, category_id, limit)
+            results = []
+            for prompt_id in prompt_ids:
+                category = self._categories[self._prompt_category[prompt_id]]
+                results.append({
+                    "category_name": category["name"],
+                    "category_id": category["id"],
+                    **self._prompts[prompt_id]
+                })
+            return results
+
+    def suggest_prompts(self, prefix, limit=10):
+        """
+        边输入边搜索：取最相关的少量提示词（由 SQLite 按相关度排序并截取）
+        :return: [(分类ID, 提示词), ...]
+        """
+        with self._lock:
+            prompt_ids = self._search_ids(prefix, limit=limit)
+            return [(self._prompt_category[prompt_id], self._prompts[prompt_id])
+                    for prompt_id in prompt_ids]
+
+    def get_tag_facets(self, keyword=None, category_id=None):
+        """
+        获取标签分面统计
+        :param keyword: 只统计命中该关键词的提示词
+        :param category_id: 只统计该分类下的提示词
+        :return: [(标签, 数量), ...]，按数量降序
+        """
+        with self._lock:
+            if not keyword and category_id is None:
+                counts = {tag: len(ids) for tag, ids in self._tag_index.items()}
+            else:
+                counts = {}
+                for prompt_id in self._search_ids(keyword, category_id=category_id, ranked=False):
+                    for tag in split_tags(self._prompts[prompt_id].get("tags")):
+                        counts[tag] = counts.get(tag, 0) + 1
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+    def _search_ids(self, keyword, tag=None, category_id=None, limit=None, ranked=True):
+        """
+        返回命中的提示词ID（调用方需持有 self._lock，内存索引在导入等写操作中会被修改）
+        :param ranked: 是否按相关度排序（没有关键词时按添加顺序）
+        """
+        keyword = (keyword or "").strip()
+        allowed = None
+        if tag:
+            allowed = self._tag_index.get(tag, set())
+        if category_id is not None:
+            in_category = self._category_prompts.get(category_id, {}).keys()
+            if not keyword and allowed is None:
+                # 只按分类筛选：保持分类内的顺序
+                return list(in_category)[:limit]
+            allowed = in_category if allowed is None else allowed & in_category
+
+        if not keyword:
+            if allowed is None:
+                return []
+            # 只遍历标签下的提示词（ID 递增即添加顺序），不扫描整个库
+            return sorted(allowed)[:limit]
+
+        if not self._fts_enabled:
+            # SQLite 未编译 FTS5 时退化为子串匹配
+            keyword = keyword.lower()
+            prompt_ids = []
+            for prompt_id, prompt in self._prompts.items():
+                if allowed is not None and prompt_id not in allowed:
+                    continue
+                if (keyword in prompt["title"].lower() or
+                    keyword in prompt["content"].lower() or
+                    keyword in prompt.get("tags", "").lower()):
+                    prompt_ids.append(prompt_id)
+                    if limit is not None and len(prompt_ids) >= limit:
+                        break
+            return prompt_ids
+
+        match = build_match_query(keyword, prefix=True)
+        if not match:
+            return []
+        bm25 = f"bm25(prompt_fts, {', '.join(map(str, _FIELD_WEIGHTS))})"
+        if not ranked:
+            rows = self._conn.execute(
+                "SELECT rowid FROM prompt_fts WHERE prompt_fts MATCH ?", (match,)
+            ).fetchall()
+        else:
+            sql = f"SELECT rowid FROM prompt_fts WHERE prompt_fts MATCH ? ORDER BY {bm25}"
+            if allowed is None and limit is not None:
+                rows = self._conn.execute(sql + " LIMIT ?", (match, limit)).fetchall()
+            else:
+                rows = self._conn.execute(sql, (match,)).fetchall()
+        prompt_ids = [row[0] for row in rows
+                      if row[0] in self._prompts and (allowed is None or row[0] in allowed)]
+        return prompt_ids[:limit] if limit is not None else prompt_ids
+
+    def find_similar_prompts(self, prompt_id, limit=10, threshold=0.2):
+        """
+        查找与指定提示词相似的提示词
+        :return: 附带 category_name/category_id/similarity 的提示词列表
+        """
+        index = self.load_similarity_index()
+        with self._lock:
+            prompt = self._prompts.get(prompt_id)
+            if not prompt:
+                return []
+            matches = index.similar(prompt["content"], limit=limit, threshold=threshold, exclude_id=prompt_id)
+            return self._with_similarity(matches)
+
+    def find_near_duplicates(self, content, threshold=0.7, exclude_id=None, limit=5):
+        """
+        保存前查重：查找内容高度相似的已有提示词
+        :param exclude_id: 编辑已有提示词时排除其自身
+        """
+        index = self.load_similarity_index()
+        with self._lock:
+            matches = index.similar(content, limit=limit, threshold=threshold, exclude_id=exclude_id)
+            return self._with_similarity(matches)
+
+    def _with_similarity(self, matches):
         results = []
-        for category in self.data["categories"]:
-            for prompt in category["prompts"]:
-                if (keyword.lower() in prompt["title"].lower() or 
-                    keyword.lower() in prompt["content"].lower() or 
-                    keyword.lower() in prompt.get("tags", "").lower()):
-                    results.append({
-                        "category_name": category["name"],
-                        "category_id": category["id"],
-                        **prompt
-                    })
+        for prompt_id, score in matches:
+            if prompt_id not in self._prompts:
+                continue
+            category = self._categories[self._prompt_category[prompt_id]]
+            results.append({
+                "category_name": category["name"],
+                "category_id": category["id"],
+                "similarity": score,
+                **self._prompts[prompt_id]
+            })
         return results
-    
+
+    def close(self):
+        """保存相似度索引并关闭数据库"""
+        with self._lock:
+            if self._similarity is not None:
+                self._similarity.save()
+            self._conn.close()
+
     def move_prompt(self, from_category_id, to_category_id, prompt_id):
         """移动提示词到另一个分类"""
-        from_category = self.get_category_by_id(from_category_id)
-        to_category = self.get_category_by_id(to_category_id)
-        
-        if not from_category or not to_category:
-            return False
-        
-        prompt = None
-        for p in from_category["prompts"]:
-            if p["id"] == prompt_id:
-                prompt = p
-                break
-        
-        if not prompt:
-            return False
-        
-        from_category["prompts"] = [p for p in from_category["prompts"] if p["id"] != prompt_id]
-        to_category["prompts"].append(prompt)
-        self._save_data()
+        with self._transaction():
+            if from_category_id not in self._categories or to_category_id not in self._categories:
+                return False
+            if self._prompt_category.get(prompt_id) != from_category_id:
+                return False
+            self._conn.execute(
+                "UPDATE prompts SET category_id = ?, sort_order = ? WHERE id = ?",
+                (to_category_id, self._take_sort_order(), prompt_id)
+            )
+            prompt = self._unindex_prompt(prompt_id)
+            self._index_prompt(to_category_id, prompt)
+            self._record_change("prompts", updated=[prompt_id])
         return True
+
+    # 批量导入导出
+    def export_prompts(self, path, fmt=None, category_id=None):
+        """
+        流式导出提示词（逐行写出，不在内存中拼接整个文件）
+        :param path: 导出文件路径（.jsonl 或 .csv）
+        :param fmt: 文件格式，默认按扩展名判断
+        :param category_id: 只导出该分类，None 表示全部
+        :return: 导出条数
+        """
+        fmt = _file_format(path, fmt)
+        sql = ("SELECT c.name, p.title, p.content, p.tags, p.style, p.ratio, p.created_at, p.updated_at "
+               "FROM prompts p JOIN categories c ON c.id = p.category_id")
+        params = ()
+        if category_id is not None:
+            sql += " WHERE p.category_id = ?"
+            params = (category_id,)
+        sql += " ORDER BY p.sort_order"
+
+        count = 0
+        with self._lock, atomic_open(path, "w", newline="") as f:
+            writer = csv.writer(f) if fmt == "csv" else None
+            if writer:
+                writer.writerow(EXPORT_FIELDS)
+            for row in self._conn.execute(sql, params):
+                if writer:
+                    writer.writerow(row)
+                else:
+                    f.write(json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False))
+                    f.write("\n")
+                count += 1
+        return count
+
+    def import_prompts(self, path, fmt=None, default_category_id=None, progress_callback=None):
+        """
+        流式批量导入提示词（单个事务，失败时整体回滚）
+        :param path: 导入文件路径（.jsonl 或 .csv，字段同 EXPORT_FIELDS；JSONL 的 tags 也可以是列表）
+        :param fmt: 文件格式，默认按扩展名判断
+        :param default_category_id: 未指定 category 的行归入该分类（默认第一个分类）
+        :param progress_callback: 进度回调 callback(已处理行数, 进度0~1)
+        :return: {"imported": 导入数, "duplicates": 重复数, "skipped": 无效行数}
+        """
+        fmt = _file_format(path, fmt)
+        stats = {"imported": 0, "duplicates": 0, "skipped": 0}
+        total_bytes = os.path.getsize(path) or 1
+
+        with self._lock:
+            new_categories = []   # [(分类ID, 名称)]
+            new_prompts = []      # [(分类ID, 提示词)]
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+            with self._transaction(), open(path, "rb") as raw:
+                if default_category_id is None and self._categories:
+                    default_category_id = next(iter(self._categories))
+                seen = {content_hash(p["content"]) for p in self._prompts.values()}
+                category_ids = {c["name"]: c["id"] for c in self._categories.values()}
+                next_category_id = self._next_category_id
+                next_prompt_id = self._next_prompt_id
+                next_sort_order = self._next_sort_order
+                f = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+                rows = csv.DictReader(f) if fmt == "csv" else _read_jsonl(f)
+                for line_no, row in enumerate(rows, 1):
+                    if progress_callback and line_no % _PROGRESS_EVERY == 0:
+                        progress_callback(line_no, min(raw.tell() / total_bytes, 1.0))
+                    row = _normalize_row(row)
+                    content = row["content"].strip() if row else ""
+                    if not content:
+                        stats["skipped"] += 1
+                        continue
+                    digest = content_hash(content)
+                    if digest in seen:
+                        stats["duplicates"] += 1
+                        continue
+                    seen.add(digest)
+
+                    category_name = row["category"].strip()
+                    if category_name:
+                        category_id = category_ids.get(category_name)
+                        if category_id is None:
+                            category_id = next_category_id
+                            next_category_id += 1
+                            self._conn.execute(
+                                "INSERT INTO categories (id, name, description) VALUES (?, ?, ?)",
+                                (category_id, category_name, "")
+                            )
+                            category_ids[category_name] = category_id
+                            new_categories.append((category_id, category_name))
+                    elif default_category_id is not None:
+                        category_id = default_category_id
+                    else:
+                        stats["skipped"] += 1
+                        continue
+
+                    prompt = {
+                        "id": next_prompt_id,
+                        "title": row["title"].strip() or content[:20],
+                        "content": content,
+                        "tags": row["tags"],
+                        "style": row["style"],
+                        "ratio": row["ratio"],
+                        "created_at": row["created_at"] or now,
+                        "updated_at": row["updated_at"] or now
+                    }
+                    next_prompt_id += 1
+                    self._conn.execute(
+                        "INSERT INTO prompts (id, category_id, title, content, tags, style, ratio, "
+                        "created_at, updated_at, sort_order) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (prompt["id"], category_id, prompt["title"], content, prompt["tags"],
+                         prompt["style"], prompt["ratio"], prompt["created_at"], prompt["updated_at"],
+                         next_sort_order)
+                    )
+                    next_sort_order += 1
+                    self._write_search_index(prompt)
+                    new_prompts.append((category_id, prompt))
+                    stats["imported"] += 1
+
+                self._conn.executemany(
+                    "UPDATE meta SET value = ? WHERE key = ?",
+                    [(next_category_id, "next_category_id"), (next_prompt_id, "next_prompt_id")]
+                )
+
+            # 事务提交后再更新内存索引
+            for category_id, name in new_categories:
+                self._index_category(category_id, name, "")
+            for category_id, prompt in new_prompts:
+                self._index_prompt(category_id, prompt)
+            self._next_category_id = next_category_id
+            self._next_prompt_id = next_prompt_id
+            self._next_sort_order = next_sort_order
+            if self._similarity is not None:
+                self._similarity.update_many((p["id"], p["content"]) for _, p in new_prompts)
+            self._record_change("categories", added=[category_id for category_id, _ in new_categories])
+            self._record_change("prompts", added=[prompt["id"] for _, prompt in new_prompts])
+            self._flush_records()
+
+        if progress_callback:
+            progress_callback(stats["imported"] + stats["duplicates"] + stats["skipped"], 1.0)
+        return stats
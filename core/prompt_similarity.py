@@ -0,0 +1,225 @@
+import os
+import re
+import zlib
+import numpy as np
+from core.metrics import CACHE_REQUESTS
+from core.persistence import atomic_open
+
+# MinHash 参数（固定随机种子，保证持久化的签名跨进程可复用）
+_NUM_PERM = 128
+_MAX_HASH = np.uint32(0xFFFFFFFF)
+_rng = np.random.RandomState(20240601)
+# 对 n-gram 哈希值做 h(x) = (a * x + b) mod 2^32 的随机置换（a 取奇数保证一一映射）
+_PERM_A = _rng.randint(0, 1 << 31, size=_NUM_PERM, dtype=np.uint32) * np.uint32(2) + np.uint32(1)
+_PERM_B = _rng.randint(0, 1 << 32, size=_NUM_PERM, dtype=np.uint32)
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def text_digest(text):
+    """文本指纹，用于判断持久化的签名是否过期"""
+    return zlib.crc32((text or "").encode("utf-8"))
+
+
+def shingle_hashes(text, size=3):
+    """
+    字符 n-gram 哈希集合（中英文通用，忽略大小写和多余空白）
+    :return: 去重后的 uint32 数组
+    """
+    text = _SPACE_RE.sub(" ", (text or "").lower()).strip()
+    if not text:
+        return np.zeros(0, dtype=np.uint32)
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    count = max(len(codes) - size + 1, 1)
+    hashes = np.zeros(count, dtype=np.uint32)
+    for offset in range(min(size, len(codes))):
+        hashes *= np.uint32(0x01000193)
+        hashes ^= codes[offset:offset + count]
+    # murmur3 fmix32，打散相近 n-gram 的哈希值
+    hashes ^= hashes >> np.uint32(16)
+    hashes *= np.uint32(0x85EBCA6B)
+    hashes ^= hashes >> np.uint32(13)
+    hashes *= np.uint32(0xC2B2AE35)
+    hashes ^= hashes >> np.uint32(16)
+    return np.unique(hashes)
+
+
+def minhash_signature(text):
+    """计算文本的 MinHash 签名（uint32 向量）"""
+    return minhash_signatures([text])[0]
+
+
+def minhash_signatures(texts, batch_shingles=50000):
+    """
+    批量计算 MinHash 签名
+    :param texts: 文本列表
+    :param batch_shingles: 每批处理的 n-gram 数量上限（控制内存）
+    :return: (len(texts), _NUM_PERM) 的 uint32 矩阵
+    """
+    signatures = np.full((len(texts), _NUM_PERM), _MAX_HASH, dtype=np.uint32)
+    start = 0
+    while start < len(texts):
+        hashes, counts, total, end = [], [], 0, start
+        while end < len(texts) and (end == start or total < batch_shingles):
+            doc_hashes = shingle_hashes(texts[end])
+            hashes.append(doc_hashes)
+            counts.append(len(doc_hashes))
+            total += len(doc_hashes)
+            end += 1
+        counts = np.array(counts)
+        rows = np.flatnonzero(counts) + start
+        if len(rows):
+            # (置换数, n-gram 数)，按行连续存放以便 reduceat
+            permuted = _PERM_A[:, None] * np.concatenate(hashes)[None, :]
+            permuted += _PERM_B[:, None]
+            offsets = np.concatenate(([0], np.cumsum(counts[counts > 0])[:-1]))
+            signatures[rows] = np.minimum.reduceat(permuted, offsets, axis=1).T
+        start = end
+    return signatures
+
+
+class SimilarityIndex:
+    """提示词相似度索引（MinHash 估计字符 n-gram 的 Jaccard 相似度）"""
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._digests = np.zeros(0, dtype=np.uint32)
+        self._signatures = np.zeros((0, _NUM_PERM), dtype=np.uint32)
+        self._size = 0
+        self._rows = {}  # 提示词ID -> 行号
+        self._dirty = False
+
+    def load(self, texts):
+        """
+        加载持久化的签名，只为新增或内容变化的提示词重新计算
+        :param texts: {提示词ID: 文本}
+        """
+        cached_rows = {}
+        if os.path.exists(self.index_path):
+            try:
+                with np.load(self.index_path) as data:
+                    cached_digests = data["digests"]
+                    cached_signatures = data["signatures"]
+                    if cached_signatures.shape[1] == _NUM_PERM:
+                        cached_rows = {pid: row for row, pid in enumerate(data["ids"].tolist())}
+            except (OSError, KeyError, ValueError):
+                cached_rows = {}
+
+        self._reserve(len(texts))
+        stale_ids, stale_texts, stale_digests = [], [], []
+        for prompt_id, text in texts.items():
+            digest = text_digest(text)
+            row = cached_rows.get(prompt_id)
+            if row is not None and cached_digests[row] == digest:
+                self._append(prompt_id, digest, cached_signatures[row])
+            else:
+                stale_ids.append(prompt_id)
+                stale_texts.append(text)
+                stale_digests.append(digest)
+        for prompt_id, digest, signature in zip(stale_ids, stale_digests,
+                                                minhash_signatures(stale_texts)):
+            self._append(prompt_id, digest, signature)
+        CACHE_REQUESTS.inc(len(texts) - len(stale_ids), cache="similarity_signature", result="hit")
+        CACHE_REQUESTS.inc(len(stale_ids), cache="similarity_signature", result="miss")
+        if stale_ids or len(cached_rows) != len(texts):
+            self._dirty = True
+        self.save()
+
+    def save(self):
+        """有改动时写入磁盘"""
+        if not self._dirty:
+            return
+        with atomic_open(self.index_path, "wb") as f:
+            np.savez(f,
+                     ids=self._ids[:self._size],
+                     digests=self._digests[:self._size],
+                     signatures=self._signatures[:self._size])
+        self._dirty = False
+
+    def update(self, prompt_id, text):
+        """新增或更新提示词的签名"""
+        digest = text_digest(text)
+        row = self._rows.get(prompt_id)
+        if row is not None and self._digests[row] == digest:
+            CACHE_REQUESTS.inc(cache="similarity_signature", result="hit")
+            return
+        CACHE_REQUESTS.inc(cache="similarity_signature", result="miss")
+        signature = minhash_signature(text)
+        if row is None:
+            self._reserve(self._size + 1)
+            self._append(prompt_id, digest, signature)
+        else:
+            self._digests[row] = digest
+            self._signatures[row] = signature
+        self._dirty = True
+
+    def update_many(self, items):
+        """
+        批量新增或更新签名
+        :param items: [(提示词ID, 文本), ...]
+        """
+        items = list(items)
+        if not items:
+            return
+        signatures = minhash_signatures([text for _, text in items])
+        self._reserve(self._size + len(items))
+        for (prompt_id, text), signature in zip(items, signatures):
+            row = self._rows.get(prompt_id)
+            if row is None:
+                self._append(prompt_id, text_digest(text), signature)
+            else:
+                self._digests[row] = text_digest(text)
+                self._signatures[row] = signature
+        self._dirty = True
+
+    def remove(self, prompt_id):
+        """删除提示词的签名（用最后一行填补空位）"""
+        row = self._rows.pop(prompt_id, None)
+        if row is None:
+            return
+        last = self._size - 1
+        if row != last:
+            moved_id = int(self._ids[last])
+            self._ids[row] = moved_id
+            self._digests[row] = self._digests[last]
+            self._signatures[row] = self._signatures[last]
+            self._rows[moved_id] = row
+        self._size -= 1
+        self._dirty = True
+
+    def similar(self, text, limit=10, threshold=0.0, exclude_id=None):
+        """
+        查找与文本相似的提示词
+        :return: [(提示词ID, 相似度), ...]，按相似度降序
+        """
+        if self._size == 0:
+            return []
+        signature = minhash_signature(text)
+        scores = (self._signatures[:self._size] == signature).mean(axis=1)
+        if exclude_id is not None and exclude_id in self._rows:
+            scores[self._rows[exclude_id]] = -1.0
+        candidates = np.flatnonzero(scores >= max(threshold, 1e-9))
+        if len(candidates) > limit:
+            top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(self._ids[row]), float(scores[row])) for row in candidates]
+
+    def _reserve(self, capacity):
+        if capacity <= len(self._ids):
+            return
+        capacity = max(capacity, len(self._ids) * 2, 64)
+        self._ids = np.resize(self._ids, capacity)
+        self._digests = np.resize(self._digests, capacity)
+        signatures = np.zeros((capacity, _NUM_PERM), dtype=np.uint32)
+        signatures[:self._size] = self._signatures[:self._size]
+        self._signatures = signatures
+
+    def _append(self, prompt_id, digest, signature):
+        row = self._size
+        self._ids[row] = prompt_id
+        self._digests[row] = digest
+        self._signatures[row] = signature
+        self._rows[prompt_id] = row
+        self._size += 1
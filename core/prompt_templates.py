@@ -0,0 +1,132 @@
+import string
+from functools import lru_cache
+from operator import itemgetter
+
+_formatter = string.Formatter()
+
+
+class TemplateError(ValueError):
+    """提示词模板格式错误"""
+
+
+@lru_cache(maxsize=512)
+def template_fields(template):
+    """
+    解析模板中的占位符（结果缓存，同一模板只解析一次）
+    :param template: str.format 风格的模板
+    :return: 占位符名称集合（frozenset）
+    :raises TemplateError: 括号不匹配、位置占位符 {}、属性/下标访问等不支持的写法
+    """
+    fields = set()
+    try:
+        for _, field, _, _ in _formatter.parse(template):
+            if field is None:
+                continue
+            if not field.isidentifier():
+                raise TemplateError(f"不支持的占位符 {{{field}}}，占位符必须是参数名")
+            fields.add(field)
+    except TemplateError:
+        raise
+    except ValueError as e:
+        raise TemplateError(f"模板格式错误：{str(e)}")
+    return frozenset(fields)
+
+
+def compile_format(template):
+    """
+    预解析模板，返回渲染函数 render(params) -> str，与 template.format_map(params) 结果一致
+    模板只用 string.Formatter 解析一次，得到字段列表和转义后的 % 格式串；渲染时按字段列表一次取出参数再格式化，
+    不再逐次解析模板。带格式说明或转换（如 {x:>10}、{x!r}）的模板直接使用 format_map
+    :raises TemplateError: 模板格式错误
+    """
+    template_fields(template)
+    parts, fields = [], []
+    for literal, field, spec, conversion in _formatter.parse(template):
+        parts.append(literal.replace("%", "%%"))
+        if field is None:
+            continue
+        if spec or conversion:
+            return template.format_map
+        parts.append("%s")
+        fields.append(field)
+    pattern = "".join(parts)
+    if not fields:
+        text = pattern.replace("%%", "%")
+        return lambda params: text
+    if len(fields) == 1:
+        field = fields[0]
+        return lambda params: pattern % (params[field],)
+    get_values = itemgetter(*fields)
+    return lambda params: pattern % get_values(params)
+
+
+class CompiledTemplate:
+    """
+    预编译的提示词模板
+    模板与默认值只解析一次；渲染时合并参数后调用预解析的渲染函数，不再逐个判断用途
+    """
+
+    __slots__ = ("template", "fields", "_format", "_defaults", "_derived")
+
+    def __init__(self, template, defaults=None):
+        """
+        :param template: str.format 风格的模板
+        :param defaults: 参数默认值，值中可引用其他参数（如 "{content}"），渲染时按行展开
+        :raises TemplateError: 模板或默认值格式错误
+        """
+        self.template = template
+        self.fields = template_fields(template)
+        self._format = compile_format(template)
+        self._defaults = {}
+        self._derived = []   # [(参数名, 默认值模板的 format_map)]
+        for key, value in (defaults or {}).items():
+            value = str(value)
+            if template_fields(value):
+                self._derived.append((key, compile_format(value)))
+            else:
+                self._defaults[key] = value
+
+    def available_params(self, base_params=()):
+        """有默认值的参数名（加上调用方总会提供的基础参数）"""
+        return frozenset(base_params).union(self._defaults, (key for key, _ in self._derived))
+
+    def render(self, params):
+        """
+        渲染单条提示词
+        :raises ValueError: 缺少模板参数
+        """
+        missing = self.fields - self.available_params(params)
+        if missing:
+            raise ValueError(f"缺少模板参数：{', '.join(sorted(missing))}")
+        return self.render_many((params,))[0]
+
+    def render_many(self, rows):
+        """
+        批量渲染
+        :param rows: 参数字典序列，每行覆盖默认值
+        :return: 提示词列表
+        :raises ValueError: 某行缺少模板参数（指出行号和参数名）
+        """
+        fmt = self._format
+        defaults = self._defaults
+        derived = self._derived
+        results = []
+        append = results.append
+        row_no = 0
+        try:
+            if derived:
+                for row_no, row in enumerate(rows, 1):
+                    params = {**defaults, **row}
+                    for key, render_default in derived:
+                        if key not in row:
+                            params[key] = render_default(params)
+                    append(fmt(params))
+            elif defaults:
+                for row_no, row in enumerate(rows, 1):
+                    append(fmt({**defaults, **row}))
+            else:
+                for row_no, row in enumerate(rows, 1):
+                    append(fmt(row))
+        except KeyError as e:
+            raise ValueError(f"第 {row_no} 行缺少模板参数：{e.args[0]}") from None
+        return results
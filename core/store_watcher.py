@@ -0,0 +1,150 @@
+import threading
+from core.logger import get_logger
+
+
+class RecordChanges:
+    """
+    一次变更涉及的记录 ID：新增、删除、修改
+    reset 表示无法逐条确定（如整体重新加载），订阅者应重新读取全部数据
+    """
+
+    def __init__(self, added=(), removed=(), updated=(), reset=False):
+        self.added = set(added)
+        self.removed = set(removed)
+        self.updated = set(updated)
+        self.reset = reset
+
+    @classmethod
+    def diff(cls, old_records, new_records, key="id"):
+        """比较两份记录列表（按 key 对应），得到变更"""
+        old = {record[key]: record for record in old_records}
+        new = {record[key]: record for record in new_records}
+        return cls(added=new.keys() - old.keys(), removed=old.keys() - new.keys(),
+                   updated=[k for k in new.keys() & old.keys() if new[k] != old[k]])
+
+    def merge(self, other):
+        """合并后一次变更（先增后删的记录视为删除）"""
+        self.reset = self.reset or other.reset
+        self.added = (self.added | other.added) - other.removed
+        self.removed = (self.removed | other.removed) - other.added
+        self.updated = (self.updated | other.updated) - self.added - self.removed
+        return self
+
+    def ids(self):
+        """所有涉及的 ID"""
+        return self.added | self.removed | self.updated
+
+    def __bool__(self):
+        return bool(self.reset or self.added or self.removed or self.updated)
+
+    def __repr__(self):
+        return (f"RecordChanges(added={sorted(self.added)}, removed={sorted(self.removed)}, "
+                f"updated={sorted(self.updated)}, reset={self.reset})")
+
+
+class ChangeNotifier:
+    """
+    存储变更通知
+    - 变更回调 callback(source)：其他进程修改了数据并被重新加载后通知
+    - 记录回调 callback(collection, RecordChanges)：任何来源（本进程写入或同步其他进程）的逐条变更，
+      在执行修改的线程中调用，界面据此只更新变化的行
+    """
+
+    def __init__(self):
+        self._change_listeners = []
+        self._change_pending = False
+        self._record_listeners = []
+
+    def add_change_listener(self, callback):
+        """添加变更回调 callback(source)，在调用 refresh() 的线程中执行"""
+        self._change_listeners.append(callback)
+
+    def remove_change_listener(self, callback):
+        """移除变更回调"""
+        if callback in self._change_listeners:
+            self._change_listeners.remove(callback)
+
+    def add_record_listener(self, callback):
+        """添加记录变更回调 callback(collection, changes)"""
+        self._record_listeners.append(callback)
+
+    def remove_record_listener(self, callback):
+        """移除记录变更回调"""
+        if callback in self._record_listeners:
+            self._record_listeners.remove(callback)
+
+    def _notify_records(self, collection, changes):
+        """通知记录变更（没有变化时不通知）"""
+        if not changes:
+            return
+        for callback in list(self._record_listeners):
+            try:
+                callback(collection, changes)
+            except Exception as e:
+                get_logger().error(f"记录变更回调错误: {str(e)}")
+
+    def _mark_changed(self):
+        """记录待通知的变更（写操作中同步到的改动留到下次 refresh() 时统一通知）"""
+        self._change_pending = True
+
+    def _flush_change(self, source):
+        """有待通知的变更时通知订阅者，返回是否通知"""
+        if not self._change_pending:
+            return False
+        self._change_pending = False
+        self._notify_change(source)
+        return True
+
+    def _notify_change(self, source):
+        for callback in list(self._change_listeners):
+            try:
+                callback(source)
+            except Exception as e:
+                get_logger().error(f"存储变更回调错误: {str(e)}")
+
+
+class StoreWatcher:
+    """
+    多进程共享数据目录时，定期检查各存储是否被其他进程修改
+    只比较文件状态/数据库版本号，不读取完整文件；有变化时由存储自行增量或整体重新加载
+    GUI 中在主线程定时调用 poll()；无界面的批处理进程可调用 start() 在后台线程中轮询
+    """
+
+    def __init__(self, stores=(), interval=1.0):
+        self.stores = list(stores)
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add(self, store):
+        """添加需要检查的存储（需提供 refresh() 方法）"""
+        self.stores.append(store)
+
+    def poll(self):
+        """检查一次所有存储，返回是否有存储被重新加载"""
+        changed = False
+        for store in self.stores:
+            try:
+                changed = store.refresh() or changed
+            except Exception as e:
+                get_logger().error(f"同步存储失败（{type(store).__name__}）: {str(e)}")
+        return changed
+
+    def start(self):
+        """在后台线程中定期轮询"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="StoreWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台轮询"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.poll()
@@ -0,0 +1,57 @@
+import re
+import sqlite3
+
+# 中日韩文字范围
+_CJK = r"\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_TRAILING_WORD_RE = re.compile(r"([a-z0-9]+)\s*$")
+_CJK_CHAR_RE = re.compile(f"[{_CJK}]")
+_CJK_BIGRAM_RE = re.compile(f"(?=([{_CJK}]{{2}}))")
+_CJK_SINGLE_RE = re.compile(f"(?<![{_CJK}])[{_CJK}](?![{_CJK}])")
+
+
+def tokenize(text, unigrams=False):
+    """
+    将文本切分为检索词（不保证原文顺序）
+    :param text: 原始文本
+    :param unigrams: 是否额外输出所有中文单字（建索引时使用，便于单字查询）
+    :return: 检索词列表（英文按单词，中文按相邻二字组，孤立的单字保留原字）
+    """
+    if not text:
+        return []
+    text = text.lower()
+    tokens = _WORD_RE.findall(text)
+    tokens += _CJK_BIGRAM_RE.findall(text)
+    tokens += (_CJK_CHAR_RE if unigrams else _CJK_SINGLE_RE).findall(text)
+    return tokens
+
+
+def to_index_text(text):
+    """转换为写入 FTS 表的分词文本（空格分隔）"""
+    return " ".join(tokenize(text, unigrams=True))
+
+
+def build_match_query(keyword, prefix=False):
+    """
+    构造 FTS5 MATCH 查询（所有检索词需同时命中）
+    :param keyword: 用户输入的关键词
+    :param prefix: 最后一个英文词按前缀匹配（边输入边搜索）
+    :return: MATCH 表达式，无有效检索词时返回 None
+    """
+    tokens = list(dict.fromkeys(tokenize(keyword)))
+    if not tokens:
+        return None
+    # 中文单字已单独建索引，只有末尾正在输入的英文词需要前缀匹配
+    trailing = _TRAILING_WORD_RE.search(keyword.lower()) if prefix else None
+    trailing_word = trailing.group(1) if trailing else None
+    return " ".join(f'"{token}"*' if token == trailing_word else f'"{token}"' for token in tokens)
+
+
+def fts5_available(conn):
+    """检测当前 SQLite 是否支持 FTS5"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp._fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp._fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
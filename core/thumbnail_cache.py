@@ -0,0 +1,212 @@
+import contextlib
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from core.metrics import CACHE_REQUESTS
+
+# 预先生成的缩略图边长：参考图列表、历史图库、编辑对话
+THUMBNAIL_SIZES = (100, 160, 300)
+# 磁盘缓存上限，超出后按最近使用时间淘汰
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# 设置后缓存写入该目录（如批处理任务、基准测试，避免写入程序目录）
+CACHE_DIR_ENV = "INFOGRAPHICS_CACHE_DIR"
+
+
+def default_cache_dir():
+    """缩略图目录：<INFOGRAPHICS_CACHE_DIR>/thumbnails，未设置时为 <程序目录>/cache/thumbnails"""
+    base = os.environ.get(CACHE_DIR_ENV)
+    if not base:
+        from core.config_manager import APP_BASE_PATH
+        base = os.path.join(APP_BASE_PATH, "cache")
+    return os.path.join(base, "thumbnails")
+
+
+class ThumbnailCache:
+    """
+    磁盘缩略图缓存
+    以 原图路径 + 修改时间 + 文件大小 为键，一次解码生成全部规格；原图被改写后键随之变化，旧缩略图等待淘汰
+    命中时更新缩略图的修改时间，总大小超出上限时删除最久未使用的文件
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, sizes=THUMBNAIL_SIZES):
+        """
+        :param cache_dir: 缓存目录，默认为程序目录下的 cache/thumbnails
+        :param max_bytes: 缓存总大小上限（字节）
+        :param sizes: 生成的缩略图边长
+        """
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.sizes = tuple(sorted(sizes))
+        self._total_bytes = None  # 第一次写入时统计
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _key(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        source = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}"
+        return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+    def _thumb_path(self, key, size):
+        return os.path.join(self.cache_dir, key[:2], f"{key}_{size}.png")
+
+    def _standard_size(self, size):
+        """不小于 size 的最小预设规格（没有则用最大的）"""
+        for standard in self.sizes:
+            if standard >= size:
+                return standard
+        return self.sizes[-1]
+
+    def get(self, path, size):
+        """
+        获取缩略图（未缓存时从原图生成）
+        :param path: 原图路径
+        :param size: 最长边（像素），非预设规格时由大一级的缩略图缩小
+        :return: 已加载的 PIL 图片；原图不存在时为 None
+        """
+        key = self._key(path)
+        if key is None:
+            return None
+        standard = self._standard_size(size)
+        thumb_path = self._thumb_path(key, standard)
+        try:
+            with Image.open(thumb_path) as image:
+                image.load()
+            with contextlib.suppress(OSError):
+                os.utime(thumb_path)
+            CACHE_REQUESTS.inc(cache="thumbnail", result="hit")
+        except (OSError, ValueError):
+            CACHE_REQUESTS.inc(cache="thumbnail", result="miss")
+            image = self._generate(path, key)[standard]
+        if max(image.size) > size:
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        return image
+
+    def get_async(self, path, size, callback, cancelled=None):
+        """
+        在后台线程获取缩略图，完成后在后台线程调用 callback(图片, 错误)
+        :param cancelled: 可选，任务开始执行时返回 True 则跳过（如图片已滚出可见区域）
+        """
+        def task():
+            if cancelled is not None and cancelled():
+                return
+            try:
+                image, error = self.get(path, size), None
+            except Exception as e:
+                image, error = None, e
+            callback(image, error)
+        self._submit(task)
+
+    def generate(self, path):
+        """
+        为原图生成全部规格的缩略图（已存在时跳过），在图片保存后调用
+        :return: 是否新生成了缩略图
+        """
+        key = self._key(path)
+        if key is None:
+            return False
+        if all(os.path.exists(self._thumb_path(key, size)) for size in self.sizes):
+            return False
+        self._generate(path, key)
+        return True
+
+    def prefill(self, paths):
+        """后台为一批图片补齐缩略图（启动时预热，失败的图片跳过）"""
+        def task():
+            for path in paths:
+                with contextlib.suppress(Exception):
+                    self.generate(path)
+        self._submit(task)
+
+    def _submit(self, task):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumbnail-cache")
+            self._executor.submit(task)
+
+    def _generate(self, path, key):
+        """解码一次原图，从大到小依次生成各规格并写入磁盘"""
+        with Image.open(path) as source:
+            source.draft("RGB", (self.sizes[-1], self.sizes[-1]))
+            image = source.convert("RGBA" if "A" in source.getbands() or "transparency" in source.info
+                                   else "RGB")
+        thumbnails = {}
+        written = 0
+        for size in reversed(self.sizes):
+            image = image.copy()
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            thumbnails[size] = image
+            written += self._write(self._thumb_path(key, size), image)
+        self._account(written)
+        return thumbnails
+
+    def _write(self, thumb_path, image):
+        """写入临时文件后重命名（缓存可以重建，不需要 fsync）"""
+        directory = os.path.dirname(thumb_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+        try:
+            with open(fd, "wb") as f:
+                image.save(f, format="PNG", compress_level=1)
+            os.replace(tmp_path, thumb_path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+        return os.path.getsize(thumb_path)
+
+    def _scan(self):
+        """:return: [(最近使用时间, 大小, 路径), ...]"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                file_path = os.path.join(root, name)
+                with contextlib.suppress(OSError):
+                    st = os.stat(file_path)
+                    entries.append((st.st_mtime, st.st_size, file_path))
+        return entries
+
+    def _account(self, written):
+        """累计写入量，超出上限时淘汰到上限的 90%"""
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._total_bytes += written
+            if self._total_bytes <= self.max_bytes:
+                return
+            entries = sorted(self._scan())
+            total = sum(size for _, size, _ in entries)
+            for _, size, file_path in entries:
+                if total <= self.max_bytes * 0.9:
+                    break
+                with contextlib.suppress(OSError):
+                    os.remove(file_path)
+                    total -= size
+            self._total_bytes = total
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache():
+    """获取全局缩略图缓存"""
+    global _cache_instance
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = ThumbnailCache()
+        return _cache_instance
@@ -1,5 +1,9 @@
 import sys
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import tkinter as tk
@@ -7,13 +11,50 @@ from tkinter import ttk, messagebox, scrolledtext, filedialog
 from PIL import Image, ImageTk
 from core.config_manager import ConfigManager
 from core.prompt_generator import PromptGenerator
-from core.image_generator import ImageGenerator
-from core.history_manager import HistoryManager
-from core.prompt_library import PromptLibrary
+from core.image_pyramid import DisplayCache
+from core.thumbnail_cache import get_thumbnail_cache
 from core.logger import get_logger
+from core.metrics import MetricsExporter
+from core.profiling import ProfilingSession, profiling_requested
+from core.store_watcher import RecordChanges, StoreWatcher
+from interface.image_gallery import ImageGallery
+from interface.log_view import DEFAULT_MAX_LINES, LEVEL_ORDER, LogView
+from interface.stall_detector import DEFAULT_THRESHOLD_MS, StallDetector
+from interface.startup_timer import PAGE_BUILD_SECONDS, StartupTimer
+from interface.tree_sync import TreeSync
+
+# 检查其他进程（如批处理任务）修改共享数据的间隔（毫秒）
+STORE_POLL_INTERVAL_MS = 1000
+# 日志显示刷新间隔（毫秒）
+LOG_DRAIN_INTERVAL_MS = 50
+# 提示词历史列表显示的条数
+PROMPT_HISTORY_LIMIT = 50
+# 图片历史列表显示的条数（图库显示全部）
+IMAGE_HISTORY_LIMIT = 50
+# 启动时预先生成缩略图的最近图片数
+THUMBNAIL_PREFILL_COUNT = 200
+# 标题栏图标高度（像素）
+HEADER_LOGO_HEIGHT = 60
+# 启用性能分析时记录的热点方法：界面
+PROFILED_GUI_METHODS = (
+    "_display_image", "_show_display_image", "_on_canvas_resize", "_add_thumbnail", "_add_to_edit_history",
+    "_load_last_edit_session", "_load_prompt_history", "_load_image_history",
+    "_load_prompts", "_search_prompts", "_on_log_messages", "_poll_stores",
+)
+# 启用性能分析时记录的热点方法：数据模块（属性名 -> 方法名）
+PROFILED_MODULE_METHODS = {
+    "config": ("_reload_if_changed", "_save_config"),
+    "history": ("_load_history", "_save_history", "get_image_history", "search_prompts"),
+    "prompt_library": ("refresh", "search_prompts", "import_prompts", "export_prompts"),
+    "prompt_gen": ("generate_advanced", "render_many"),
+}
+# 后台打开的数据模块（性能分析包装在打开后进行）
+STORE_ATTRS = ("history", "prompt_library")
 
 class InfographicGUI:
     def __init__(self, root):
+        self.startup = StartupTimer()
+        self.startup.mark("imports")
         self.root = root
         self.root.title("小乌龟信息图 (Turtle Infographic)")
         self.root.geometry("1100x750")
@@ -60,45 +101,341 @@ class InfographicGUI:
         # 初始化模块
         self.config = ConfigManager()
         self.prompt_gen = PromptGenerator(self.config)
-        self.history = HistoryManager()
-        self.prompt_library = PromptLibrary()
+        self.thumbnails = get_thumbnail_cache()
         self.image_gen = None
+
+        # 各页面共用的状态（页面在第一次打开时才构建）
+        self.current_image_path = None
+        self.current_photo = None
+        # 预览图缓存（各级缩小版本，窗口大小改变时不必重新读取和全尺寸缩放）
+        self.display_cache = DisplayCache(max_size=(self.root.winfo_screenwidth(), self.root.winfo_screenheight()))
+        self.edit_session = {
+            'chat_history': [],  # 对话历史
+            'current_image_path': None,  # 当前图片路径
+            'original_image_path': None,  # 原始图片路径
+            'images': []  # 生成的图片列表
+        }
+        self.log_view = None
+        self._log_backlog = deque(maxlen=self.config.get('log_max_lines', DEFAULT_MAX_LINES))
+        
+        # 性能分析（INFOGRAPHICS_PROFILE=1 或在设置页开启；需在界面绑定回调之前包装方法）
+        self.profiler = None
+        if profiling_requested(self.config):
+            self.profiler = ProfilingSession().start()
+            self.profiler.instrument(self, PROFILED_GUI_METHODS, "gui")
+            for attr, methods in PROFILED_MODULE_METHODS.items():
+                if attr not in STORE_ATTRS:
+                    self.profiler.instrument(getattr(self, attr), methods, attr)
+
+        # 历史记录和提示词库在后台打开（读取 JSON、加载检索索引），界面先显示
+        self._store_poll_job = None
+        self.store_watcher = None
+        loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="open-stores")
+        self._stores = loader.submit(self._open_stores)
+        loader.submit(self._load_similarity_index)
+        loader.shutdown(wait=False)
+        self.startup.mark("config")
         
         # 配置样式
         self._setup_styles()
         
-        # 界面组件
+        # 界面组件（只构建当前显示的页面）
         self._init_widgets()
+        self.startup.mark("widgets")
+        self.startup.watch_first_paint(self.root, self._on_first_paint)
+        
+        # 注册日志GUI回调（日志在主线程中定时批量取出显示）
+        self.logger.add_gui_callback(self._on_log_messages)
+        self._log_drain_job = self.root.after(LOG_DRAIN_INTERVAL_MS, self._drain_log_messages)
         
-        # 注册日志GUI回调
-        self.logger.add_gui_callback(self._on_log_message)
+        # 界面卡顿检测（stall_threshold_ms 为 0 时关闭）
+        self.stall_detector = None
+        stall_threshold = self.config.get('stall_threshold_ms', DEFAULT_THRESHOLD_MS)
+        if stall_threshold:
+            self.stall_detector = StallDetector(self.root, stall_threshold, self.logger).start()
         
         # 记录启动日志
         self.logger.info("应用程序启动")
+        if self.profiler:
+            self.logger.info(f"性能分析已启用，退出时结果写入: {self.profiler.output_dir}")
 
+        # 逐条的记录变更（本进程写入或同步到其他进程的修改）合并后在主线程更新列表
+        self._pending_record_changes = {}
+        self._record_changes_lock = threading.Lock()
+        self._stores.add_done_callback(lambda future: self.root.after(0, self._on_stores_opened))
+
+        # 指标导出（配置了 metrics_port 或 metrics_textfile 时启用，修改后需重启生效）
+        self.metrics_exporter = self._start_metrics_exporter()
+
+        # 注册窗口关闭事件
+        self.root.protocol("WM_DELETE_WINDOW", self._on_closing)
+
+    @property
+    def history(self):
+        """历史记录（后台打开，尚未完成时等待）"""
+        return self._stores.result()[0]
+
+    @property
+    def prompt_library(self):
+        """提示词库（后台打开，尚未完成时等待）"""
+        return self._stores.result()[1]
+
+    def _open_stores(self):
+        """
+        后台线程：打开历史记录和提示词库，并预先导入图片生成模块（requests 等，约 100ms）
+        :return: (HistoryManager, PromptLibrary)
+        """
+        from core.history_manager import HistoryManager, DEFAULT_IMAGE_HISTORY_LIMIT
+        from core.prompt_library import PromptLibrary
+        import core.image_generator  # noqa: F401 之后在主线程创建生成器时不再等待导入
+        history = HistoryManager(image_limit=self.config.get('image_history_limit', DEFAULT_IMAGE_HISTORY_LIMIT))
+        prompt_library = PromptLibrary()
+        if self.profiler:
+            for attr, store in zip(STORE_ATTRS, (history, prompt_library)):
+                self.profiler.instrument(store, PROFILED_MODULE_METHODS[attr], attr)
+        return history, prompt_library
+
+    def _load_similarity_index(self):
+        """后台线程：数据模块打开后加载提示词相似度索引，保存时查重不再在主线程计算全库签名"""
+        if self._stores.exception() is not None:
+            return
+        try:
+            self.prompt_library.load_similarity_index()
+        except Exception as e:
+            self.logger.warning(f"加载提示词相似度索引失败: {str(e)}")
+
+    def _on_stores_opened(self):
+        """数据模块打开后（主线程）：订阅变更、开始同步其他进程的修改、预热缩略图"""
+        try:
+            self._stores.result()
+        except Exception as e:
+            self.logger.error(f"打开历史记录或提示词库失败: {str(e)}")
+            messagebox.showerror("错误", f"打开历史记录或提示词库失败：{str(e)}")
+            return
+        elapsed = self.startup.mark("stores")
+        self.logger.debug(f"历史记录和提示词库已打开（启动后 {elapsed * 1000:.0f}ms）")
+
+        # 同步其他进程对配置、历史记录和提示词库的修改
+        self.store_watcher = StoreWatcher([self.config, self.history, self.prompt_library])
+        for store in self.store_watcher.stores:
+            store.add_change_listener(self._on_store_changed)
+        self.history.add_record_listener(
+            lambda collection, changes: self._on_records_changed("history", collection, changes))
+        self.prompt_library.add_record_listener(
+            lambda collection, changes: self._on_records_changed("library", collection, changes))
+        self._store_poll_job = self.root.after(STORE_POLL_INTERVAL_MS, self._poll_stores)
+
+        # 后台补齐最近图片的缩略图，之后切换页面、恢复编辑会话时直接读缓存
+        self.thumbnails.prefill(self._recent_image_paths())
+
+    def _on_first_paint(self):
+        """窗口第一次绘制完成后再做的工作（提示框、图片生成器）"""
         # 尝试初始化图片生成器
+        default_preset = self.config.get_default_api_preset()
         try:
-            default_preset = self.config.get_default_api_preset()
             if default_preset and default_preset.get('api_key'):
-                self.image_gen = ImageGenerator(self.config, default_preset)
+                self.image_gen = self._create_image_generator(default_preset)
                 self.logger.info(f"已加载API配置: {default_preset.get('name')}")
         except Exception as e:
             self.logger.error(f"初始化图片生成器失败: {str(e)}")
-        
-        # 注册窗口关闭事件
-        self.root.protocol("WM_DELETE_WINDOW", self._on_closing)
-        
+
         # 检查API
-        default_preset = self.config.get_default_api_preset()
         if not default_preset or not default_preset.get('api_key'):
             messagebox.showwarning("提示", "未配置 API！\n请先在【API设置】中添加API配置。")
             self.logger.warning("未配置API密钥")
 
+        # 报告配置中不可用的用途模板（生成前即可发现，避免浪费API调用）
+        template_problems = self.prompt_gen.check_templates()
+        if template_problems:
+            details = "\n".join(f"• {purpose}：{problem}" for purpose, problem in template_problems.items())
+            messagebox.showwarning("配置问题", f"以下用途模板存在问题，暂时无法使用：\n\n{details}")
+
+    def _create_image_generator(self, api_preset):
+        """创建图片生成器（模块在第一次使用时导入，启动时已在后台预先导入）"""
+        from core.image_generator import ImageGenerator
+        return ImageGenerator(self.config, api_preset)
+
+    def _start_metrics_exporter(self):
+        """按配置启动 Prometheus 指标导出"""
+        port = self.config.get('metrics_port', 0)
+        textfile = self.config.get('metrics_textfile', '')
+        if not port and not textfile:
+            return None
+        try:
+            exporter = MetricsExporter(port=port, textfile=textfile or None,
+                                       interval=self.config.get('metrics_interval', 15)).start()
+        except OSError as e:
+            self.logger.error(f"启动指标导出失败: {str(e)}")
+            return None
+        if port:
+            self.logger.info(f"指标导出已启动: http://127.0.0.1:{port}/metrics")
+        if textfile:
+            self.logger.info(f"指标定期写入: {textfile}")
+        return exporter
+
+    def _recent_image_paths(self):
+        """上次编辑会话中的图片和最近生成的图片"""
+        session = self.history.get_latest_edit_session() or {}
+        paths = [item['result_image'] for item in session.get('chat_history', [])
+                 if item.get('result_image')]
+        paths += [record['image_path'] for record in self.history.get_image_history(THUMBNAIL_PREFILL_COUNT)
+                  if record.get('exists')]
+        return list(dict.fromkeys(paths))
+
+    def _poll_stores(self):
+        """在主线程定时检查共享数据（变更回调因此也在主线程执行）"""
+        self.store_watcher.poll()
+        self._store_poll_job = self.root.after(STORE_POLL_INTERVAL_MS, self._poll_stores)
+
+    def _on_store_changed(self, source):
+        """其他进程修改了共享数据，刷新对应界面"""
+        self.logger.debug(f"检测到其他进程修改了数据: {source}")
+        # 历史记录和提示词库的列表由记录变更事件更新（见 _on_records_changed）
+        if source == "config":
+            self._on_config_reloaded()
+
+    def _on_records_changed(self, store, collection, changes):
+        """
+        记录变更回调（可能在后台线程执行，如导入提示词）
+        同一轮事件循环中的多次变更合并为一次界面更新
+        """
+        with self._record_changes_lock:
+            schedule = not self._pending_record_changes
+            pending = self._pending_record_changes.setdefault((store, collection), RecordChanges())
+            pending.merge(changes)
+        if schedule:
+            try:
+                self.root.after(0, self._apply_record_changes)
+            except RuntimeError:
+                pass  # 窗口已关闭
+
+    def _apply_record_changes(self):
+        """把合并后的记录变更应用到对应列表（只改动变化的行）"""
+        with self._record_changes_lock:
+            pending, self._pending_record_changes = self._pending_record_changes, {}
+        library = {}
+        for (store, collection), changes in pending.items():
+            self.logger.debug(f"记录变更 {store}.{collection}: {changes!r}")
+            if not self._page_built(store):
+                continue  # 页面构建时读取最新数据
+            if store == "history" and collection == "prompts":
+                self._apply_prompt_history_changes(changes)
+            elif store == "history" and collection == "images":
+                self._apply_image_history_changes(changes)
+            elif store == "library":
+                library[collection] = changes
+        if library:
+            self._apply_library_changes(library)
+
+    def _apply_prompt_history_changes(self, changes):
+        """提示词历史：只读取变更涉及的记录（搜索结果中只更新已显示的行，新记录在下次搜索时出现）"""
+        keyword = self.history_search_var.get().strip()
+        if changes.reset:
+            self._load_prompt_history(self.history.search_prompts(keyword, limit=200) if keyword else None)
+        elif keyword:
+            shown = changes.updated & self.prompt_rows.ids()
+            records = [self.history.get_prompt(record_id) for record_id in sorted(shown)]
+            self.prompt_rows.apply(changes, [record for record in records if record])
+        else:
+            changed = changes.added | changes.updated
+            records = [record for record in self.history.get_prompt_history(PROMPT_HISTORY_LIMIT)
+                       if record["id"] in changed]
+            self.prompt_rows.apply(changes, records, limit=PROMPT_HISTORY_LIMIT)
+
+    def _apply_image_history_changes(self, changes):
+        """图片历史：只读取变更涉及的记录，更新列表和图库"""
+        if changes.reset:
+            self._load_image_history()
+            return
+        records = self.history.get_images(changes.added | changes.updated)
+        self.image_rows.apply(changes, records, limit=IMAGE_HISTORY_LIMIT)
+        self.image_gallery.apply(changes, records)
+
+    def _apply_library_changes(self, pending):
+        """提示词库：更新分类列表的名称和数量，提示词列表只修改涉及的行"""
+        searching = self.library_search_var.get().strip() or self._selected_library_tag()
+        if any(changes.reset for changes in pending.values()):
+            self._reload_categories()
+            return
+        self._update_category_list()
+        if not searching and self._library_category_id not in self._listed_category_ids:
+            self._reload_categories()  # 显示中的分类已被删除
+            return
+        categories = pending.get("categories")
+        if categories and categories.updated:
+            # 分类改名后各行显示的分类名称都要更新
+            if searching:
+                self._live_search_prompts()
+            else:
+                self._load_prompts(self._library_category_id)
+            return
+        changes = pending.get("prompts")
+        if not changes:
+            return
+        if searching:
+            # 搜索结果只更新已显示的行，新提示词在下次搜索时出现
+            prompt_ids = changes.updated & self.library_rows.ids()
+        else:
+            prompt_ids = changes.added | changes.updated
+        records = []
+        for prompt_id in sorted(prompt_ids):
+            prompt = self.prompt_library.get_prompt_by_id(prompt_id)
+            category_id = self.prompt_library.get_prompt_category_id(prompt_id)
+            if prompt is not None and (searching or category_id == self._library_category_id):
+                records.append((category_id, prompt))
+        # 新增或移入的提示词排在分类末尾
+        self.library_rows.apply(changes, records, index="end")
+
+    def _on_config_reloaded(self):
+        """配置热加载后刷新依赖配置的界面（未构建的页面构建时会读取最新配置），默认API预设变化时重建图片生成器"""
+        if self._page_built("settings"):
+            self._load_api_presets()
+        self._reset_combobox_values(self.style_combobox, self.config.get_style_categories().keys())
+        self._reset_combobox_values(self.ratio_combobox, self.config.get_ratio_presets().keys())
+        self._reset_combobox_values(self.purpose_combobox, self.config.get('purpose_categories', {}).keys())
+        self._reset_combobox_values(self.adv_ratio_combobox, self.config.get('ratio_presets', {}).keys())
+        self._update_style_desc()
+        self._update_ratio_desc()
+        self._update_purpose_desc()
+        max_lines = self.config.get('log_max_lines', DEFAULT_MAX_LINES)
+        if self.log_view is not None:
+            self.log_view.set_max_lines(max_lines)
+        else:
+            self._log_backlog = deque(self._log_backlog, maxlen=max_lines)
+        # 新的图片记录上限在下次添加图片时生效
+        self.history.image_limit = self.config.get('image_history_limit', self.history.image_limit)
+
+        # 同一预设的地址/密钥变化由 ImageGenerator 在下次请求前自行处理
+        default_preset = self.config.get_default_api_preset()
+        current = self.image_gen.api_preset if self.image_gen else None
+        if default_preset and default_preset.get('api_key') and \
+                (current is None or current.get('name') != default_preset.get('name')):
+            try:
+                self.image_gen = self._create_image_generator(default_preset)
+                self.logger.info(f"已切换API配置: {default_preset.get('name')}")
+            except Exception as e:
+                self.logger.error(f"初始化图片生成器失败: {str(e)}")
+
+    @staticmethod
+    def _reset_combobox_values(combobox, values):
+        """更新下拉框选项，当前选项仍存在时保持不变"""
+        values = list(values)
+        current = combobox.get()
+        combobox['values'] = values
+        if current not in values:
+            if values:
+                combobox.current(0)
+            else:
+                combobox.set("")
+
     def _on_tab_changed(self, event):
-        """标签页切换时的回调"""
+        """标签页切换时的回调（第一次切换到某页时构建该页）"""
         current_tab = event.widget.select()
         tab_text = event.widget.tab(current_tab, "text")
         self.logger.debug(f"切换到标签页: {tab_text}")
+        for page, frame in self._page_frames.items():
+            if str(frame) == current_tab:
+                self._ensure_page(page)
         
         # 如果切换到图片编辑页面，刷新模型状态
         if "图片编辑" in tab_text:
@@ -147,38 +484,26 @@ class InfographicGUI:
         header.pack(fill=tk.X)
         header.pack_propagate(False)
         
-        # Logo和标题
-        try:
-            logo_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'turtle.png')
-            if os.path.exists(logo_path):
-                pil_image = Image.open(logo_path)
-                # Resize to fit header height (60px) while preserving aspect ratio
-                height = 60
-                aspect_ratio = pil_image.width / pil_image.height
-                width = int(height * aspect_ratio)
-                pil_image = pil_image.resize((width, height), Image.Resampling.LANCZOS)
-                self.header_logo = ImageTk.PhotoImage(pil_image)
-                
-                tk.Label(header, text=" 小乌龟信息图 (Turtle Infographic)",
-                        image=self.header_logo, compound=tk.LEFT,
-                        font=("微软雅黑", 22, "bold"),
-                        bg=self.colors['primary'], fg='white', padx=10).pack(pady=5)
-            else:
-                tk.Label(header, text="小乌龟信息图 (Turtle Infographic)",
-                        font=("微软雅黑", 22, "bold"),
-                        bg=self.colors['primary'], fg='white').pack(pady=15)
-        except Exception as e:
-            print(f"Error loading header logo: {e}")
-            tk.Label(header, text="小乌龟信息图 (Turtle Infographic)",
-                    font=("微软雅黑", 22, "bold"),
-                    bg=self.colors['primary'], fg='white').pack(pady=15)
+        # Logo和标题（先显示标题，Logo 从缩略图缓存后台读取，原图约 2500px，解码缩放需要 200ms 以上）
+        title_label = tk.Label(header, text="小乌龟信息图 (Turtle Infographic)",
+                               font=("微软雅黑", 22, "bold"),
+                               bg=self.colors['primary'], fg='white')
+        title_label.pack(pady=15)
+        logo_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'turtle.png')
+        if os.path.exists(logo_path):
+            def on_loaded(img, error):
+                if img is not None:
+                    # 按比例缩放到标题栏高度
+                    width = max(round(img.width * HEADER_LOGO_HEIGHT / img.height), 1)
+                    img = img.resize((width, HEADER_LOGO_HEIGHT), Image.Resampling.LANCZOS)
+                else:
+                    self.logger.warning(f"加载标题栏图标失败: {error}")
+                self.root.after(0, lambda: self._show_header_logo(title_label, img))
+            self.thumbnails.get_async(logo_path, 100, on_loaded)
 
         # Notebook
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=15, pady=(15, 0))
-        
-        # 绑定标签页切换事件
-        self.notebook.bind('<<NotebookTabChanged>>', self._on_tab_changed)
 
         self.prompt_frame = ttk.Frame(self.notebook)
         self.image_frame = ttk.Frame(self.notebook)
@@ -196,13 +521,60 @@ class InfographicGUI:
         self.notebook.add(self.settings_frame, text="API设置")
         self.notebook.add(self.log_frame, text="运行日志")
 
-        self._init_prompt_page()
-        self._init_image_page()
-        self._init_edit_page()
-        self._init_library_page()
-        self._init_history_page()
-        self._init_settings_page()
-        self._init_log_page()
+        # 页面在第一次切换到时才构建（见 _ensure_page），启动时只构建默认显示的第一页
+        self._page_builders = {
+            "prompt": self._init_prompt_page,
+            "image": self._init_image_page,
+            "edit": self._init_edit_page,
+            "library": self._init_library_page,
+            "history": self._init_history_page,
+            "settings": self._init_settings_page,
+            "log": self._init_log_page,
+        }
+        self._page_frames = {
+            "prompt": self.prompt_frame,
+            "image": self.image_frame,
+            "edit": self.edit_frame,
+            "library": self.library_frame,
+            "history": self.history_frame,
+            "settings": self.settings_frame,
+            "log": self.log_frame,
+        }
+        self._ensure_page("prompt")
+
+        # 绑定标签页切换事件
+        self.notebook.bind('<<NotebookTabChanged>>', self._on_tab_changed)
+
+    def _ensure_page(self, page):
+        """
+        构建尚未构建的页面（其他页面要修改该页的控件时也需先调用）
+        :param page: 页面名，见 _page_builders
+        """
+        builder = self._page_builders.pop(page, None)
+        if builder is None:
+            return
+        started = time.perf_counter()
+        builder()
+        elapsed = time.perf_counter() - started
+        PAGE_BUILD_SECONDS.observe(elapsed, page=page)
+        self.logger.debug(f"页面 {page} 构建完成，用时 {elapsed * 1000:.0f}ms")
+
+    def _page_built(self, page):
+        return page not in self._page_builders
+
+    def _select_page(self, page):
+        """构建并切换到指定页面"""
+        self._ensure_page(page)
+        self.notebook.select(self._page_frames[page])
+
+    def _show_header_logo(self, label, img):
+        """标题栏 Logo 读取完成（在主线程执行）"""
+        if img is None or not label.winfo_exists():
+            return
+        self.header_logo = ImageTk.PhotoImage(img)
+        label.config(text=" 小乌龟信息图 (Turtle Infographic)", image=self.header_logo,
+                     compound=tk.LEFT, padx=10)
+        label.pack_configure(pady=5)
     
     def _init_log_page(self):
         """初始化运行日志页面"""
@@ -222,28 +594,34 @@ class InfographicGUI:
                              activeforeground=self.colors['primary'])
         clear_btn.pack(side=tk.RIGHT, padx=5)
         
-        # 日志文本框
+        # 显示级别过滤
+        self.log_level_var = tk.StringVar(value="DEBUG")
+        level_combobox = ttk.Combobox(toolbar, textvariable=self.log_level_var,
+                                      values=list(LEVEL_ORDER), state="readonly", width=10)
+        level_combobox.pack(side=tk.RIGHT, padx=5)
+        level_combobox.bind("<<ComboboxSelected>>", lambda e: self.log_view.set_level(self.log_level_var.get()))
+        tk.Label(toolbar, text="显示级别:", font=("微软雅黑", 9),
+                bg=self.colors['bg'], fg=self.colors['text']).pack(side=tk.RIGHT)
+        
+        # 日志文本框（只保留最近 log_max_lines 行）
         log_container = tk.Frame(self.log_frame, bg=self.colors['card'], bd=1, relief=tk.SOLID)
         log_container.pack(fill=tk.BOTH, expand=True, padx=15, pady=(0, 15))
         
-        self.log_text = scrolledtext.ScrolledText(
+        self.log_view = LogView(
             log_container,
+            self.colors,
+            max_lines=self.config.get('log_max_lines', DEFAULT_MAX_LINES),
             bg='#F5F7FA',
             fg='#2C3E50',
             font=("Consolas", 10),
             wrap=tk.WORD,
-            state=tk.DISABLED,
             padx=10,
             pady=10
         )
-        self.log_text.pack(fill=tk.BOTH, expand=True, padx=2, pady=2)
-        
-        # 配置日志文本标签颜色
-        self.log_text.tag_config("DEBUG", foreground=self.colors['log_debug'])
-        self.log_text.tag_config("INFO", foreground=self.colors['log_info'])
-        self.log_text.tag_config("SUCCESS", foreground=self.colors['log_success'])
-        self.log_text.tag_config("WARNING", foreground=self.colors['log_warning'])
-        self.log_text.tag_config("ERROR", foreground=self.colors['log_error'])
+        self.log_view.pack(fill=tk.BOTH, expand=True, padx=2, pady=2)
+        # 页面构建之前的日志
+        self.log_view.append(list(self._log_backlog))
+        self._log_backlog.clear()
     
     def _init_log_panel(self):
         """初始化底部日志面板（已废弃，改用标签页）"""
@@ -251,20 +629,22 @@ class InfographicGUI:
     
     def _clear_log(self):
         """清空日志"""
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.delete(1.0, tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        self.log_view.clear()
         self.logger.info("日志已清空")
     
-    def _on_log_message(self, timestamp, level, message):
-        """接收日志消息并显示"""
+    def _drain_log_messages(self):
+        """在主线程定时取出其他线程产生的日志"""
+        self.logger.dispatch_gui_messages()
+        self._log_drain_job = self.root.after(LOG_DRAIN_INTERVAL_MS, self._drain_log_messages)
+
+    def _on_log_messages(self, messages):
+        """接收一批日志消息并显示（日志页尚未构建时先暂存）"""
+        if self.log_view is None:
+            self._log_backlog.extend(messages)
+            return
         try:
-            self.log_text.config(state=tk.NORMAL)
-            log_line = f"[{timestamp}] [{level}] {message}\n"
-            self.log_text.insert(tk.END, log_line, level)
-            self.log_text.see(tk.END)  # 自动滚动到最新
-            self.log_text.config(state=tk.DISABLED)
-        except:
+            self.log_view.append(messages)
+        except tk.TclError:
             pass  # 避免GUI错误导致程序崩溃
 
     def _init_prompt_page(self):
@@ -790,9 +1170,6 @@ class InfographicGUI:
                                        state=tk.DISABLED, cursor='hand2')
         self.save_image_btn.grid(row=0, column=2, sticky='ew', padx=(5, 0))
         
-        self.current_image_path = None
-        self.current_photo = None
-        
         # 绑定画布大小改变事件，自动调整图片大小
         self.image_canvas.bind('<Configure>', self._on_canvas_resize)
 
@@ -969,15 +1346,7 @@ class InfographicGUI:
         #                                   height=2)
         # self.edit_progress_label.pack(fill=tk.X, side=tk.BOTTOM)
         
-        # 初始化编辑会话数据
-        self.edit_session = {
-            'chat_history': [],  # 对话历史
-            'current_image_path': None,  # 当前图片路径
-            'original_image_path': None,  # 原始图片路径
-            'images': []  # 生成的图片列表
-        }
-        
-        # 加载上次的编辑会话
+        # 加载上次的编辑会话（编辑会话数据在 __init__ 中初始化）
         self._load_last_edit_session()
 
     def _init_library_page(self):
@@ -1039,13 +1408,34 @@ class InfographicGUI:
         
         # 搜索框
         self.library_search_var = tk.StringVar()
+        self._library_search_job = None
+        self._listed_category_ids = []  # 分类列表中各行对应的分类ID
+        self._library_category_id = None  # 提示词列表显示的分类ID（搜索时不变）
         search_entry = ttk.Entry(prompt_header, textvariable=self.library_search_var,
                                 font=("微软雅黑", 9), width=20)
         search_entry.pack(side=tk.RIGHT, padx=5)
+        search_entry.bind("<Return>", lambda e: self._search_prompts())
+        self.library_search_var.trace_add("write", lambda *args: self._schedule_library_search())
         tk.Button(prompt_header, text="🔍", command=self._search_prompts,
                  font=("微软雅黑", 9), bg=self.colors['card'],
                  relief='solid', bd=1, padx=8, pady=4, cursor='hand2').pack(side=tk.RIGHT)
         
+        # 标签筛选（下拉时按当前数据统计标签数量）
+        self.library_tag_var = tk.StringVar(value="全部标签")
+        self.library_tag_combo = ttk.Combobox(prompt_header, textvariable=self.library_tag_var,
+                                             state="readonly", font=("微软雅黑", 9), width=12,
+                                             postcommand=self._refresh_tag_facets)
+        self.library_tag_combo.pack(side=tk.RIGHT, padx=5)
+        self.library_tag_combo.bind("<<ComboboxSelected>>", lambda e: self._live_search_prompts())
+        
+        tk.Button(prompt_header, text="📤 导出", command=self._export_library,
+                 font=("微软雅黑", 9), bg=self.colors['card'],
+                 relief='solid', bd=1, padx=10, pady=5, cursor='hand2').pack(side=tk.RIGHT, padx=2)
+        
+        tk.Button(prompt_header, text="📥 导入", command=self._import_library,
+                 font=("微软雅黑", 9), bg=self.colors['card'],
+                 relief='solid', bd=1, padx=10, pady=5, cursor='hand2').pack(side=tk.RIGHT, padx=2)
+        
         tk.Button(prompt_header, text="➕ 添加", command=self._add_prompt_to_library,
                  font=("微软雅黑", 9), bg=self.colors['primary'], fg='white',
                  relief='flat', padx=10, pady=5, cursor='hand2').pack(side=tk.RIGHT, padx=2)
@@ -1092,11 +1482,13 @@ class InfographicGUI:
         self.library_menu = tk.Menu(self.library_tree, tearoff=0)
         self.library_menu.add_command(label="查看详情", command=self._view_prompt_detail)
         self.library_menu.add_command(label="使用此提示词", command=self._use_library_prompt)
+        self.library_menu.add_command(label="查找相似提示词", command=self._find_similar_prompts)
         self.library_menu.add_separator()
         self.library_menu.add_command(label="编辑", command=self._edit_prompt_in_library)
         self.library_menu.add_command(label="删除", command=self._delete_prompt_from_library)
         
         self.library_tree.bind("<Button-3>", self._show_library_menu)
+        self.library_rows = TreeSync(self.library_tree, self._library_row, key=lambda item: item[1]['id'])
         
         # 加载数据
         self._load_categories()
@@ -1115,6 +1507,16 @@ class InfographicGUI:
         tk.Button(toolbar, text="🗑 清空", command=self._clear_history,
                  font=("微软雅黑", 9), bg=self.colors['card'],
                  relief='solid', bd=1, padx=10, pady=5, cursor='hand2').pack(side=tk.RIGHT, padx=2)
+        
+        # 提示词历史全文搜索
+        tk.Button(toolbar, text="🔍", command=self._search_prompt_history,
+                 font=("微软雅黑", 9), bg=self.colors['card'],
+                 relief='solid', bd=1, padx=8, pady=4, cursor='hand2').pack(side=tk.RIGHT, padx=(2, 10))
+        self.history_search_var = tk.StringVar()
+        history_search_entry = ttk.Entry(toolbar, textvariable=self.history_search_var,
+                                        font=("微软雅黑", 9), width=24)
+        history_search_entry.pack(side=tk.RIGHT, padx=5)
+        history_search_entry.bind("<Return>", lambda e: self._search_prompt_history())
 
         history_notebook = ttk.Notebook(self.history_frame)
         history_notebook.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
@@ -1122,10 +1524,14 @@ class InfographicGUI:
         prompt_history_frame = ttk.Frame(history_notebook)
         image_history_frame = ttk.Frame(history_notebook)
         
+        gallery_frame = ttk.Frame(history_notebook)
+        
         history_notebook.add(prompt_history_frame, text="提示词历史")
         history_notebook.add(image_history_frame, text="图片历史")
+        history_notebook.add(gallery_frame, text="图库")
         
         self._create_prompt_history_list(prompt_history_frame)
+        self._create_image_gallery(gallery_frame)
         self._create_image_history_list(image_history_frame)
 
     def _create_prompt_history_list(self, parent):
@@ -1157,6 +1563,7 @@ class InfographicGUI:
         self.prompt_menu.add_command(label="删除记录", command=self._delete_prompt_record)
         
         self.prompt_tree.bind("<Button-3>", self._show_prompt_menu)
+        self.prompt_rows = TreeSync(self.prompt_tree, self._prompt_row)
         self._load_prompt_history()
 
     def _create_image_history_list(self, parent):
@@ -1191,8 +1598,36 @@ class InfographicGUI:
         self.image_menu.add_command(label="删除记录", command=self._delete_image_record)
         
         self.image_tree.bind("<Button-3>", self._show_image_menu)
+        self.image_rows = TreeSync(self.image_tree, self._image_row)
         self._load_image_history()
 
+    def _create_image_gallery(self, parent):
+        """全部生成图片的缩略图网格（只绘制可见部分）"""
+        self.image_gallery = ImageGallery(parent, self.colors, self.thumbnails,
+                                          on_open=lambda record: self._open_image_by_path(record["image_path"]),
+                                          on_menu=self._show_gallery_menu)
+        self.image_gallery.pack(fill=tk.BOTH, expand=True)
+
+    def _show_gallery_menu(self, record, event):
+        menu = tk.Menu(self.image_gallery.canvas, tearoff=0)
+        menu.add_command(label="打开图片", command=lambda: self._open_image_by_path(record["image_path"]))
+        menu.add_command(label="在预览区显示", command=lambda: self._show_in_preview(record["image_path"]))
+        menu.add_command(label="查看提示词", command=lambda: messagebox.showinfo("提示词", record["prompt"]))
+        menu.add_command(label="在文件夹中显示", command=lambda: self._show_in_folder_by_path(record["image_path"]))
+        menu.add_command(label="另存为", command=lambda: self._save_image_by_path(record["image_path"]))
+        menu.post(event.x_root, event.y_root)
+
+    def _show_in_preview(self, image_path):
+        """在生成页面的预览区显示图片"""
+        if not os.path.exists(image_path):
+            messagebox.showwarning("提示", "图片文件不存在！")
+            return
+        self._select_page("image")
+        self._display_image(image_path)
+        self.open_image_btn.config(state=tk.NORMAL)
+        self.show_in_folder_btn.config(state=tk.NORMAL)
+        self.save_image_btn.config(state=tk.NORMAL)
+
     def _init_settings_page(self):
         tk.Label(self.settings_frame, text="⚙ API 配置管理",
                 font=("微软雅黑", 14, "bold"),
@@ -1270,6 +1705,16 @@ class InfographicGUI:
         tk.Button(save_btn_frame, text="💾 保存路径设置", command=self._save_path_settings,
                  font=("微软雅黑", 11, "bold"), bg=self.colors['secondary'],
                  fg='white', relief='flat', padx=30, pady=12, cursor='hand2').pack(fill=tk.X, padx=10)
+
+        # 诊断
+        diag_frame = ttk.LabelFrame(self.settings_frame, text="诊断",
+                                    padding=15, style='Card.TLabelframe')
+        diag_frame.pack(fill=tk.X, padx=20, pady=10)
+        self.profiling_var = tk.BooleanVar(value=bool(self.config.get('profiling', False)))
+        tk.Checkbutton(diag_frame, text="启用性能分析（重启后生效，结果保存在 profiles 目录，可生成火焰图）",
+                      variable=self.profiling_var, command=self._toggle_profiling,
+                      bg=self.colors['card'], fg=self.colors['text'], font=("微软雅黑", 10),
+                      activebackground=self.colors['card'], selectcolor=self.colors['card']).pack(anchor=tk.W)
         
         self._load_api_presets()
 
@@ -1354,6 +1799,7 @@ class InfographicGUI:
             
             self.prompt_display.delete("1.0", tk.END)
             self.prompt_display.insert(tk.END, prompt)
+            self._ensure_page("image")
             self.image_prompt_text.delete("1.0", tk.END)
             self.image_prompt_text.insert(tk.END, prompt)
             
@@ -1421,6 +1867,14 @@ class InfographicGUI:
                 messagebox.showerror("错误", "分类不存在！", parent=dialog)
                 return
             
+            duplicates = self.prompt_library.find_near_duplicates(prompt)
+            if duplicates and not messagebox.askyesno(
+                    "发现相似提示词",
+                    f"提示词库中已有内容相近的提示词：{duplicates[0]['title']}"
+                    f"（相似度 {duplicates[0]['similarity']:.0%}）\n\n仍然保存吗？",
+                    parent=dialog):
+                return
+            
             self.prompt_library.add_prompt(cat_id, title, prompt)
             messagebox.showinfo("成功", "已保存到提示词库！", parent=dialog)
             dialog.destroy()
@@ -1449,7 +1903,7 @@ class InfographicGUI:
             return
 
         try:
-            self.image_gen = ImageGenerator(self.config, default_preset)
+            self.image_gen = self._create_image_generator(default_preset)
         except Exception as e:
             messagebox.showerror("错误", f"初始化API失败：{str(e)}")
             self.notebook.select(3)
@@ -1516,9 +1970,6 @@ class InfographicGUI:
         ratio = self.ratio_var.get() if hasattr(self, 'ratio_var') and self.ratio_var.get() else "未知"
         self.history.add_image(prompt, save_path, style, ratio)
         
-        # 刷新历史记录显示
-        self._load_image_history()
-        
         self.generate_image_btn.config(state=tk.NORMAL)
     
     def _on_generate_error(self, error_msg):
@@ -1529,44 +1980,42 @@ class InfographicGUI:
         self.generate_image_btn.config(state=tk.NORMAL)
 
     def _display_image(self, image_path):
-        try:
-            # 保存图片路径，用于窗口大小改变时重新显示
-            self.current_image_path = image_path
-            
-            img = Image.open(image_path)
-            
-            # 强制更新窗口以获取正确的画布尺寸
-            self.image_canvas.update_idletasks()
-            
-            # 获取画布尺寸
-            canvas_width = self.image_canvas.winfo_width()
-            canvas_height = self.image_canvas.winfo_height()
-            
-            # 如果画布尺寸还未初始化，使用默认值
-            if canvas_width <= 1:
-                canvas_width = 600
-                canvas_height = 500
-            
-            # 计算缩放比例（保持宽高比，留出边距）
-            img_width, img_height = img.size
-            scale_w = (canvas_width - 40) / img_width
-            scale_h = (canvas_height - 40) / img_height
-            scale = min(scale_w, scale_h)  # 移除1.0限制，允许放大
-            
-            # 缩放图片
-            new_width = int(img_width * scale)
-            new_height = int(img_height * scale)
-            
-            if new_width > 0 and new_height > 0:
-                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            self.current_photo = ImageTk.PhotoImage(img)
-            self.image_canvas.delete("all")
-            # 在画布中心显示图片
-            self.image_canvas.create_image(canvas_width // 2, canvas_height // 2, 
-                                          image=self.current_photo, anchor=tk.CENTER)
-        except Exception as e:
-            messagebox.showerror("错误", f"无法显示图片：{str(e)}")
+        """显示图片：缩放在后台线程完成，主线程只负责替换画布上的图片"""
+        # 保存图片路径，用于窗口大小改变时重新显示
+        self.current_image_path = image_path
+        
+        # 强制更新窗口以获取正确的画布尺寸
+        self.image_canvas.update_idletasks()
+        
+        # 获取画布尺寸
+        canvas_width = self.image_canvas.winfo_width()
+        canvas_height = self.image_canvas.winfo_height()
+        
+        # 如果画布尺寸还未初始化，使用默认值
+        if canvas_width <= 1:
+            canvas_width = 600
+            canvas_height = 500
+        
+        # 保持宽高比，留出边距（允许放大）
+        def on_rendered(img, error):
+            self.root.after(0, lambda: self._show_display_image(image_path, img, error,
+                                                                 canvas_width, canvas_height))
+        
+        self.display_cache.render_async(image_path, max(canvas_width - 40, 1), max(canvas_height - 40, 1),
+                                        on_rendered)
+
+    def _show_display_image(self, image_path, img, error, canvas_width, canvas_height):
+        """后台缩放完成的回调（在主线程执行）"""
+        if image_path != self.current_image_path:
+            return
+        if error is not None:
+            messagebox.showerror("错误", f"无法显示图片：{str(error)}")
+            return
+        self.current_photo = ImageTk.PhotoImage(img)
+        self.image_canvas.delete("all")
+        # 在画布中心显示图片
+        self.image_canvas.create_image(canvas_width // 2, canvas_height // 2, 
+                                      image=self.current_photo, anchor=tk.CENTER)
 
     def _on_canvas_resize(self, event):
         """画布大小改变时重新调整图片显示"""
@@ -1655,23 +2104,16 @@ class InfographicGUI:
     
     def _add_thumbnail(self, ref_data, index):
         """添加单个缩略图"""
-        from PIL import Image, ImageTk
-        
         # 创建缩略图容器
         thumb_frame = tk.Frame(self.ref_thumbnails_container, bg='white', 
                               relief='solid', bd=1)
         thumb_frame.pack(side=tk.LEFT, padx=5, pady=5)
         
-        # 创建缩略图（最大100x100）
-        img = ref_data['obj']
-        max_size = 100
-        img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-        photo = ImageTk.PhotoImage(img)
-        
-        # 图片标签
-        img_label = tk.Label(thumb_frame, image=photo, bg='white')
-        img_label.image = photo  # 保持引用
+        # 图片标签（缩略图最大100x100，从缓存后台读取）
+        img_label = tk.Label(thumb_frame, text="加载中...", bg='white',
+                            fg=self.colors['text_light'], font=("微软雅黑", 7))
         img_label.pack()
+        self._load_thumbnail(img_label, ref_data['path'], 100)
         
         # 文件名和删除按钮
         info_frame = tk.Frame(thumb_frame, bg='white')
@@ -1690,6 +2132,25 @@ class InfographicGUI:
                            cursor='hand2', padx=3, pady=0)
         del_btn.pack(side=tk.RIGHT)
     
+    def _load_thumbnail(self, label, image_path, size, on_shown=None):
+        """从缩略图缓存后台读取，完成后在主线程显示到 label 上"""
+        def on_loaded(img, error):
+            self.root.after(0, lambda: self._show_thumbnail(label, img, error, on_shown))
+        self.thumbnails.get_async(image_path, size, on_loaded)
+
+    def _show_thumbnail(self, label, img, error, on_shown=None):
+        """缩略图读取完成的回调（在主线程执行）"""
+        if not label.winfo_exists():
+            return
+        if img is None:
+            label.config(text=f"无法加载图片: {str(error)}" if error else "图片不存在", fg='red')
+            return
+        photo = ImageTk.PhotoImage(img)
+        label.config(image=photo, text="")
+        label.image = photo  # 保持引用
+        if on_shown:
+            on_shown()
+
     def _remove_reference(self, index):
         """删除指定索引的参考图片"""
         if 0 <= index < len(self.reference_images):
@@ -1773,33 +2234,48 @@ class InfographicGUI:
         except Exception as e:
             messagebox.showerror("错误", f"打开失败：{str(e)}")
 
-    def _load_prompt_history(self):
-        for item in self.prompt_tree.get_children():
-            self.prompt_tree.delete(item)
-        
-        records = self.history.get_prompt_history()
-        for record in records:
-            self.prompt_tree.insert("", tk.END, values=(
-                record["timestamp"],
-                record["style"],
-                record["ratio"],
-                record["content"]
-            ), tags=(record["id"],))
+    def _load_prompt_history(self, records=None):
+        if records is None:
+            records = self.history.get_prompt_history(PROMPT_HISTORY_LIMIT)
+        self.prompt_rows.set_records(records)
+
+    @staticmethod
+    def _prompt_row(record):
+        content = record["content"]
+        return (
+            record["timestamp"],
+            record["style"],
+            record["ratio"],
+            content[:100] + "..." if len(content) > 100 else content
+        ), (record["id"],)
+    
+    def _search_prompt_history(self):
+        """全文搜索提示词历史，关键词为空时恢复最近记录"""
+        keyword = self.history_search_var.get().strip()
+        if not keyword:
+            self._load_prompt_history()
+            return
+        results = self.history.search_prompts(keyword, limit=200)
+        self._load_prompt_history(results)
+        self.logger.info(f"历史搜索 \"{keyword}\"：找到 {len(results)} 条")
 
     def _load_image_history(self):
-        for item in self.image_tree.get_children():
-            self.image_tree.delete(item)
-        
-        records = self.history.get_image_history()
-        for record in records:
-            status = "✅ 存在" if record["exists"] else "❌ 已删除"
-            self.image_tree.insert("", tk.END, values=(
-                record["timestamp"],
-                record["style"],
-                record["ratio"],
-                record["image_path"],
-                status
-            ), tags=(record["id"],))
+        records = self.history.get_image_history(limit=None, check_files=False)
+        self.image_gallery.set_records(records)
+        self.image_rows.set_records(records[:IMAGE_HISTORY_LIMIT])
+        # 逐个检查图片文件是否仍存在（可能有上万条）放到后台，有变化时通过记录变更事件更新界面
+        threading.Thread(target=self.history.check_image_files, daemon=True).start()
+
+    @staticmethod
+    def _image_row(record):
+        status = "✅ 存在" if record["exists"] else "❌ 已删除"
+        return (
+            record["timestamp"],
+            record["style"],
+            record["ratio"],
+            record["image_path"],
+            status
+        ), (record["id"],)
 
     def _refresh_history(self):
         self._load_prompt_history()
@@ -1809,8 +2285,6 @@ class InfographicGUI:
     def _clear_history(self):
         if messagebox.askyesno("确认", "确定要清空所有历史记录吗？\n\n此操作不可恢复！"):
             self.history.clear_all()
-            self._load_prompt_history()
-            self._load_image_history()
 
     def _show_prompt_menu(self, event):
         item = self.prompt_tree.identify_row(event.y)
@@ -1831,8 +2305,7 @@ class InfographicGUI:
         
         item = selection[0]
         record_id = int(self.prompt_tree.item(item, "tags")[0])
-        records = self.history.get_prompt_history()
-        record = next((r for r in records if r["id"] == record_id), None)
+        record = self.history.get_prompt(record_id)
         if not record:
             return
         
@@ -1871,14 +2344,13 @@ class InfographicGUI:
         
         item = selection[0]
         record_id = int(self.prompt_tree.item(item, "tags")[0])
-        records = self.history.get_prompt_history()
-        record = next((r for r in records if r["id"] == record_id), None)
+        record = self.history.get_prompt(record_id)
         if not record:
             return
         
+        self._select_page("image")
         self.image_prompt_text.delete("1.0", tk.END)
         self.image_prompt_text.insert(tk.END, record["prompt"])
-        self.notebook.select(1)
         messagebox.showinfo("成功", "提示词已复制")
 
     def _delete_prompt_record(self):
@@ -1888,7 +2360,6 @@ class InfographicGUI:
                 item = selection[0]
                 record_id = int(self.prompt_tree.item(item, "tags")[0])
                 self.history.delete_prompt(record_id)
-                self._load_prompt_history()
                 messagebox.showinfo("成功", "历史记录已删除")
 
     def _open_image_from_history(self, event):
@@ -1941,7 +2412,6 @@ class InfographicGUI:
                 item = selection[0]
                 record_id = int(self.image_tree.item(item, "tags")[0])
                 self.history.delete_image(record_id)
-                self._load_image_history()
                 messagebox.showinfo("成功", "历史记录已删除")
 
     def _load_api_presets(self):
@@ -2002,7 +2472,7 @@ class InfographicGUI:
         try:
             default_preset = self.config.get_default_api_preset()
             if default_preset and default_preset.get("api_key"):
-                self.image_gen = ImageGenerator(self.config, default_preset)
+                self.image_gen = self._create_image_generator(default_preset)
         except:
             pass
 
@@ -2108,19 +2578,57 @@ class InfographicGUI:
             self.config.update('save_path', new_path)
             messagebox.showinfo("成功", "保存路径已更新")
 
+    def _toggle_profiling(self):
+        enabled = self.profiling_var.get()
+        self.config.update('profiling', enabled)
+        self.logger.info(f"性能分析已{'开启' if enabled else '关闭'}，重启后生效")
+
     # ============ 提示词库相关方法 ============
     
     def _load_categories(self):
         """加载分类列表"""
-        self.category_listbox.delete(0, tk.END)
-        categories = self.prompt_library.get_categories()
-        for category in categories:
-            self.category_listbox.insert(tk.END, f"{category['name']} ({len(category['prompts'])})")
-        
-        if categories:
+        self._update_category_list()
+        if self._listed_category_ids:
             self.category_listbox.select_set(0)
             self._on_category_select(None)
     
+    def _reload_categories(self):
+        """刷新分类列表，保持当前选中的分类和搜索结果"""
+        self._update_category_list()
+        if not self.category_listbox.curselection() and self._listed_category_ids:
+            self.category_listbox.select_set(0)
+        if self.library_search_var.get().strip() or self._selected_library_tag():
+            self._live_search_prompts()
+        else:
+            self._on_category_select(None)
+
+    def _update_category_list(self):
+        """按最新的分类名称和提示词数量改写分类列表，保持选中的分类（不重新加载提示词列表）"""
+        counts = self.prompt_library.get_category_counts()
+        labels = [f"{self.prompt_library.get_category_name(category_id)} ({count})"
+                  for category_id, count in counts.items()]
+        if list(counts) == self._listed_category_ids and labels == list(self.category_listbox.get(0, tk.END)):
+            return
+        selection = self.category_listbox.curselection()
+        selected_id = None
+        if selection and selection[0] < len(self._listed_category_ids):
+            selected_id = self._listed_category_ids[selection[0]]
+        self.category_listbox.delete(0, tk.END)
+        if labels:
+            self.category_listbox.insert(tk.END, *labels)
+        self._listed_category_ids = list(counts)
+        if selected_id in self._listed_category_ids:
+            self.category_listbox.select_set(self._listed_category_ids.index(selected_id))
+
+    def _select_category(self, category_id):
+        """在分类列表中选中指定分类（搜索中时保持搜索结果）"""
+        if category_id not in self._listed_category_ids:
+            return
+        self.category_listbox.selection_clear(0, tk.END)
+        self.category_listbox.select_set(self._listed_category_ids.index(category_id))
+        if not (self.library_search_var.get().strip() or self._selected_library_tag()):
+            self._on_category_select(None)
+
     def _on_category_select(self, event):
         """分类选择事件"""
         selection = self.category_listbox.curselection()
@@ -2128,30 +2636,14 @@ class InfographicGUI:
             return
         
         category_index = selection[0]
-        categories = self.prompt_library.get_categories()
-        if category_index < len(categories):
-            category = categories[category_index]
-            self._load_prompts(category['id'])
+        if category_index < len(self._listed_category_ids):
+            self._load_prompts(self._listed_category_ids[category_index])
     
     def _load_prompts(self, category_id):
         """加载指定分类的提示词"""
-        for item in self.library_tree.get_children():
-            self.library_tree.delete(item)
-        
-        # 获取分类名称
-        category = self.prompt_library.get_category_by_id(category_id)
-        category_name = category['name'] if category else "未知"
-        
+        self._library_category_id = category_id
         prompts = self.prompt_library.get_prompts_by_category(category_id)
-        for prompt in prompts:
-            self.library_tree.insert("", tk.END, values=(
-                category_name,
-                prompt['title'],
-                prompt.get('tags', ''),
-                prompt.get('style', ''),
-                prompt.get('ratio', ''),
-                prompt.get('updated_at', '')
-            ), tags=(category_id, prompt['id']))
+        self._fill_library_tree([(category_id, prompt) for prompt in prompts])
     
     def _add_category(self):
         """添加分类"""
@@ -2182,7 +2674,6 @@ class InfographicGUI:
                 return
             
             self.prompt_library.add_category(name, desc)
-            self._load_categories()
             dialog.destroy()
             self.logger.info(f"添加分类: {name}")
             messagebox.showinfo("成功", "分类已添加")
@@ -2237,7 +2728,6 @@ class InfographicGUI:
                 return
             
             self.prompt_library.update_category(category['id'], name, desc)
-            self._load_categories()
             dialog.destroy()
             self.logger.info(f"更新分类: {name}")
             messagebox.showinfo("成功", "分类已更新")
@@ -2271,7 +2761,6 @@ class InfographicGUI:
         
         if messagebox.askyesno("确认删除", msg):
             self.prompt_library.delete_category(category['id'])
-            self._load_categories()
             self.logger.warning(f"删除分类: {category['name']}")
             messagebox.showinfo("成功", "分类已删除")
     
@@ -2301,8 +2790,7 @@ class InfographicGUI:
         prompt_id = int(tags[1])
         
         # 获取提示词详情
-        prompts = self.prompt_library.get_prompts_by_category(category_id)
-        prompt = next((p for p in prompts if p['id'] == prompt_id), None)
+        prompt = self.prompt_library.get_prompt_by_id(prompt_id)
         
         if prompt:
             self._show_prompt_editor_dialog(category_id, prompt)
@@ -2320,8 +2808,7 @@ class InfographicGUI:
         prompt_id = int(tags[1])
         
         # 获取提示词标题
-        prompts = self.prompt_library.get_prompts_by_category(category_id)
-        prompt = next((p for p in prompts if p['id'] == prompt_id), None)
+        prompt = self.prompt_library.get_prompt_by_id(prompt_id)
         
         msg = "确定要删除此提示词吗？\n\n"
         if prompt:
@@ -2330,8 +2817,6 @@ class InfographicGUI:
         
         if messagebox.askyesno("确认删除", msg):
             self.prompt_library.delete_prompt(category_id, prompt_id)
-            self._load_prompts(category_id)
-            self._load_categories()  # 更新分类数量
             self.logger.warning(f"删除提示词: {prompt['title'] if prompt else '未知'}")
             messagebox.showinfo("成功", "提示词已删除")
     
@@ -2420,14 +2905,23 @@ class InfographicGUI:
                 messagebox.showerror("错误", "请填写标题和内容！")
                 return
             
+            # 保存前查重
+            if not prompt or content != prompt['content']:
+                duplicates = self.prompt_library.find_near_duplicates(
+                    content, exclude_id=prompt['id'] if prompt else None)
+                if duplicates:
+                    lines = "\n".join(f"· [{d['category_name']}] {d['title']}（相似度 {d['similarity']:.0%}）"
+                                      for d in duplicates[:3])
+                    if not messagebox.askyesno("发现相似提示词",
+                                               f"提示词库中已有内容相近的提示词：\n\n{lines}\n\n仍然保存吗？",
+                                               parent=dialog):
+                        return
+            
             if prompt:
                 # 更新 - 如果分类变了，需要移动
                 if target_category_id != category_id:
-                    # 先删除旧的，再添加到新分类
-                    self.prompt_library.delete_prompt(category_id, prompt['id'])
-                    self.prompt_library.add_prompt(target_category_id, title, content, tags, style, ratio)
-                else:
-                    self.prompt_library.update_prompt(category_id, prompt['id'], title, content, tags, style, ratio)
+                    self.prompt_library.move_prompt(category_id, target_category_id, prompt['id'])
+                self.prompt_library.update_prompt(target_category_id, prompt['id'], title, content, tags, style, ratio)
                 self.logger.info(f"更新提示词: {title}")
                 messagebox.showinfo("成功", "提示词已更新")
             else:
@@ -2436,10 +2930,8 @@ class InfographicGUI:
                 self.logger.info(f"添加提示词: {title}")
                 messagebox.showinfo("成功", "提示词已添加")
             
-            # 刷新当前分类的列表
-            self._load_prompts(target_category_id)
-            # 更新分类列表（显示数量变化）
-            self._load_categories()
+            # 列表和分类数量由记录变更事件刷新；切换到保存到的分类以便看到结果
+            self._select_category(target_category_id)
             dialog.destroy()
         
         # 按钮区域（固定在底部）
@@ -2463,8 +2955,7 @@ class InfographicGUI:
         category_id = int(tags[0])
         prompt_id = int(tags[1])
         
-        prompts = self.prompt_library.get_prompts_by_category(category_id)
-        prompt = next((p for p in prompts if p['id'] == prompt_id), None)
+        prompt = self.prompt_library.get_prompt_by_id(prompt_id)
         
         if not prompt:
             return
@@ -2503,9 +2994,9 @@ class InfographicGUI:
         btn_frame.pack(pady=10)
         
         def use_prompt():
+            self._select_page("image")  # 切换到图片生成页
             self.image_prompt_text.delete("1.0", tk.END)
             self.image_prompt_text.insert(tk.END, prompt['content'])
-            self.notebook.select(1)  # 切换到图片生成页
             dialog.destroy()
             messagebox.showinfo("成功", "提示词已复制到生成页面")
         
@@ -2529,45 +3020,148 @@ class InfographicGUI:
         category_id = int(tags[0])
         prompt_id = int(tags[1])
         
-        prompts = self.prompt_library.get_prompts_by_category(category_id)
-        prompt = next((p for p in prompts if p['id'] == prompt_id), None)
+        prompt = self.prompt_library.get_prompt_by_id(prompt_id)
         
         if prompt:
+            self._select_page("image")  # 切换到图片生成页
             self.image_prompt_text.delete("1.0", tk.END)
             self.image_prompt_text.insert(tk.END, prompt['content'])
-            self.notebook.select(1)  # 切换到图片生成页
             messagebox.showinfo("成功", "提示词已复制到生成页面")
     
+    def _selected_library_tag(self):
+        """当前选中的标签筛选（"全部标签"时返回 None）"""
+        value = self.library_tag_var.get()
+        if not value or value == "全部标签":
+            return None
+        return value.rsplit(" (", 1)[0]
+    
+    def _refresh_tag_facets(self):
+        """刷新标签筛选下拉列表"""
+        facets = self.prompt_library.get_tag_facets()
+        self.library_tag_combo['values'] = ["全部标签"] + [f"{tag} ({count})" for tag, count in facets]
+    
+    def _fill_library_tree(self, prompts):
+        """填充提示词列表（只更新变化的行），prompts 为 [(分类ID, 提示词), ...]"""
+        self.library_rows.set_records(prompts)
+
+    def _library_row(self, item):
+        category_id, prompt = item
+        return (
+            self.prompt_library.get_category_name(category_id) or "未知",
+            prompt['title'],
+            prompt.get('tags', ''),
+            prompt.get('style', ''),
+            prompt.get('ratio', ''),
+            prompt.get('updated_at', '')
+        ), (category_id, prompt['id'])
+    
+    def _schedule_library_search(self):
+        """输入防抖：停止输入150ms后再搜索"""
+        if self._library_search_job:
+            self.root.after_cancel(self._library_search_job)
+        self._library_search_job = self.root.after(150, self._live_search_prompts)
+    
+    def _live_search_prompts(self):
+        """边输入边搜索（不弹出提示框）"""
+        self._library_search_job = None
+        keyword = self.library_search_var.get().strip()
+        tag = self._selected_library_tag()
+        if not keyword and not tag:
+            self._on_category_select(None)
+            return
+        # 单个英文字母匹配面太广，等待更多输入
+        if len(keyword) == 1 and keyword.isascii() and not tag:
+            return
+        if keyword and not tag:
+            prompts = self.prompt_library.suggest_prompts(keyword, limit=50)
+        else:
+            prompts = [(p['category_id'], p) for p in
+                       self.prompt_library.search_prompts(keyword, tag=tag, limit=200)]
+        self._fill_library_tree(prompts)
+    
     def _search_prompts(self):
         """搜索提示词"""
         keyword = self.library_search_var.get().strip()
-        if not keyword:
+        tag = self._selected_library_tag()
+        if not keyword and not tag:
             messagebox.showwarning("提示", "请输入搜索关键词")
             return
         
-        results = self.prompt_library.search_prompts(keyword)
+        results = self.prompt_library.search_prompts(keyword, tag=tag)
         
         if not results:
             messagebox.showinfo("搜索结果", "未找到匹配的提示词")
             return
         
-        # 清空列表
-        for item in self.library_tree.get_children():
-            self.library_tree.delete(item)
-        
         # 显示搜索结果
-        for prompt in results:
-            self.library_tree.insert("", tk.END, values=(
-                prompt['category_name'],
-                prompt['title'],
-                prompt.get('tags', ''),
-                prompt.get('style', ''),
-                prompt.get('ratio', ''),
-                prompt.get('updated_at', '')
-            ), tags=(prompt['category_id'], prompt['id']))
+        self._fill_library_tree([(prompt['category_id'], prompt) for prompt in results])
         
         messagebox.showinfo("搜索结果", f"找到 {len(results)} 条匹配的提示词")
     
+    def _find_similar_prompts(self):
+        """查找与选中提示词相似的提示词"""
+        selection = self.library_tree.selection()
+        if not selection:
+            messagebox.showwarning("提示", "请先选择提示词")
+            return
+        
+        prompt_id = int(self.library_tree.item(selection[0], "tags")[1])
+        results = self.prompt_library.find_similar_prompts(prompt_id, limit=20)
+        if not results:
+            messagebox.showinfo("相似提示词", "未找到相似的提示词")
+            return
+        
+        self._fill_library_tree([(prompt['category_id'], prompt) for prompt in results])
+        self.logger.info(f"找到 {len(results)} 条相似提示词")
+    
+    def _import_library(self):
+        """批量导入提示词（JSONL/CSV，后台执行）"""
+        path = filedialog.askopenfilename(
+            title="导入提示词",
+            filetypes=[("提示词文件", "*.jsonl *.csv"), ("JSON Lines", "*.jsonl"), ("CSV", "*.csv")]
+        )
+        if not path:
+            return
+        
+        def progress(rows, fraction):
+            self.logger.info(f"导入进度: {fraction:.0%}（已处理 {rows} 行）")
+        
+        def import_in_background():
+            try:
+                stats = self.prompt_library.import_prompts(path, progress_callback=progress)
+                self.root.after(0, lambda: self._on_library_imported(stats))
+            except Exception as e:
+                error_msg = str(e)
+                self.logger.error(f"导入提示词失败: {error_msg}")
+                self.root.after(0, lambda: messagebox.showerror("导入失败", f"导入出错（未导入任何数据）：{error_msg}"))
+        
+        self.logger.info(f"开始导入提示词: {path}")
+        threading.Thread(target=import_in_background, daemon=True).start()
+    
+    def _on_library_imported(self, stats):
+        """导入完成（列表已由记录变更事件刷新）"""
+        self.logger.success(f"导入完成：新增 {stats['imported']} 条，重复 {stats['duplicates']} 条，"
+                            f"无效 {stats['skipped']} 条")
+        messagebox.showinfo("导入完成",
+                            f"新增：{stats['imported']} 条\n重复跳过：{stats['duplicates']} 条\n"
+                            f"无效跳过：{stats['skipped']} 条")
+    
+    def _export_library(self):
+        """导出全部提示词（JSONL/CSV）"""
+        path = filedialog.asksaveasfilename(
+            title="导出提示词",
+            defaultextension=".jsonl",
+            filetypes=[("JSON Lines", "*.jsonl"), ("CSV", "*.csv")]
+        )
+        if not path:
+            return
+        try:
+            count = self.prompt_library.export_prompts(path)
+            self.logger.success(f"已导出 {count} 条提示词: {path}")
+            messagebox.showinfo("导出完成", f"已导出 {count} 条提示词")
+        except Exception as e:
+            messagebox.showerror("导出失败", f"导出出错：{str(e)}")
+    
     def _show_library_menu(self, event):
         """显示右键菜单"""
         item = self.library_tree.identify_row(event.y)
@@ -2578,7 +3172,9 @@ class InfographicGUI:
     # ==================== 图片编辑功能方法 ====================
     
     def _update_edit_model_status(self):
-        """更新图片编辑页面的模型状态显示"""
+        """更新图片编辑页面的模型状态显示（页面尚未构建时跳过，构建时会更新）"""
+        if not self._page_built("edit"):
+            return
         default_preset = self.config.get_default_api_preset()
         if default_preset:
             model = default_preset.get('model', '')
@@ -2722,7 +3318,7 @@ class InfographicGUI:
                 
                 # 初始化图片生成器
                 if not self.image_gen:
-                    self.image_gen = ImageGenerator(self.config, default_preset)
+                    self.image_gen = self._create_image_generator(default_preset)
                 
                 update_progress("📤 正在上传图片...")
                 
@@ -2848,14 +3444,12 @@ CRITICAL CONSTRAINTS (MUST FOLLOW):
             if image_path:
                 # 显示缩略图
                 try:
-                    img = Image.open(image_path)
-                    img.thumbnail((300, 300), Image.Resampling.LANCZOS)
-                    photo = ImageTk.PhotoImage(img)
-                    
-                    img_label = tk.Label(item_frame, image=photo, bg=self.colors['card'],
+                    img_label = tk.Label(item_frame, text="加载中...", bg=self.colors['card'],
+                                       fg=self.colors['text_light'], font=("微软雅黑", 9),
                                        relief='solid', bd=1)
-                    img_label.image = photo  # 保持引用
                     img_label.pack(anchor=tk.W, padx=(10, 0), pady=(5, 2))
+                    self._load_thumbnail(img_label, image_path, 300,
+                                         on_shown=lambda: self.edit_history_canvas.yview_moveto(1.0))
                     
                     # 操作按钮容器
                     btn_frame = tk.Frame(item_frame, bg=self.colors['card'])
@@ -3081,6 +3675,19 @@ CRITICAL CONSTRAINTS (MUST FOLLOW):
         except Exception as e:
             self.logger.error(f"保存编辑会话失败: {str(e)}")
         finally:
+            if self._store_poll_job is not None:
+                self.root.after_cancel(self._store_poll_job)
+            self.root.after_cancel(self._log_drain_job)
+            if self.stall_detector:
+                self.stall_detector.stop()
+            if self._stores.exception() is None:  # 仍在打开时等待打开完成
+                self.prompt_library.close()
+            self.display_cache.close()
+            self.thumbnails.close()
+            if self.metrics_exporter:
+                self.metrics_exporter.stop()
+            if self.profiler:
+                self.logger.info(f"性能分析结果已保存: {self.profiler.stop()}")
             self.logger.info("应用程序退出")
             self.root.destroy()
 
@@ -0,0 +1,270 @@
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import ttk
+
+from PIL import ImageTk
+
+# 缩略图边长与单元格尺寸（像素）
+THUMB_SIZE = 160
+CELL_WIDTH = 184
+CELL_HEIGHT = 214
+# 可见区域上下额外保留的行数，滚动时减少空白
+OVERSCAN_ROWS = 1
+# 内存中保留的 PhotoImage 数量（约为数屏的量）
+PHOTO_CACHE_SIZE = 300
+
+
+class _Cell:
+    """一个可复用的单元格（画布上的背景框、图片和说明文字）"""
+
+    def __init__(self, canvas, colors):
+        self.index = None
+        self.path = None
+        self.frame = canvas.create_rectangle(0, 0, 0, 0, outline=colors['text_light'], fill=colors['card'])
+        self.image = canvas.create_image(0, 0, anchor=tk.CENTER)
+        self.placeholder = canvas.create_text(0, 0, text="", fill=colors['text_light'], font=("微软雅黑", 9))
+        self.caption = canvas.create_text(0, 0, text="", fill=colors['text'], font=("微软雅黑", 8),
+                                          width=CELL_WIDTH - 12)
+
+    def items(self):
+        return self.frame, self.image, self.placeholder, self.caption
+
+
+class ImageGallery:
+    """
+    虚拟化的缩略图网格
+    只为可见的几行创建画布元素并在滚动时复用，缩略图从缓存后台读取，
+    因此记录数（如 5 万张）只影响内存中的列表，不影响滚动和刷新的耗时
+    """
+
+    def __init__(self, parent, colors, thumbnails, on_open=None, on_menu=None):
+        """
+        :param colors: 界面配色
+        :param thumbnails: ThumbnailCache
+        :param on_open: 双击回调 on_open(记录)
+        :param on_menu: 右键回调 on_menu(记录, 事件)
+        """
+        self.colors = colors
+        self.thumbnails = thumbnails
+        self.on_open = on_open
+        self.on_menu = on_menu
+        self.records = []
+        self.selected_id = None
+        self._offset = 0  # 视口顶部对应的内容坐标
+        self._cells = []
+        self._photos = OrderedDict()  # 路径 -> PhotoImage
+        self._loading = set()
+        self._failed = set()  # 读取失败的路径，不再重复读取
+        self._visible_paths = set()
+
+        self.frame = tk.Frame(parent, bg=colors['bg'])
+        self.canvas = tk.Canvas(self.frame, bg=colors['bg'], highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self._yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.canvas.bind("<Configure>", lambda e: self._render())
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind("<Button-4>", lambda e: self._scroll_by(-CELL_HEIGHT // 2) or "break")
+        self.canvas.bind("<Button-5>", lambda e: self._scroll_by(CELL_HEIGHT // 2) or "break")
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Double-1>", self._on_double_click)
+        self.canvas.bind("<Button-3>", self._on_right_click)
+
+    def pack(self, **options):
+        self.frame.pack(**options)
+
+    def set_records(self, records):
+        """
+        更新记录列表（新的在前），只重绘可见单元格
+        :param records: history.get_image_history() 返回的记录
+        """
+        self.records = records
+        self._failed.clear()  # 重新加载列表时重试读取失败的图片
+        self._offset = min(self._offset, self._max_offset())
+        self._render()
+
+    def apply(self, changes, records):
+        """
+        按记录变更更新列表：替换修改的记录，删除移除的记录，新增的记录排在最前
+        :param changes: RecordChanges（reset 时应改用 set_records）
+        :param records: 变更涉及、且仍应显示的记录（新的在前）
+        """
+        changed = changes.ids()
+        fresh = {record["id"]: record for record in records}
+        # 文件状态变化的记录重新读取缩略图
+        self._failed.difference_update(record["image_path"] for record in records)
+        kept = []
+        for record in self.records:
+            if record["id"] in changed:
+                record = fresh.pop(record["id"], None)
+                if record is None:
+                    continue
+            kept.append(record)
+        self.records = list(fresh.values()) + kept
+        self._offset = min(self._offset, self._max_offset())
+        self._render()
+
+    # ---------- 布局 ----------
+
+    def _columns(self):
+        return max(self.canvas.winfo_width() // CELL_WIDTH, 1)
+
+    def _content_height(self):
+        rows = -(-len(self.records) // self._columns())
+        return rows * CELL_HEIGHT
+
+    def _max_offset(self):
+        return max(self._content_height() - self.canvas.winfo_height(), 0)
+
+    def _index_at(self, x, y):
+        column = x // CELL_WIDTH
+        if column >= self._columns():
+            return None
+        index = int((y + self._offset) // CELL_HEIGHT) * self._columns() + int(column)
+        return index if 0 <= index < len(self.records) else None
+
+    def _render(self):
+        """把可见范围内的记录分配给复用的单元格"""
+        columns = self._columns()
+        height = self.canvas.winfo_height()
+        first_row = max(self._offset // CELL_HEIGHT - OVERSCAN_ROWS, 0)
+        last_row = (self._offset + height) // CELL_HEIGHT + OVERSCAN_ROWS
+        indices = range(first_row * columns, min((last_row + 1) * columns, len(self.records)))
+
+        while len(self._cells) < len(indices):
+            self._cells.append(_Cell(self.canvas, self.colors))
+        self._visible_paths = set()
+        for cell, index in zip(self._cells, indices):
+            self._fill_cell(cell, index, columns)
+        for cell in self._cells[len(indices):]:
+            cell.index = cell.path = None
+            for item in cell.items():
+                self.canvas.itemconfigure(item, state=tk.HIDDEN)
+
+        content_height = self._content_height()
+        if content_height <= height:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self._offset / content_height, (self._offset + height) / content_height)
+
+    def _fill_cell(self, cell, index, columns):
+        record = self.records[index]
+        x = (index % columns) * CELL_WIDTH
+        y = (index // columns) * CELL_HEIGHT - self._offset
+        center_x, center_y = x + CELL_WIDTH // 2, y + 6 + THUMB_SIZE // 2
+        selected = record["id"] == self.selected_id
+
+        self.canvas.coords(cell.frame, x + 4, y + 4, x + CELL_WIDTH - 4, y + CELL_HEIGHT - 4)
+        self.canvas.itemconfigure(cell.frame, state=tk.NORMAL, width=2 if selected else 1,
+                                  outline=self.colors['primary'] if selected else self.colors['text_light'])
+        self.canvas.coords(cell.image, center_x, center_y)
+        self.canvas.coords(cell.placeholder, center_x, center_y)
+        self.canvas.coords(cell.caption, center_x, y + THUMB_SIZE + 24)
+        self.canvas.itemconfigure(cell.caption, state=tk.NORMAL,
+                                  text=f"{record['timestamp']}\n{record.get('style', '')}")
+
+        path = record["image_path"]
+        cell.index, cell.path = index, path
+        photo = self._photos.get(path)
+        if photo is not None:
+            self._photos.move_to_end(path)
+            self.canvas.itemconfigure(cell.image, image=photo, state=tk.NORMAL)
+            self.canvas.itemconfigure(cell.placeholder, state=tk.HIDDEN)
+            return
+        self.canvas.itemconfigure(cell.image, image="", state=tk.HIDDEN)
+        if not record.get("exists", True):
+            text = "❌ 已删除"
+        elif path in self._failed:
+            text = "⚠ 无法加载"
+        else:
+            text = "加载中..."
+        self.canvas.itemconfigure(cell.placeholder, state=tk.NORMAL, text=text)
+        if record.get("exists", True) and path not in self._failed:
+            self._visible_paths.add(path)
+            self._request_thumbnail(path)
+
+    # ---------- 缩略图 ----------
+
+    def _request_thumbnail(self, path):
+        if path in self._loading:
+            return
+        self._loading.add(path)
+
+        def on_loaded(img, error):
+            try:
+                self.canvas.after(0, lambda: self._on_thumbnail(path, img))
+            except RuntimeError:
+                pass  # 窗口已关闭
+
+        def cancelled():
+            # 已滚出可见区域的请求不再读取
+            if path in self._visible_paths:
+                return False
+            self._loading.discard(path)
+            return True
+
+        self.thumbnails.get_async(path, THUMB_SIZE, on_loaded, cancelled=cancelled)
+
+    def _on_thumbnail(self, path, img):
+        """缩略图读取完成（在主线程执行）"""
+        self._loading.discard(path)
+        if img is None:
+            # 文件损坏或无法解码：显示错误占位，滚动重绘时不再重复读取
+            self._failed.add(path)
+            for cell in self._cells:
+                if cell.path == path:
+                    self.canvas.itemconfigure(cell.placeholder, text="⚠ 无法加载")
+            return
+        photo = self._photos[path] = ImageTk.PhotoImage(img)
+        while len(self._photos) > PHOTO_CACHE_SIZE:
+            self._photos.popitem(last=False)
+        for cell in self._cells:
+            if cell.path == path:
+                self.canvas.itemconfigure(cell.image, image=photo, state=tk.NORMAL)
+                self.canvas.itemconfigure(cell.placeholder, state=tk.HIDDEN)
+
+    # ---------- 滚动与交互 ----------
+
+    def _scroll_to(self, offset):
+        offset = int(min(max(offset, 0), self._max_offset()))
+        if offset != self._offset:
+            self._offset = offset
+            self._render()
+
+    def _scroll_by(self, delta):
+        self._scroll_to(self._offset + delta)
+
+    def _yview(self, *args):
+        """滚动条回调：moveto 比例 / scroll 数量 units|pages"""
+        if args[0] == "moveto":
+            self._scroll_to(float(args[1]) * self._content_height())
+        elif args[0] == "scroll":
+            step = self.canvas.winfo_height() if args[2] == "pages" else CELL_HEIGHT // 2
+            self._scroll_by(int(args[1]) * step)
+
+    def _on_mousewheel(self, event):
+        self._scroll_by(-int(event.delta / 120) * (CELL_HEIGHT // 2))
+        return "break"  # 不再触发其他页面的全局滚轮绑定
+
+    def _select(self, event):
+        index = self._index_at(event.x, event.y)
+        if index is None:
+            return None
+        record = self.records[index]
+        self.selected_id = record["id"]
+        self._render()
+        return record
+
+    def _on_click(self, event):
+        self._select(event)
+
+    def _on_double_click(self, event):
+        record = self._select(event)
+        if record and self.on_open:
+            self.on_open(record)
+
+    def _on_right_click(self, event):
+        record = self._select(event)
+        if record and self.on_menu:
+            self.on_menu(record, event)
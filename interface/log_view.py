@@ -0,0 +1,97 @@
+import tkinter as tk
+from collections import deque
+from tkinter import scrolledtext
+
+from core.logger import LEVEL_ORDER
+
+# 每帧最多刷新一次界面（毫秒）
+FRAME_INTERVAL_MS = 16
+DEFAULT_MAX_LINES = 5000
+
+
+class LogView:
+    """
+    有界的运行日志视图
+    日志先写入环形缓冲区，按级别过滤后每帧批量插入文本框，超出最大行数时从头部裁剪
+    """
+
+    def __init__(self, parent, colors, max_lines=DEFAULT_MAX_LINES, **text_options):
+        self.max_lines = max(int(max_lines), 1)
+        self.min_level = "DEBUG"
+        self._buffer = deque(maxlen=self.max_lines)  # 全部级别的最近日志，切换过滤级别时据此重建
+        self._pending = []  # 等待下一帧插入的日志行
+        self._flush_job = None
+
+        self.text = scrolledtext.ScrolledText(parent, state=tk.DISABLED, **text_options)
+        for level in LEVEL_ORDER:
+            self.text.tag_config(level, foreground=colors[f"log_{level.lower()}"])
+
+    def pack(self, **options):
+        self.text.pack(**options)
+
+    def append(self, messages):
+        """
+        追加一批日志（在主线程调用）
+        :param messages: [(时间, 级别, 内容), ...]
+        """
+        threshold = LEVEL_ORDER.get(self.min_level, 0)
+        for timestamp, level, message in messages:
+            line = (f"[{timestamp}] [{level}] {message}\n", level)
+            self._buffer.append(line)
+            if LEVEL_ORDER.get(level, 0) >= threshold:
+                self._pending.append(line)
+        # 积压超过上限的部分插入后也会被裁掉，直接丢弃
+        if len(self._pending) > self.max_lines:
+            del self._pending[:-self.max_lines]
+        if self._pending and self._flush_job is None:
+            self._flush_job = self.text.after(FRAME_INTERVAL_MS, self._flush)
+
+    def set_level(self, level):
+        """设置显示的最低级别，并用缓冲区重建视图"""
+        self.min_level = level
+        threshold = LEVEL_ORDER.get(level, 0)
+        self._pending = [line for line in self._buffer if LEVEL_ORDER.get(line[1], 0) >= threshold]
+        self._clear_text()
+        self._flush()
+
+    def set_max_lines(self, max_lines):
+        """修改最大行数"""
+        max_lines = max(int(max_lines), 1)
+        if max_lines == self.max_lines:
+            return
+        self.max_lines = max_lines
+        self._buffer = deque(self._buffer, maxlen=max_lines)
+        self.set_level(self.min_level)
+
+    def clear(self):
+        """清空缓冲区和视图"""
+        self._buffer.clear()
+        self._pending = []
+        self._clear_text()
+
+    def _clear_text(self):
+        self.text.config(state=tk.NORMAL)
+        self.text.delete("1.0", tk.END)
+        self.text.config(state=tk.DISABLED)
+
+    def _flush(self):
+        """把本帧积累的日志一次性插入，并裁剪超出上限的旧行"""
+        if self._flush_job is not None:
+            self.text.after_cancel(self._flush_job)
+            self._flush_job = None
+        if not self._pending:
+            return
+        lines, self._pending = self._pending, []
+        # 用户向上翻看时不强制滚到底部
+        follow = self.text.yview()[1] >= 0.999
+        args = []
+        for line, level in lines:
+            args += (line, level)
+        self.text.config(state=tk.NORMAL)
+        self.text.insert(tk.END, *args)
+        excess = int(self.text.index("end-1c").split(".")[0]) - 1 - self.max_lines
+        if excess > 0:
+            self.text.delete("1.0", f"{excess + 1}.0")
+        self.text.config(state=tk.DISABLED)
+        if follow:
+            self.text.see(tk.END)
@@ -0,0 +1,125 @@
+import os
+import sys
+import threading
+import time
+import tkinter
+import traceback
+
+import core.profiling
+from core.metrics import REGISTRY
+
+# 主线程定时打点的间隔（毫秒）
+TICK_INTERVAL_MS = 100
+DEFAULT_THRESHOLD_MS = 250
+
+LOOP_LAG = REGISTRY.histogram("infographic_ui_loop_lag_seconds", "界面事件循环延迟（定时打点的实际延后，秒）",
+                              buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+STALLS = REGISTRY.histogram("infographic_ui_stall_seconds", "界面主线程卡顿时长（秒）", labelnames=("handler",))
+
+_TKINTER_DIR = os.path.dirname(os.path.abspath(tkinter.__file__))
+# 性能分析的包装函数，定位回调时跳过
+_WRAPPER_FILE = os.path.abspath(core.profiling.__file__)
+
+
+def _in_tkinter(frame):
+    return os.path.dirname(os.path.abspath(frame.f_code.co_filename)) == _TKINTER_DIR
+
+
+def find_handler(frame):
+    """
+    从主线程调用栈中找出正在执行的界面回调：最内层由 tkinter 直接调用的非 tkinter 函数
+    :param frame: 最内层栈帧
+    :return: "函数名 (文件:行号)"，找不到时为 "unknown"
+    """
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    # frames 从内到外，找第一个“调用者属于 tkinter、自身不属于 tkinter”的帧
+    for index in range(len(frames) - 1):
+        if _in_tkinter(frames[index + 1]) and not _in_tkinter(frames[index]):
+            while index > 0 and os.path.abspath(frames[index].f_code.co_filename) == _WRAPPER_FILE:
+                index -= 1
+            code = frames[index].f_code
+            name = getattr(code, "co_qualname", code.co_name)
+            return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return "unknown"
+
+
+class StallDetector:
+    """
+    界面卡顿检测
+    主线程每隔 TICK_INTERVAL_MS 通过 after() 打点，后台线程发现打点超过阈值未更新时，
+    抓取主线程的调用栈；主线程恢复后记录卡顿时长、所在回调和调用栈
+    """
+
+    def __init__(self, root, threshold_ms=DEFAULT_THRESHOLD_MS, logger=None):
+        """
+        :param root: Tk 根窗口
+        :param threshold_ms: 卡顿阈值（毫秒）
+        :param logger: 日志对象，默认使用全局日志
+        """
+        if logger is None:
+            from core.logger import get_logger
+            logger = get_logger()
+        self.root = root
+        self.threshold = threshold_ms / 1000
+        self.logger = logger
+        self._interval = TICK_INTERVAL_MS / 1000
+        self._main_thread_id = None
+        self._last_tick = None
+        self._captured = None  # (处理函数, 调用栈) 本次卡顿中抓取的现场
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._tick_job = None
+
+    def start(self):
+        """启动检测（需在主线程调用）"""
+        self._main_thread_id = threading.get_ident()
+        self._tick_job = self.root.after(TICK_INTERVAL_MS, self._tick)
+        self._thread = threading.Thread(target=self._watch, name="ui-stall-detector", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._tick_job is not None:
+            self.root.after_cancel(self._tick_job)
+            self._tick_job = None
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _tick(self):
+        """主线程打点：计算本次延后，超过阈值时记录卡顿"""
+        now = time.perf_counter()
+        with self._lock:
+            # 第一次打点只作为基准（启动阶段在进入事件循环之前，不算卡顿）
+            lag = 0.0 if self._last_tick is None else max(now - self._last_tick - self._interval, 0.0)
+            self._last_tick = now
+            captured, self._captured = self._captured, None
+        LOOP_LAG.observe(lag)
+        if lag >= self.threshold:
+            handler, stack = captured or ("unknown", "")
+            STALLS.observe(lag, handler=handler)
+            message = f"界面卡顿 {lag * 1000:.0f}ms，回调: {handler}"
+            self.logger.warning(f"{message}\n{stack}" if stack else message)
+        self._tick_job = self.root.after(TICK_INTERVAL_MS, self._tick)
+
+    def _watch(self):
+        """后台线程：主线程超过阈值未打点时抓取一次调用栈"""
+        while not self._stop.wait(self._interval / 2):
+            with self._lock:
+                tick = self._last_tick
+                if tick is None or time.perf_counter() - tick - self._interval < self.threshold or self._captured is not None:
+                    continue
+            frame = sys._current_frames().get(self._main_thread_id)
+            if frame is None:
+                continue
+            captured = (find_handler(frame), "".join(traceback.format_stack(frame)).rstrip())
+            del frame
+            with self._lock:
+                # 抓取期间主线程已恢复时，栈已不是卡顿现场
+                if self._last_tick == tick and self._captured is None:
+                    self._captured = captured
@@ -0,0 +1,75 @@
+import time
+
+from core.metrics import REGISTRY
+
+# 启动计时起点：本模块第一次被导入的时刻（main.py 最先导入本模块，不含解释器自身的启动时间）
+PROCESS_STARTED = time.perf_counter()
+# 窗口首次绘制的目标耗时（毫秒）
+FIRST_PAINT_TARGET_MS = 300
+
+STARTUP_SECONDS = REGISTRY.gauge("infographic_startup_seconds", "启动各阶段完成时刻（距启动计时起点，秒）",
+                                 labelnames=("phase",))
+PAGE_BUILD_SECONDS = REGISTRY.histogram("infographic_ui_page_build_seconds", "标签页首次打开时的构建耗时（秒）",
+                                        labelnames=("page",))
+
+
+class StartupTimer:
+    """
+    启动计时
+    记录各阶段完成的时刻（距 PROCESS_STARTED），窗口第一次绘制完成后在日志中输出报告，
+    超过 FIRST_PAINT_TARGET_MS 时以警告级别输出
+    """
+
+    def __init__(self, started=PROCESS_STARTED, logger=None):
+        """
+        :param started: 计时起点（time.perf_counter() 的值）
+        :param logger: 日志对象，默认使用全局日志
+        """
+        if logger is None:
+            from core.logger import get_logger
+            logger = get_logger()
+        self.started = started
+        self.logger = logger
+        self.phases = []  # [(阶段, 距起点的秒数), ...]
+        self._map_binding = None
+
+    def mark(self, phase):
+        """
+        记录一个阶段完成
+        :return: 距起点的秒数
+        """
+        elapsed = time.perf_counter() - self.started
+        self.phases.append((phase, elapsed))
+        STARTUP_SECONDS.set(elapsed, phase=phase)
+        return elapsed
+
+    def watch_first_paint(self, root, callback=None):
+        """
+        根窗口第一次显示后，等界面空闲（绘制完成）时记录 first_paint 阶段并输出报告
+        :param callback: 可选，报告之后在主线程调用（如启动后才需要做的工作）
+        """
+        def on_map(event):
+            # 子控件的 <Map> 也会传到根窗口的绑定上，只处理根窗口自身
+            if event.widget is not root or self._map_binding is None:
+                return
+            root.unbind("<Map>", self._map_binding)
+            self._map_binding = None
+            root.after_idle(lambda: self._on_first_paint(callback))
+        self._map_binding = root.bind("<Map>", on_map, add="+")
+
+    def _on_first_paint(self, callback):
+        elapsed = self.mark("first_paint")
+        if elapsed * 1000 > FIRST_PAINT_TARGET_MS:
+            self.logger.warning(f"{self.report()}，超过目标 {FIRST_PAINT_TARGET_MS}ms")
+        else:
+            self.logger.info(self.report())
+        if callback:
+            callback()
+
+    def report(self):
+        """:return: "启动耗时: 阶段 累计ms (+本阶段ms), ..." """
+        parts, previous = [], 0.0
+        for phase, elapsed in self.phases:
+            parts.append(f"{phase} {elapsed * 1000:.0f}ms (+{(elapsed - previous) * 1000:.0f})")
+            previous = elapsed
+        return "启动耗时: " + ", ".join(parts)
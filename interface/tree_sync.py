@@ -0,0 +1,120 @@
+class TreeSync:
+    """
+    让 ttk.Treeview 与一组记录保持一致
+    记住上次显示的每一行（行 ID -> 列值、标签），新列表与之比较后只对变化的行执行插入、删除、修改和移动，
+    刷新开销与变化的行数成正比，而不是与列表长度成正比
+    """
+
+    def __init__(self, tree, row, key=lambda record: record["id"]):
+        """
+        :param tree: ttk.Treeview
+        :param row: row(记录) -> (列值元组, 标签元组)
+        :param key: key(记录) -> 行 ID（同一列表中唯一）
+        """
+        self.tree = tree
+        self.row = row
+        self.key = key
+        self._rows = {}   # 行 ID -> (列值, 标签)
+        self._order = []  # 当前显示顺序
+        self._adopted = False
+
+    def _adopt(self):
+        if not self._adopted:
+            # 第一次同步前清掉不是由本对象插入的行
+            self._adopted = True
+            stray = self.tree.get_children()
+            if stray:
+                self.tree.delete(*stray)
+
+    def ids(self):
+        """当前显示的行 ID"""
+        return set(self._rows)
+
+    def set_records(self, records):
+        """
+        显示新的记录列表
+        :return: {"inserted", "deleted", "updated", "moved"} 各类操作的行数
+        """
+        self._adopt()
+        rows, order = {}, []
+        for record in records:
+            key = self.key(record)
+            if key not in rows:  # 重复的 ID 只显示第一条
+                rows[key] = self.row(record)
+                order.append(key)
+
+        stats = {"inserted": 0, "deleted": 0, "updated": 0, "moved": 0}
+        removed = [key for key in self._order if key not in rows]
+        if removed:
+            self.tree.delete(*(str(key) for key in removed))
+            stats["deleted"] = len(removed)
+
+        # 保留的行相对顺序不变时，按新顺序在对应位置插入新增行即可；否则逐行移动到新位置
+        reordered = [key for key in self._order if key in rows] != [key for key in order if key in self._rows]
+        for index, key in enumerate(order):
+            values, tags = rows[key]
+            previous = self._rows.get(key)
+            if previous is None:
+                self.tree.insert("", index, iid=str(key), values=values, tags=tags)
+                stats["inserted"] += 1
+                continue
+            if previous != (values, tags):
+                self.tree.item(str(key), values=values, tags=tags)
+                stats["updated"] += 1
+            if reordered:
+                self.tree.move(str(key), "", index)
+                stats["moved"] += 1
+
+        self._rows, self._order = rows, order
+        return stats
+
+    def apply(self, changes, records, index=0, limit=None):
+        """
+        按记录变更只修改涉及的行，不读取、不比较其余的行
+        :param changes: RecordChanges（reset 时应改用 set_records 重新显示）
+        :param records: 变更涉及、且仍应显示的记录（按显示顺序）；涉及但不在其中的行会被删除
+        :param index: 原本没有显示的记录插入的位置（0 为最前，"end" 为最后）
+        :param limit: 最多显示的行数，超出的行从末尾删除
+        :return: 同 set_records
+        """
+        self._adopt()
+        rows = {}
+        for record in records:
+            rows.setdefault(self.key(record), record)
+
+        stats = {"inserted": 0, "deleted": 0, "updated": 0, "moved": 0}
+        removed = {key for key in changes.ids() if key in self._rows and key not in rows}
+        if removed:
+            self._delete(removed)
+            self._order = [key for key in self._order if key not in removed]
+            stats["deleted"] = len(removed)
+
+        inserted = []
+        for key, record in rows.items():
+            values, tags = self.row(record)
+            previous = self._rows.get(key)
+            if previous is None:
+                inserted.append(key)
+            elif previous != (values, tags):
+                self.tree.item(str(key), values=values, tags=tags)
+                stats["updated"] += 1
+            self._rows[key] = (values, tags)
+
+        position = len(self._order) if index == "end" else index
+        for offset, key in enumerate(inserted):
+            values, tags = self._rows[key]
+            self.tree.insert("", position + offset, iid=str(key), values=values, tags=tags)
+        self._order[position:position] = inserted
+        stats["inserted"] = len(inserted)
+
+        if limit is not None and len(self._order) > limit:
+            excess = self._order[limit:]
+            self._delete(excess)
+            del self._order[limit:]
+            stats["deleted"] += len(excess)
+        return stats
+
+    def _delete(self, keys):
+        self.tree.delete(*(str(key) for key in keys))
+        for key in keys:
+            del self._rows[key]
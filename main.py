@@ -1,3 +1,4 @@
+import interface.startup_timer  # noqa: F401 最先导入，作为启动计时的起点
 from interface.gui import gui_main
 
 if __name__ == "__main__":
@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from core.history_manager import HistoryManager
+
+
+class HistorySearchTest(unittest.TestCase):
+    """提示词历史全文检索"""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.history_path = os.path.join(self.workdir, "data", "history.json")
+        self.managers = []
+
+    def tearDown(self):
+        for manager in self.managers:
+            manager.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def _manager(self):
+        manager = HistoryManager(self.history_path)
+        self.managers.append(manager)
+        return manager
+
+    def _ids(self, manager, keyword):
+        return [record["id"] for record in manager.search_prompts(keyword)]
+
+    def test_chinese_bigrams_and_single_chars(self):
+        manager = self._manager()
+        cat = manager.add_prompt("一只橘猫在窗台上晒太阳", "写实", "1:1", "橘猫")
+        dog = manager.add_prompt("雪地里奔跑的小狗", "写实", "16:9", "小狗")
+        self.assertEqual(self._ids(manager, "橘猫"), [cat])
+        self.assertEqual(self._ids(manager, "猫"), [cat])
+        self.assertEqual(self._ids(manager, "晒太阳 橘猫"), [cat])
+        self.assertEqual(self._ids(manager, "橘猫 雪地"), [])
+        self.assertCountEqual(self._ids(manager, "写实"), [cat, dog])
+
+    def test_trailing_english_word_is_prefix(self):
+        manager = self._manager()
+        neon = manager.add_prompt("Cyberpunk city at night", "赛博朋克", "16:9", "neon streets")
+        manager.add_prompt("Quiet mountain lake", "风景", "16:9", "morning mist")
+        self.assertEqual(self._ids(manager, "cyber"), [neon])
+        self.assertEqual(self._ids(manager, "cyberpunk ni"), [neon])
+        self.assertEqual(self._ids(manager, "cyber city"), [])
+        self.assertEqual(self._ids(manager, "yber"), [])
+
+    def test_keeps_records_beyond_recent_limit(self):
+        manager = self._manager()
+        first = manager.add_prompt("最早的一条提示词 alpha", "", "", "")
+        for i in range(105):
+            manager.add_prompt(f"填充记录 {i}", "", "", "")
+        self.assertEqual(len(manager.get_prompt_history(limit=None)), 100)
+        self.assertEqual(self._ids(manager, "alpha"), [first])
+        self.assertEqual(manager.get_prompt(first)["prompt"], "最早的一条提示词 alpha")
+
+    def test_backfill_renumbers_duplicate_ids(self):
+        # 旧版按条数分配ID，裁剪后新记录会重复使用同一个ID
+        prompts = [{"id": 3, "timestamp": f"2024-01-0{day} 10:00:00", "prompt": text,
+                    "style": "", "ratio": "", "content": ""}
+                   for day, text in ((3, "第三条 gamma"), (2, "第二条 beta"), (1, "第一条 alpha"))]
+        prompts[2]["id"] = 1
+        os.makedirs(os.path.dirname(self.history_path))
+        with open(self.history_path, "w", encoding="utf-8") as f:
+            json.dump({"prompts": prompts, "images": [], "edit_sessions": []}, f, ensure_ascii=False)
+
+        manager = self._manager()
+        self.assertEqual(self._ids(manager, "gamma"), [3])
+        self.assertEqual(self._ids(manager, "alpha"), [1])
+        renumbered = self._ids(manager, "beta")
+        self.assertEqual(len(renumbered), 1)
+        self.assertNotIn(renumbered[0], (1, 3))
+
+        # 写回历史记录后 ID 与检索库一致，之后新增的记录不再重复
+        with open(self.history_path, encoding="utf-8") as f:
+            saved = json.load(f)["prompts"]
+        self.assertEqual([record["id"] for record in saved], [3, renumbered[0], 1])
+        added = manager.add_prompt("新记录 delta", "", "", "")
+        self.assertNotIn(added, (1, 3, renumbered[0]))
+        self.assertEqual(self._ids(manager, "delta"), [added])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from core.profiling import ProfilingSession
+
+
+class ProfilingSessionTest(unittest.TestCase):
+    """性能分析会话"""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.session = ProfilingSession(output_dir=os.path.join(self.workdir, "profile"))
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_overlapping_calls_all_run(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def work(value):
+            barrier.wait()  # 两个线程同时处在被包装的调用中
+            return sum(range(1000)) + value
+
+        wrapped = self.session.wrap(work, "store.work")
+        results, errors = [], []
+
+        def call(value):
+            try:
+                results.append(wrapped(value))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call, args=(value,)) for value in (1, 2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(results), [499501, 499502])
+        self.session.start()
+        output_dir = self.session.stop()
+        with open(os.path.join(output_dir, "summary.json"), encoding="utf-8") as f:
+            hot_path = json.load(f)["hot_paths"]["store.work"]
+        self.assertEqual(hot_path["calls"], 2)
+        self.assertEqual(hot_path["profiled_calls"], 1)
+        self.assertTrue(os.path.exists(os.path.join(output_dir, "hotpaths.pstats")))
+
+    def test_runs_unprofiled_when_another_profiler_is_active(self):
+        class ActiveProfiler:
+            def enable(self):
+                raise ValueError("Another profiling tool is already active")
+
+        self.session._profile = ActiveProfiler()
+        wrapped = self.session.wrap(lambda: "done", "store.other")
+        self.assertEqual(wrapped(), "done")
+        self.assertEqual(wrapped(), "done")
+        self.assertEqual(self.session._calls["store.other"][3], 0)
+
+    def test_nested_calls_counted_once(self):
+        inner = self.session.wrap(lambda: 1, "inner")
+        outer = self.session.wrap(lambda: inner() + 1, "outer")
+        self.assertEqual(outer(), 2)
+        self.assertEqual(set(self.session._calls), {"outer"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import itertools
+import os
+import shutil
+import tempfile
+import unittest
+
+from core.config_manager import ConfigManager
+from core.prompt_generator import PromptGenerator, PromptGrid
+
+EXAMPLE_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              "config", "config.json.example")
+
+
+class PromptGridTest(unittest.TestCase):
+    """组合网格：抽样与去重"""
+
+    @staticmethod
+    def _grid(axes, **kwargs):
+        def render_rows(rows):
+            return [f"{row['x']}-{row['y']}" for row in rows]
+        return PromptGrid(render_rows, {"y": "base"}, axes, **kwargs)
+
+    def test_decode_matches_product_order(self):
+        value_lists = [["a", "b"], [1, 2, 3], ["x", "y"]]
+        product = list(itertools.product(*value_lists))
+        self.assertEqual([PromptGrid._decode(index, value_lists) for index in range(len(product))], product)
+
+    def test_sample_is_reproducible_with_seed(self):
+        axes = [(name, [(value, {"x": f"{name}{value}"}) for value in range(10)]) for name in ("a", "b", "c")]
+        first = list(self._grid(axes, sample=50, seed=7, dedupe=False))
+        self.assertEqual(first, list(self._grid(axes, sample=50, seed=7, dedupe=False)))
+        self.assertNotEqual(first, list(self._grid(axes, sample=50, seed=8, dedupe=False)))
+        combos = [tuple(combo.values()) for combo, _ in first]
+        self.assertEqual(len(set(combos)), 50)
+        self.assertTrue(all(all(0 <= value < 10 for value in combo) for combo in combos))
+
+    def test_sample_larger_than_grid(self):
+        grid = self._grid([("a", [(1, {"x": "1"}), (2, {"x": "2"})])], sample=10, seed=1)
+        self.assertEqual(len(grid), 2)
+        self.assertEqual(sorted(prompt for _, prompt in grid), ["1-base", "2-base"])
+
+    def test_dedupe_skips_identical_prompts(self):
+        axes = [("a", [(1, {"x": "same"}), (2, {"x": "same"}), (3, {"x": "other"})]),
+                ("b", [("p", {}), ("q", {"y": "q"})])]
+        self.assertEqual(len(list(self._grid(axes, dedupe=False))), 6)
+        self.assertEqual([prompt for _, prompt in self._grid(axes)],
+                         ["same-base", "same-q", "other-base", "other-q"])
+
+    def test_estimate(self):
+        axes = [("a", [(i, {"x": str(i)}) for i in range(4)]), ("b", [(i, {"y": str(i)}) for i in range(5)])]
+        grid = self._grid(axes, collapsed=["c"], sample=6)
+        self.assertEqual(grid.estimate(cost_per_image=0.5), {
+            "combinations": 20, "prompts": 6, "api_calls": 6, "collapsed": ["c"], "estimated_cost": 3.0
+        })
+
+
+class PromptGeneratorGridTest(unittest.TestCase):
+    """PromptGenerator.prompt_grid：维度合并与渲染结果"""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        config_path = os.path.join(self.workdir, "config", "config.json")
+        os.makedirs(os.path.dirname(config_path))
+        shutil.copyfile(EXAMPLE_CONFIG, config_path)
+        self.config = ConfigManager(config_path)
+        self.generator = PromptGenerator(self.config)
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_simple_mode_collapses_unused_dimensions(self):
+        grid = self.generator.prompt_grid("城市夜景")
+        self.assertEqual(grid.collapsed, ["art_styles", "lighting_types"])
+        styles = self.config.snapshot.style_categories
+        ratios = self.config.snapshot.ratio_presets
+        self.assertEqual(grid.size, len(styles) * len(ratios))
+
+        template = self.generator.base_template
+        for combo, prompt in itertools.islice(grid, 20):
+            style = combo["style_categories"]
+            params = {"content": "城市夜景", "ratio": combo["ratio_presets"], "resolution": "1024x1024",
+                      "language": self.config.snapshot.language, "usage_scene": "通用场景",
+                      "style_name": style.split(" ")[1] if " " in style else style,
+                      "style_desc": styles[style]}
+            self.assertEqual(prompt, template.format_map(params).strip())
+
+    def test_purpose_grid_matches_generate_advanced(self):
+        lighting = list(self.config.snapshot.values["lighting_types"])[:3]
+        grid = self.generator.prompt_grid("a red fox", purpose="逼真场景摄影", dimensions={
+            "lighting_types": lighting + lighting[:1],
+            "art_styles": ["watercolor", "pixel art"],
+            "image_sizes": ["1K", "2K"],
+        })
+        self.assertEqual(grid.collapsed, ["art_styles"])
+        self.assertEqual([[value for value, _ in options] for _, options in grid.axes], [lighting, ["1K", "2K"]])
+        results = list(grid)
+        self.assertEqual(len(results), len(lighting) * 2)
+        for combo, prompt in results:
+            self.assertEqual(prompt, self.generator.generate_advanced(
+                "逼真场景摄影", "a red fox", lighting=combo["lighting_types"], image_size=combo["image_sizes"]))
+
+    def test_unknown_dimension(self):
+        with self.assertRaises(ValueError):
+            self.generator.prompt_grid("x", dimensions={"style_categories": ["极简"], "colors": ["red"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
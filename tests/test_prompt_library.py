@@ -0,0 +1,187 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from core.prompt_library import PromptLibrary
+from core.prompt_similarity import SimilarityIndex
+
+
+class PromptImportExportTest(unittest.TestCase):
+    """提示词库导入/导出"""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.libraries = []
+
+    def tearDown(self):
+        for library in self.libraries:
+            library.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def _library(self, name):
+        library = PromptLibrary(os.path.join(self.workdir, name, "prompt_library.json"))
+        self.libraries.append(library)
+        return library
+
+    def _write(self, name, lines):
+        path = os.path.join(self.workdir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    def test_jsonl_round_trip(self):
+        source = self._library("source")
+        category = source.add_category("导入测试")
+        source.add_prompt(category["id"], "猫", "一只橘猫在窗台上晒太阳", tags="动物,猫", ratio="1:1")
+        source.add_prompt(category["id"], "city", "Night city skyline, neon lights", style="赛博朋克")
+        path = os.path.join(self.workdir, "export.jsonl")
+        self.assertEqual(source.export_prompts(path, category_id=category["id"]), 2)
+
+        target = self._library("target")
+        stats = target.import_prompts(path)
+        self.assertEqual(stats, {"imported": 2, "duplicates": 0, "skipped": 0})
+        imported = target.search_prompts("橘猫")
+        self.assertEqual(len(imported), 1)
+        self.assertEqual(imported[0]["tags"], "动物,猫")
+        self.assertEqual(imported[0]["ratio"], "1:1")
+        self.assertIn("导入测试", [c["name"] for c in target.get_categories()])
+
+        # 再次导入同一文件时全部视为重复
+        self.assertEqual(target.import_prompts(path), {"imported": 0, "duplicates": 2, "skipped": 0})
+
+    def test_jsonl_duplicate_and_bad_rows(self):
+        library = self._library("library")
+        path = self._write("import.jsonl", [
+            json.dumps({"category": "新分类", "title": "a", "content": "第一条提示词"}, ensure_ascii=False),
+            json.dumps({"category": "新分类", "content": "  第一条提示词  "}, ensure_ascii=False),
+            '{"category": "新分类", "content": "没有结尾',
+            json.dumps(["不是对象"], ensure_ascii=False),
+            json.dumps({"category": "新分类", "content": ""}, ensure_ascii=False),
+            json.dumps({"category": "新分类", "title": "b", "content": "第二条提示词"}, ensure_ascii=False),
+        ])
+
+        stats = library.import_prompts(path)
+        self.assertEqual(stats, {"imported": 2, "duplicates": 1, "skipped": 3})
+        category = next(c for c in library.get_categories() if c["name"] == "新分类")
+        self.assertEqual(sorted(p["title"] for p in category["prompts"]), ["a", "b"])
+
+    def test_jsonl_non_string_fields(self):
+        library = self._library("library")
+        path = self._write("import.jsonl", [
+            json.dumps({"category": 5, "content": 123}),
+            json.dumps({"category": "标签", "content": "列表标签", "tags": ["a", " b ", 3]}, ensure_ascii=False),
+            json.dumps({"category": "标签", "content": {"text": "对象"}}, ensure_ascii=False),
+            json.dumps({"category": "标签", "content": "嵌套标签", "tags": [["a"]]}, ensure_ascii=False),
+        ])
+
+        stats = library.import_prompts(path)
+        self.assertEqual(stats, {"imported": 2, "duplicates": 0, "skipped": 2})
+        categories = {c["name"]: c["prompts"] for c in library.get_categories()}
+        self.assertEqual([p["content"] for p in categories["5"]], ["123"])
+        self.assertEqual([p["tags"] for p in categories["标签"]], ["a,b,3"])
+
+    def test_csv_round_trip(self):
+        source = self._library("source")
+        category = source.add_category("表格")
+        source.add_prompt(category["id"], "逗号", "包含, 逗号和 \"引号\" 的提示词")
+        path = os.path.join(self.workdir, "export.csv")
+        self.assertEqual(source.export_prompts(path, category_id=category["id"]), 1)
+
+        target = self._library("target")
+        self.assertEqual(target.import_prompts(path), {"imported": 1, "duplicates": 0, "skipped": 0})
+        self.assertEqual(target.search_prompts("引号")[0]["content"], "包含, 逗号和 \"引号\" 的提示词")
+
+
+class PromptCategoryTest(unittest.TestCase):
+    """分类查询"""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.library = PromptLibrary(os.path.join(self.workdir, "prompt_library.json"))
+
+    def tearDown(self):
+        self.library.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_categories_are_snapshots(self):
+        category = self.library.add_category("快照")
+        self.library.add_prompt(category["id"], "一", "第一条")
+        snapshot = self.library.get_category_by_id(category["id"])
+        categories = self.library.get_categories()
+
+        self.library.add_prompt(category["id"], "二", "第二条")
+        self.assertEqual([p["title"] for p in snapshot["prompts"]], ["一"])
+        json.dumps(categories, ensure_ascii=False)
+        self.assertEqual(len(self.library.get_category_by_id(category["id"])["prompts"]), 2)
+        self.assertIsNone(self.library.get_category_by_id(-1))
+
+
+class PromptSearchTest(unittest.TestCase):
+    """提示词检索"""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.library = PromptLibrary(os.path.join(self.workdir, "prompt_library.json"))
+        self.category = self.library.add_category("检索")
+
+    def tearDown(self):
+        self.library.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_suggest_ranks_all_matches(self):
+        best = self.library.add_prompt(self.category["id"], "zebra crossing", "street scene", tags="zebra")
+        for i in range(400):
+            self.library.add_prompt(self.category["id"], f"filler {i}", f"a zebra in the background {i}")
+        suggestions = self.library.suggest_prompts("zeb", limit=5)
+        self.assertEqual(len(suggestions), 5)
+        self.assertEqual(suggestions[0][1]["id"], best["id"])
+
+    def test_tag_only_search(self):
+        tagged = [self.library.add_prompt(self.category["id"], f"t{i}", f"内容{i}", tags="海报")["id"]
+                  for i in range(3)]
+        self.library.add_prompt(self.category["id"], "other", "其他内容", tags="图标")
+        self.assertEqual([p["id"] for p in self.library.search_prompts("", tag="海报")], tagged)
+        self.assertEqual([p["id"] for p in self.library.search_prompts("", tag="海报", limit=2)], tagged[:2])
+        self.assertEqual(self.library.search_prompts("", tag="不存在"), [])
+
+
+class PromptSimilarityTest(unittest.TestCase):
+    """相似度索引"""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.library = PromptLibrary(os.path.join(self.workdir, "prompt_library.json"))
+        self.category = self.library.add_category("查重")
+
+    def tearDown(self):
+        self.library.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_changes_during_load_are_applied(self):
+        removed = self.library.add_prompt(self.category["id"], "旧", "雨夜的霓虹街道，行人撑着透明雨伞")
+        kept = self.library.add_prompt(self.category["id"], "保留", "清晨的森林小径，阳光穿过薄雾")
+        added = {}
+        original_load = SimilarityIndex.load
+
+        def load_while_editing(index, texts):
+            # 计算签名期间不持有库锁，其他线程可以继续修改
+            original_load(index, texts)
+            self.library.delete_prompt(self.category["id"], removed["id"])
+            self.library.update_prompt(self.category["id"], kept["id"], "保留", "深夜的实验室，屏幕发出蓝光")
+            added.update(self.library.add_prompt(self.category["id"], "新", "沙漠中的驼队，夕阳拉长影子"))
+
+        with mock.patch.object(SimilarityIndex, "load", load_while_editing):
+            self.library.load_similarity_index()
+
+        find = self.library.find_near_duplicates
+        self.assertEqual([p["id"] for p in find("沙漠中的驼队，夕阳拉长影子")], [added["id"]])
+        self.assertEqual([p["id"] for p in find("深夜的实验室，屏幕发出蓝光")], [kept["id"]])
+        self.assertEqual(find("清晨的森林小径，阳光穿过薄雾"), [])
+        self.assertEqual(find("雨夜的霓虹街道，行人撑着透明雨伞"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+from core.prompt_templates import CompiledTemplate, TemplateError, compile_format
+
+
+class CompileFormatTest(unittest.TestCase):
+    """预解析模板的渲染结果与 str.format_map 一致"""
+
+    def assertSameAsFormatMap(self, template, params):
+        self.assertEqual(compile_format(template)(params), template.format_map(params))
+
+    def test_matches_format_map(self):
+        params = {"a": "甲", "b": 2, "c": "{不展开}"}
+        for template in ("", "纯文本", "{a}", "前{a}后", "{a}{b}{c}", "{a}-{b}-{a}", "{{a}} {a} {{"):
+            with self.subTest(template=template):
+                self.assertSameAsFormatMap(template, params)
+
+    def test_percent_is_escaped(self):
+        params = {"rate": "50%", "x": "%s"}
+        for template in ("100% 完成", "%(rate)s {rate}", "{rate}%%{x}", "%s %d {x}"):
+            with self.subTest(template=template):
+                self.assertSameAsFormatMap(template, params)
+
+    def test_spec_and_conversion_use_format_map(self):
+        params = {"name": "cat", "n": 3.14159}
+        for template in ("{name:>6}|", "{name!r}", "{n:.2f} {name}", "{name!s:^7}"):
+            with self.subTest(template=template):
+                self.assertSameAsFormatMap(template, params)
+
+    def test_missing_field_raises_key_error(self):
+        with self.assertRaises(KeyError) as cm:
+            compile_format("{a} and {b}")({"a": 1})
+        self.assertEqual(cm.exception.args[0], "b")
+
+    def test_invalid_templates(self):
+        for template in ("{a", "{}", "{0}", "{a.b}", "{a[0]}"):
+            with self.subTest(template=template), self.assertRaises(TemplateError):
+                compile_format(template)
+
+
+class CompiledTemplateTest(unittest.TestCase):
+    """默认值与批量渲染"""
+
+    def test_derived_defaults_follow_each_row(self):
+        template = CompiledTemplate("{subject} | {content} | {mood}",
+                                    {"subject": "{content} 特写", "mood": "calm"})
+        rows = [{"content": "猫"}, {"content": "狗", "subject": "指定主体"}, {"content": "鸟", "mood": "wild"}]
+        self.assertEqual(template.render_many(rows), [
+            "猫 特写 | 猫 | calm",
+            "指定主体 | 狗 | calm",
+            "鸟 特写 | 鸟 | wild",
+        ])
+
+    def test_render_many_matches_format_map(self):
+        text = "{content}，{lighting}，比例 {aspect_ratio}（100%）"
+        defaults = {"lighting": "soft light", "aspect_ratio": "16:9"}
+        template = CompiledTemplate(text, defaults)
+        rows = [{"content": "城市"}, {"content": "森林", "aspect_ratio": "1:1"}]
+        self.assertEqual(template.render_many(rows),
+                         [text.format_map({**defaults, **row}) for row in rows])
+
+    def test_missing_key_reports_row_number(self):
+        template = CompiledTemplate("{content} {style}")
+        with self.assertRaises(ValueError) as cm:
+            template.render_many([{"content": "a", "style": "x"}, {"content": "b", "style": "y"}, {"content": "c"}])
+        self.assertEqual(str(cm.exception), "第 3 行缺少模板参数：style")
+
+    def test_render_checks_all_fields(self):
+        template = CompiledTemplate("{content} {style} {mood}", {"mood": "calm"})
+        self.assertEqual(template.available_params(("content",)), frozenset({"content", "mood"}))
+        with self.assertRaises(ValueError) as cm:
+            template.render({"content": "a"})
+        self.assertIn("style", str(cm.exception))
+        self.assertEqual(template.render({"content": "a", "style": "b"}), "a b calm")
+
+
+if __name__ == "__main__":
+    unittest.main()